@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+"""
+Runtime benchmarks for the generated parsers.
+
+Every benchmark is a schema and a deterministic synthetic document. The parser is generated into
+build/<benchmark>/, compiled with -O2 together with harness.c, and timed parsing the document
+in a loop.
+
+Results can be saved with --json, and compared to an earlier run (e.g. on the previous commit)
+with --compare.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import time
+from typing import Any, NamedTuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(BENCH_DIR, "build")
+GENERATOR = os.path.join(BENCH_DIR, "..", "json_schema_to_c.py")
+
+CC = os.environ.get("CC", "cc")
+CFLAGS = ["-O2", "-Wall", "-Wextra", "-Werror"]
+
+ENUM_VALUES_PER_DOCUMENT = 1000
+TELEMETRY_SAMPLES_PER_DOCUMENT = 200
+LOG_LINES_PER_DOCUMENT = 100
+WIDE_OBJECT_FIELDS = 200
+WIDE_OBJECTS_PER_DOCUMENT = 50
+NESTING_DEPTH = 32
+NESTED_OBJECTS_PER_DOCUMENT = 100
+NUMBERS_PER_DOCUMENT = 10000
+UNION_VALUES_PER_DOCUMENT = 1000
+LONG_STRINGS_PER_DOCUMENT = 16
+LONG_STRING_LENGTH = 65536
+SKEWED_OBJECT_FIELDS = 80
+SKEWED_HOT_FIELDS = 5
+SKEWED_OBJECTS_PER_DOCUMENT = 1000
+
+
+class Benchmark(NamedTuple):
+    name: str
+    schema: dict[str, Any]
+    document: Any
+    # Passed to --hit-profile, if set
+    hit_profile: dict[str, Any] | None = None
+
+    @property
+    def fields(self) -> int:
+        """ Number of parsed leaf values in the document, for the per-field cost """
+        return count_fields(self.document)
+
+
+def count_fields(value: Any) -> int:
+    if isinstance(value, dict):
+        return sum(count_fields(v) for v in value.values())
+    if isinstance(value, list):
+        return sum(count_fields(v) for v in value)
+    return 1
+
+
+def random_labels(rng: random.Random, count: int) -> list[str]:
+    labels: dict[str, None] = {}
+    while len(labels) < count:
+        length = rng.randint(2, 12)
+        labels["".join(rng.choice(string.ascii_uppercase + "_") for _ in range(length))] = None
+    return list(labels)
+
+
+def enum_benchmark(label_count: int) -> Benchmark:
+    rng = random.Random(label_count)
+    labels = random_labels(rng, label_count)
+    values = [rng.choice(labels) for _ in range(ENUM_VALUES_PER_DOCUMENT)]
+    schema = {
+        "$id": "bench",
+        "type": "array",
+        "maxItems": len(values),
+        "items": {"type": "string", "enum": labels},
+    }
+    return Benchmark(f"enum_{label_count}_labels", schema, values)
+
+
+def telemetry_benchmark(float_parser: str) -> Benchmark:
+    """ Arrays of sensor readings: a timestamp and a few doubles each, mostly with a handful of decimals """
+    rng = random.Random(0)
+    samples = [
+        {
+            "timestamp": 1700000000.0 + i * 0.25,
+            "values": [round(rng.uniform(-1000, 1000), rng.randint(1, 6)) for _ in range(6)] + [rng.gauss(0, 1e-3)],
+        }
+        for i in range(TELEMETRY_SAMPLES_PER_DOCUMENT)
+    ]
+    schema = {
+        "$id": "bench",
+        "js2cSettings": {"floatParser": float_parser},
+        "type": "array",
+        "maxItems": len(samples),
+        "items": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["timestamp", "values"],
+            "properties": {
+                "timestamp": {"type": "number"},
+                "values": {"type": "array", "maxItems": 8, "items": {"type": "number"}},
+            },
+        },
+    }
+    return Benchmark(f"telemetry_{float_parser}", schema, samples)
+
+
+def log_benchmark() -> Benchmark:
+    """ Log records with long messages and a base64 payload, where finding the end of strings dominates """
+    rng = random.Random(0)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(500)]
+    lines = [
+        {
+            "level": rng.choice(["debug", "info", "warning", "error"]),
+            "message": " ".join(rng.choice(words) for _ in range(rng.randint(20, 60))),
+            "payload": "".join(rng.choice(string.ascii_letters + string.digits + "+/") for _ in range(rng.randint(200, 1000))),
+        }
+        for _ in range(LOG_LINES_PER_DOCUMENT)
+    ]
+    schema = {
+        "$id": "bench",
+        "type": "array",
+        "maxItems": len(lines),
+        "items": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["level", "message", "payload"],
+            "properties": {
+                "level": {"type": "string", "maxLength": 16},
+                "message": {"type": "string", "maxLength": 1024},
+                "payload": {"type": "string", "maxLength": 1024},
+            },
+        },
+    }
+    return Benchmark("log_lines", schema, lines)
+
+
+def wide_object_benchmark() -> Benchmark:
+    """ Objects with a lot of fields of every simple type, where looking up the keys dominates """
+    rng = random.Random(0)
+    field_schemas: dict[str, dict[str, Any]] = {
+        "integer": {"type": "integer", "minimum": -1000000, "maximum": 1000000},
+        "number": {"type": "number"},
+        "boolean": {"type": "boolean"},
+        "string": {"type": "string", "maxLength": 16},
+    }
+    field_types = {
+        f"{name}_{i}": rng.choice(list(field_schemas))
+        for i, name in enumerate(random_labels(rng, WIDE_OBJECT_FIELDS))
+    }
+
+    def field_value(field_type: str) -> Any:
+        if field_type == "integer":
+            return rng.randint(-1000000, 1000000)
+        if field_type == "number":
+            return round(rng.uniform(-1000, 1000), 3)
+        if field_type == "boolean":
+            return rng.random() < 0.5
+        return "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(0, 16)))
+
+    objects = []
+    for _ in range(WIDE_OBJECTS_PER_DOCUMENT):
+        # The keys come in a different order in every object, like from a hash map
+        field_names = list(field_types)
+        rng.shuffle(field_names)
+        objects.append({name: field_value(field_types[name]) for name in field_names})
+    schema = {
+        "$id": "bench",
+        "type": "array",
+        "maxItems": len(objects),
+        "items": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": list(field_types),
+            "properties": {name: field_schemas[field_type] for name, field_type in field_types.items()},
+        },
+    }
+    return Benchmark("wide_object", schema, objects)
+
+
+def deep_nesting_benchmark() -> Benchmark:
+    """ Objects nested NESTING_DEPTH deep, with a single small field on every level """
+    rng = random.Random(0)
+    item_schema: dict[str, Any] = {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["id"],
+        "properties": {"id": {"type": "integer"}},
+    }
+    for _ in range(NESTING_DEPTH - 1):
+        item_schema = {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["id", "child"],
+            "properties": {"id": {"type": "integer"}, "child": item_schema},
+        }
+
+    def nested_object(depth: int) -> dict[str, Any]:
+        if depth == 1:
+            return {"id": rng.randint(0, 1000)}
+        return {"id": rng.randint(0, 1000), "child": nested_object(depth - 1)}
+
+    objects = [nested_object(NESTING_DEPTH) for _ in range(NESTED_OBJECTS_PER_DOCUMENT)]
+    schema = {
+        "$id": "bench",
+        "type": "array",
+        "maxItems": len(objects),
+        "items": item_schema,
+    }
+    return Benchmark("deep_nesting", schema, objects)
+
+
+def numeric_array_benchmark(item_type: str) -> Benchmark:
+    """ A single large array of integers or numbers, of every magnitude """
+    rng = random.Random(0)
+    if item_type == "integer":
+        values: list[Any] = [rng.randint(-10 ** rng.randint(1, 18), 10 ** rng.randint(1, 18)) for _ in range(NUMBERS_PER_DOCUMENT)]
+    else:
+        values = [rng.uniform(-1, 1) * 10 ** rng.randint(-10, 10) for _ in range(NUMBERS_PER_DOCUMENT)]
+    schema = {
+        "$id": "bench",
+        "type": "array",
+        "maxItems": len(values),
+        "items": {"type": item_type},
+    }
+    return Benchmark(f"{item_type}_array", schema, values)
+
+
+def skewed_updates_benchmark(profiled: bool) -> Benchmark:
+    """ Updates of a wide object, which nearly always set the same few fields. Profiled, they are looked up first. """
+    rng = random.Random(0)
+    field_names = [f"{name}_{i}" for i, name in enumerate(random_labels(rng, SKEWED_OBJECT_FIELDS))]
+    hot_fields = rng.sample(field_names, SKEWED_HOT_FIELDS)
+    updates = []
+    for _ in range(SKEWED_OBJECTS_PER_DOCUMENT):
+        update_fields = hot_fields + ([rng.choice(field_names)] if rng.random() < 0.05 else [])
+        updates.append({name: rng.randint(-1000000, 1000000) for name in update_fields})
+    schema = {
+        "$id": "bench",
+        "type": "array",
+        "maxItems": len(updates),
+        "items": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                name: {"type": "integer", "minimum": -1000000, "maximum": 1000000, "default": 0} for name in field_names
+            },
+        },
+    }
+    # The counts a --count-hits parser would save after parsing the document
+    hit_profile = {"fields": {".items": {name: sum(name in update for update in updates) for name in field_names}}}
+    if not profiled:
+        return Benchmark("skewed_updates", schema, updates)
+    return Benchmark("skewed_updates_profiled", schema, updates, hit_profile)
+
+
+def union_benchmark() -> Benchmark:
+    """ An array of anyOf values: numbers, strings, and objects told apart by a "kind" field """
+    rng = random.Random(0)
+    point_schema = {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["kind", "x", "y"],
+        "properties": {"kind": {"const": "point"}, "x": {"type": "integer"}, "y": {"type": "integer"}},
+    }
+    circle_schema = {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["kind", "x", "y", "radius"],
+        "properties": {
+            "kind": {"const": "circle"}, "x": {"type": "integer"}, "y": {"type": "integer"}, "radius": {"type": "number"},
+        },
+    }
+    label_schema = {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["kind", "text"],
+        "properties": {"kind": {"const": "label"}, "text": {"type": "string", "maxLength": 32}},
+    }
+
+    def union_value() -> Any:
+        kind = rng.choice(["integer", "string", "point", "circle", "label"])
+        if kind == "integer":
+            return rng.randint(-1000000, 1000000)
+        if kind == "string":
+            return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 32)))
+        if kind == "point":
+            return {"kind": "point", "x": rng.randint(-1000, 1000), "y": rng.randint(-1000, 1000)}
+        if kind == "circle":
+            return {"kind": "circle", "x": rng.randint(-1000, 1000), "y": rng.randint(-1000, 1000), "radius": round(rng.uniform(0, 100), 2)}
+        return {"kind": "label", "text": "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(1, 32)))}
+
+    values = [union_value() for _ in range(UNION_VALUES_PER_DOCUMENT)]
+    schema = {
+        "$id": "bench",
+        "type": "array",
+        "maxItems": len(values),
+        "items": {
+            "anyOf": [
+                {"type": "integer"},
+                {"type": "string", "maxLength": 32},
+                point_schema,
+                circle_schema,
+                label_schema,
+            ],
+        },
+    }
+    return Benchmark("union", schema, values)
+
+
+def long_strings_benchmark(string_storage: str) -> Benchmark:
+    """ A few very long strings of text, with an occasional escape or non-ASCII character """
+    rng = random.Random(0)
+    alphabet = string.ascii_letters + string.digits + " " * 10 + ".,"
+    rare_characters = ["\n", "\"", "\t", "\u00e9", "\u20ac"]
+
+    def long_string() -> str:
+        return "".join(
+            rng.choice(rare_characters) if rng.random() < 0.002 else rng.choice(alphabet)
+            for _ in range(LONG_STRING_LENGTH)
+        )
+
+    values = [long_string() for _ in range(LONG_STRINGS_PER_DOCUMENT)]
+    schema = {
+        "$id": "bench",
+        "js2cSettings": {"stringStorage": string_storage},
+        "type": "array",
+        "maxItems": len(values),
+        # Large enough for both the escaped length and the decoded UTF-8 length
+        "items": {"type": "string", "maxLength": LONG_STRING_LENGTH * 6},
+    }
+    return Benchmark(f"long_strings_{string_storage}", schema, values)
+
+
+BENCHMARKS = [enum_benchmark(label_count) for label_count in (4, 16, 64, 256, 1024)] + [
+    telemetry_benchmark(float_parser) for float_parser in ("strtod", "eisel_lemire")
+] + [
+    log_benchmark(),
+    wide_object_benchmark(),
+    deep_nesting_benchmark(),
+    numeric_array_benchmark("integer"),
+    numeric_array_benchmark("number"),
+    union_benchmark(),
+    skewed_updates_benchmark(profiled=False),
+    skewed_updates_benchmark(profiled=True),
+] + [long_strings_benchmark(string_storage) for string_storage in ("escaped", "unescaped")]
+
+
+def build(benchmark: Benchmark, parser_backend: str) -> str:
+    build_dir = os.path.join(BUILD_DIR, benchmark.name)
+    os.makedirs(build_dir, exist_ok=True)
+    schema_file = os.path.join(build_dir, "bench.schema.json")
+    with open(schema_file, "w", encoding="utf-8") as f:
+        json.dump(benchmark.schema, f, indent=4)
+    with open(os.path.join(build_dir, "document.json"), "w", encoding="utf-8") as f:
+        json.dump(benchmark.document, f)
+    profile_arguments = []
+    if benchmark.hit_profile is not None:
+        hit_profile_file = os.path.join(build_dir, "hit_profile.json")
+        with open(hit_profile_file, "w", encoding="utf-8") as f:
+            json.dump(benchmark.hit_profile, f)
+        profile_arguments = ["--hit-profile", hit_profile_file]
+    c_file = os.path.join(build_dir, "bench.parser.c")
+    subprocess.run(
+        [
+            sys.executable, GENERATOR, "--parser-backend", parser_backend, *profile_arguments,
+            schema_file, c_file, os.path.join(build_dir, "bench.parser.h"),
+        ],
+        check=True,
+    )
+    executable = os.path.join(build_dir, "bench")
+    subprocess.run(
+        [CC, *CFLAGS, "-I", build_dir, os.path.join(BENCH_DIR, "harness.c"), c_file, "-o", executable],
+        check=True,
+    )
+    return executable
+
+
+def run(benchmark: Benchmark, executable: str, min_seconds: float) -> dict[str, Any]:
+    document_file = os.path.join(BUILD_DIR, benchmark.name, "document.json")
+    output = subprocess.run(
+        [executable, document_file, str(min_seconds)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    iterations, elapsed_ns = (int(x) for x in output.split())
+    document_bytes = os.path.getsize(document_file)
+    return {
+        "name": benchmark.name,
+        "document_bytes": document_bytes,
+        "fields": benchmark.fields,
+        "iterations": iterations,
+        "elapsed_ns": elapsed_ns,
+        "mb_per_second": document_bytes * iterations / elapsed_ns * 1e3,
+        "documents_per_second": iterations / elapsed_ns * 1e9,
+        "ns_per_field": elapsed_ns / (iterations * benchmark.fields),
+    }
+
+
+def git_commit() -> str | None:
+    result = subprocess.run(
+        ["git", "-C", BENCH_DIR, "describe", "--always", "--dirty"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def load_baseline(path: str) -> dict[str, dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return {result["name"]: result for result in json.load(f)["results"]}
+
+
+def format_change(result: dict[str, Any], baseline: dict[str, dict[str, Any]]) -> str:
+    if result["name"] not in baseline:
+        return ""
+    change = result["ns_per_field"] / baseline[result["name"]]["ns_per_field"] - 1
+    return f" {change:>+8.1%}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("filter", nargs="*", help="Only run the benchmarks whose name contains one of these.")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Minimum time to run each benchmark for.")
+    parser.add_argument("--parser-backend", default="jsmn", help="Backend of the generated parsers, see json_schema_to_c.py.")
+    parser.add_argument("--json", metavar="FILE", help="Save the results to FILE, to be used with --compare later.")
+    parser.add_argument(
+        "--compare", metavar="FILE",
+        help="Also print the change in ns/field compared to the results in FILE, saved with --json.\n"
+        "Negative is faster.",
+    )
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else {}
+    print(f"{'benchmark':<30} {'MB/s':>10} {'documents/s':>14} {'ns/field':>10}" + (f" {'change':>8}" if baseline else ""))
+    results = []
+    for benchmark in BENCHMARKS:
+        if args.filter and not any(f in benchmark.name for f in args.filter):
+            continue
+        result = run(benchmark, build(benchmark, args.parser_backend), args.min_seconds)
+        results.append(result)
+        print(
+            f"{result['name']:<30} {result['mb_per_second']:>10.1f} {result['documents_per_second']:>14.1f} "
+            f"{result['ns_per_field']:>10.2f}" + format_change(result, baseline)
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "parser_backend": args.parser_backend,
+                    "cc": CC,
+                    "cflags": CFLAGS,
+                    "results": results,
+                },
+                f,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+/*
+ * MIT License
+ *
+ * Copyright (c) 2020 Alex Badics
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to deal
+ * in the Software without restriction, including without limitation the rights
+ * to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+ * copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ *
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+ * OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+ * SOFTWARE.
+ */
+
+/* Parses one document in a loop, and prints "<iterations> <elapsed nanoseconds>".
+ * Compiled against each benchmark's generated bench.parser.h by bench.py. */
+
+#include "bench.parser.h"
+
+#include <inttypes.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+
+static uint64_t now_ns(void) {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (uint64_t)ts.tv_sec * 1000000000u + (uint64_t)ts.tv_nsec;
+}
+
+static char *read_file(const char *path, size_t *length) {
+    FILE *file = fopen(path, "rb");
+    if (!file) {
+        return NULL;
+    }
+    fseek(file, 0, SEEK_END);
+    *length = (size_t)ftell(file);
+    fseek(file, 0, SEEK_SET);
+    char *data = malloc(*length + 1);
+    if (data && fread(data, 1, *length, file) != *length) {
+        free(data);
+        data = NULL;
+    }
+    fclose(file);
+    if (data) {
+        data[*length] = 0;
+    }
+    return data;
+}
+
+/* Static, as some benchmark types are too large for the stack. */
+static bench_t out;
+
+int main(int argc, char **argv) {
+    if (argc != 3) {
+        fprintf(stderr, "Usage: %s <document.json> <minimum seconds>\n", argv[0]);
+        return 2;
+    }
+    size_t length = 0;
+    const char *document = read_file(argv[1], &length);
+    if (!document) {
+        fprintf(stderr, "Could not read %s\n", argv[1]);
+        return 2;
+    }
+    const uint64_t minimum_ns = (uint64_t)(atof(argv[2]) * 1e9);
+
+    uint64_t iterations = 0;
+    const uint64_t start = now_ns();
+    uint64_t elapsed = 0;
+    do {
+        for (int i = 0; i < 64; ++i) {
+            if (json_parse_bench_with_len(document, length, &out)) {
+                fprintf(stderr, "Could not parse %s\n", argv[1]);
+                return 1;
+            }
+        }
+        iterations += 64;
+        elapsed = now_ns() - start;
+    } while (elapsed < minimum_ns);
+
+    printf("%" PRIu64 " %" PRIu64 "\n", iterations, elapsed);
+    return 0;
+}
@@ -38,16 +38,53 @@ class RawJsonType(CType):
         out_file.print("")
 
 
+class StringViewType(CType):
+    def generate_type_declaration_impl(self, out_file: CodeBlockPrinter) -> None:
+        out_file.print(f"typedef struct {self.type_name}_s {{")
+        with out_file.indent():
+            out_file.print_with_docstring("const char *chars;", "Points into the input JSON, not NUL terminated")
+            out_file.print("size_t length;")
+            out_file.print_with_docstring("bool has_escapes;", "chars has escape sequences, which are not decoded")
+        out_file.print(f"}} {self.type_name};")
+        out_file.print("")
+
+
 class AlternateStorageGenerator(Generator):
     # Reserved js2cType values that store a value differently instead of naming a C type.
-    STORAGE_FORMATS = ("void", "raw")
+    STORAGE_FORMATS = ("void", "raw", "view")
+    JSON_FIELDS = Generator.JSON_FIELDS + (
+        "minLength",
+        "maxLength",
+        "default",
+    )
+
+    # Only used by views, which still check the string
+    minLength: int = 0
+    maxLength: int | None = None
+    default: str | None = None
 
     def __init__(self, schema: dict[str, Any], parameters: GeneratorInitParameters) -> None:
         super().__init__(schema, parameters)
+        if self.js2cType == "view":
+            # A view points into the input text: there is no copy, so no maxLength is needed either.
+            if schema.get("type") != "string":
+                raise SchemaError(self, "A view js2cType can only be used on strings")
+            if self.default is not None and self.maxLength is not None and len(self.default) > self.maxLength:
+                raise SchemaError(self, "String default value longer than maxLength")
+            if self.default is not None and len(self.default) < self.minLength:
+                raise SchemaError(self, "String default value shorter than minLength")
+            self.type_name = parameters.base_name + "_json_view_t"
+            self.c_type = parameters.type_cache.try_get_cached(StringViewType(self.type_name, self.description), self.path_in_schema)
+            return
         # A void stores nothing, and a raw is a reference into the input text, so neither has
         # anything a default could name.
         if self.js2cDefault is not None:
             raise SchemaError(self, "A void or raw js2cType cannot have a js2cDefault")
+        if self.default is not None:
+            raise SchemaError(self, "A void or raw js2cType cannot have a default")
+        # Nothing is stored to check the length of.
+        if "minLength" in schema or "maxLength" in schema:
+            raise SchemaError(self, "A void or raw js2cType cannot have a minLength or maxLength")
         if self.js2cType == "raw":
             self.type_name = parameters.base_name + "_json_ref_t"
             self.c_type = parameters.type_cache.try_get_cached(RawJsonType(self.type_name, self.description), self.path_in_schema)
@@ -58,18 +95,69 @@ class AlternateStorageGenerator(Generator):
     def can_parse_schema(cls, schema: dict[str, Any]) -> bool:
         return schema.get("js2cType") in cls.STORAGE_FORMATS
 
+    def first_token_types(self) -> frozenset[str]:
+        if self.js2cType == "view":
+            return frozenset(("JSMN_STRING",))
+        return super().first_token_types()
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
-        if self.js2cType == "raw":
-            out_var = out_var_name.removeprefix("&")
+        if self.js2cType == "view":
+            # out_var_name is a pointer, usually the address of a field
+            view = out_var_name[1:] + "." if out_var_name.startswith("&") else out_var_name + "->"
+            max_length = -1 if self.maxLength is None else self.maxLength
+            parser_call = (
+                f"builtin_parse_string_view(parse_state, &{view}chars, &{view}length, &{view}has_escapes, "
+                f"{self.minLength}, {max_length})"
+            )
+            with out_file.if_block(parser_call):
+                out_file.print("return true;")
+            return
+        out_var = out_var_name.removeprefix("&")
+        if self.js2cType == "raw" and not self.direct_backend:
             out_file.print(f"{out_var}.index = (size_t) CURRENT_TOKEN(parse_state).start;")
             out_file.print(
                 f"{out_var}.length = (size_t) (CURRENT_TOKEN(parse_state).end - CURRENT_TOKEN(parse_state).start);"
             )
         with out_file.if_block("builtin_skip(parse_state)"):
             out_file.print("return true;")
+        if self.js2cType == "raw" and self.direct_backend:
+            # A container's end is only known once it is skipped, and it stays the current token.
+            out_file.print(f"{out_var}.index = (size_t) CURRENT_TOKEN(parse_state).start;")
+            out_file.print(
+                f"{out_var}.length = (size_t) (CURRENT_TOKEN(parse_state).end - CURRENT_TOKEN(parse_state).start);"
+            )
+
+    def can_serialize(self) -> bool:
+        # A raw is a reference into an input that the serializer doesn't have.
+        return super().can_serialize() and self.js2cType != "raw"
+
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        # A void is left out of its object, like an unknown field, so this is only called for views.
+        assert self.js2cType == "view"
+        view = in_var_name[1:] + "." if in_var_name.startswith("&") else in_var_name + "->"
+        with out_file.if_block(f"builtin_serialize_string_view(serialize_state, {view}chars, {view}length, {view}has_escapes)"):
+            out_file.print("return true;")
+
+    def max_serialized_size(self) -> int | None:
+        if self.js2cType == "void":
+            return 0
+        if self.js2cType == "raw" or self.maxLength is None:
+            return None
+        # A view without escapes is escaped when it is written, so every character may become a 6 character \u escape.
+        return 6 * self.maxLength + 2
+
+    def has_default_value(self) -> bool:
+        return super().has_default_value() or self.default is not None
 
     def generate_set_default_value(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
-        raise AssertionError("has_default_value() is always false: a void or raw cannot have a js2cDefault.")
+        assert self.js2cType == "view", "has_default_value() is always false: a void or raw cannot have a default or js2cDefault."
+        if self.generate_js2c_default_value(out_var_name, out_file):
+            return
+        assert self.default is not None
+        # The default is not in the input, so it points to a string literal
+        out_file.print(f'{out_var_name}.chars = "{self.default}";')
+        out_file.print(f"{out_var_name}.length = {len(self.default)};")
+        out_file.print(f"{out_var_name}.has_escapes = false;")
 
     def max_token_num(self) -> int:
         # A skipped value is at least one token; composite values need extra token headroom
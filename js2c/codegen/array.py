@@ -26,13 +26,16 @@ from typing import Any
 
 from .base import Generator, CType, SchemaError, GeneratorInitParameters
 from .code_block_printer import CodeBlockPrinter
+from .runtime_stats import parser_function
 
 
 class ArrayType(CType):
-    def __init__(self, type_name: str, description: str | None, item_type: CType, max_items: int) -> None:
+    def __init__(self, type_name: str, description: str | None, item_type: CType, max_items: int, arena: bool = False) -> None:
         super().__init__(type_name, description)
         self.item_type = item_type
         self.max_items = max_items
+        # The items are allocated from the caller's arena, instead of stored in the struct
+        self.arena = arena
 
     def generate_type_declaration_impl(self, out_file: CodeBlockPrinter) -> None:
         self.item_type.generate_type_declaration(out_file)
@@ -41,7 +44,7 @@ class ArrayType(CType):
         with out_file.indent():
             out_file.print_with_docstring("uint64_t n;", "The number of elements in the array")
             self.item_type.generate_field_declaration(
-                f"items[{self.max_items}]", out_file
+                "*items" if self.arena else f"items[{self.max_items}]", out_file
             )
         out_file.print(f"}} {self.type_name};")
         out_file.print("")
@@ -51,7 +54,8 @@ class ArrayType(CType):
             super().__eq__(other) and
             isinstance(other, ArrayType) and
             self.max_items == other.max_items and
-            self.item_type == other.item_type
+            self.item_type == other.item_type and
+            self.arena == other.arena
         )
 
 
@@ -82,7 +86,8 @@ class ArrayGenerator(Generator):
             self.type_name,
             self.description,
             self.item_generator.c_type,
-            self.maxItems
+            self.maxItems,
+            self.arena_allocation,
         )
         self.c_type = parameters.type_cache.try_get_cached(self.c_type, self.path_in_schema)
 
@@ -90,6 +95,9 @@ class ArrayGenerator(Generator):
     def can_parse_schema(cls, schema: dict[str, Any]) -> bool:
         return schema.get('type') == 'array'
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(("JSMN_ARRAY",))
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         parser_call = f"parse_{self.parser_name}(parse_state, {out_var_name})"
         with out_file.if_block(parser_call):
@@ -108,24 +116,121 @@ class ArrayGenerator(Generator):
                     out_file
                 )
 
+    def generate_jsmn_array_parser(self, out_file: CodeBlockPrinter) -> None:
+        out_file.print("const int n = parse_state->tokens[parse_state->current_token].size;")
+        self.generate_range_checks(out_file)
+        out_file.print("out->n = n;")
+        if self.arena_allocation:
+            self.generate_items_allocation(out_file)
+        out_file.print("parse_state->current_token += 1;")
+        with out_file.for_block("int i = 0; i < n; ++i"):
+            self.item_generator.generate_parser_call(
+                "&out->items[i]",
+                out_file
+            )
+
+    def generate_items_allocation(self, out_file: CodeBlockPrinter) -> None:
+        out_file.print(
+            f"out->items = ({self.item_generator.c_type} *)builtin_arena_alloc(parse_state, (size_t)n * sizeof(*out->items), JS2C_ARENA_ALIGNMENT);"
+        )
+        with out_file.if_block("out->items == NULL"):
+            out_file.print("return true;")
+
+    def generate_direct_arena_array_parser(self, out_file: CodeBlockPrinter) -> None:
+        # The items are allocated before they are parsed, so they are counted first, on a copy of the parse state.
+        out_file.print("const jsmntok_t array_start_token = CURRENT_TOKEN(parse_state);")
+        out_file.print("int n;")
+        with out_file.if_block("builtin_count_elements(parse_state, &n)"):
+            out_file.print("return true;")
+        self.generate_range_checks(out_file)
+        out_file.print("out->n = n;")
+        self.generate_items_allocation(out_file)
+        with out_file.for_block("int i = 0; i < n; ++i"):
+            with out_file.if_block("builtin_next_element(parse_state, i == 0)"):
+                out_file.print("return true;")
+            self.item_generator.generate_parser_call(
+                "&out->items[i]",
+                out_file
+            )
+        # The closing bracket
+        with out_file.if_block("builtin_next_element(parse_state, n == 0)"):
+            out_file.print("return true;")
+        out_file.print("CURRENT_TOKEN(parse_state) = array_start_token;")
+
+    def generate_direct_array_parser(self, out_file: CodeBlockPrinter) -> None:
+        # The length is only known at the closing bracket. Elements that don't fit are still
+        # lexed, to report the actual length.
+        out_file.print("const jsmntok_t array_start_token = CURRENT_TOKEN(parse_state);")
+        out_file.print("int n = 0;")
+        with out_file.for_block("; ; ++n"):
+            with out_file.if_block("builtin_next_element(parse_state, n == 0)"):
+                out_file.print("return true;")
+            with out_file.if_block("CURRENT_TOKEN(parse_state).type == JSMN_UNDEFINED"):
+                out_file.print("break;")
+            with out_file.if_block(f"n >= {self.maxItems}"):
+                with out_file.if_block("builtin_skip(parse_state)"):
+                    out_file.print("return true;")
+                out_file.print("continue;")
+            self.item_generator.generate_parser_call(
+                "&out->items[n]",
+                out_file
+            )
+        # The array stays the current token, so the errors below are reported at its start.
+        out_file.print("CURRENT_TOKEN(parse_state) = array_start_token;")
+        self.generate_range_checks(out_file)
+        out_file.print("out->n = n;")
+
     def generate_parser_bodies(self, out_file: CodeBlockPrinter) -> None:
         self.item_generator.generate_parser_bodies(out_file)
 
-        out_file.print(f"static bool parse_{self.parser_name}(parse_state_t *parse_state, {self.c_type} *out)")
-        with out_file.code_block():
-            with out_file.if_block("check_type(parse_state, JSMN_ARRAY)"):
-                out_file.print("return true;")
-            out_file.print("const int n = parse_state->tokens[parse_state->current_token].size;")
-            self.generate_range_checks(out_file)
-            out_file.print("out->n = n;")
-            out_file.print("parse_state->current_token += 1;")
-            with out_file.for_block("int i = 0; i < n; ++i"):
-                self.item_generator.generate_parser_call(
-                    "&out->items[i]",
-                    out_file
-                )
-            out_file.print("return false;")
-        out_file.print("")
+        with self.unique_functions("parser_name", out_file) as functions:
+            with parser_function(self, str(self.c_type), functions):
+                with functions.if_block("check_type(parse_state, JSMN_ARRAY)"):
+                    functions.print("return true;")
+                if self.direct_backend and self.arena_allocation:
+                    self.generate_direct_arena_array_parser(functions)
+                elif self.direct_backend:
+                    self.generate_direct_array_parser(functions)
+                else:
+                    self.generate_jsmn_array_parser(functions)
+                functions.print("return false;")
+            functions.print("")
+
+    def can_serialize(self) -> bool:
+        return super().can_serialize() and self.item_generator.can_serialize()
+
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        with out_file.if_block(f"serialize_{self.serializer_name}(serialize_state, {in_var_name})"):
+            out_file.print("return true;")
+
+    def generate_serializer_bodies(self, out_file: CodeBlockPrinter) -> None:
+        self.item_generator.generate_serializer_bodies(out_file)
+
+        with self.unique_functions("serializer_name", out_file) as functions:
+            functions.print(f"static bool serialize_{self.serializer_name}(serialize_state_t *serialize_state, const {self.c_type} *in)")
+            with functions.code_block():
+                if not self.arena_allocation:
+                    # Only the parser checks n, and the items past maxItems would be read from outside the struct.
+                    with functions.if_block(f"in->n > {self.maxItems}"):
+                        self.generate_serializer_error(
+                            f"Array '%s' too large to serialize. Length: %\" PRIu64 \". Maximum length: {self.maxItems}.", "in->n", functions
+                        )
+                self.generate_serialized_literal(b"[", functions)
+                with functions.for_block("uint64_t i = 0; i < in->n; ++i"):
+                    with functions.if_block('i != 0 && builtin_serialize_literal(serialize_state, ",", 1)'):
+                        functions.print("return true;")
+                    self.item_generator.generate_serializer_call("&in->items[i]", functions)
+                self.generate_serialized_literal(b"]", functions)
+                functions.print("return false;")
+            functions.print("")
+
+    def max_serialized_size(self) -> int | None:
+        assert self.maxItems is not None, "__init__ rejects an array without maxItems."
+        item_size = self.item_generator.max_serialized_size()
+        if item_size is None:
+            return None
+        # The brackets, and the items with the commas between them
+        return 2 + self.maxItems * item_size + max(self.maxItems - 1, 0)
 
     def has_default_value(self) -> bool:
         return super().has_default_value() or self.minItems == 0
@@ -134,6 +239,8 @@ class ArrayGenerator(Generator):
         if self.generate_js2c_default_value(out_var_name, out_file):
             return
         out_file.print(f"{out_var_name}.n = 0;")
+        if self.arena_allocation:
+            out_file.print(f"{out_var_name}.items = NULL;")
 
     def max_token_num(self) -> int:
         assert self.maxItems is not None, "__init__ rejects an array without maxItems."
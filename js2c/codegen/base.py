@@ -24,16 +24,21 @@
 #
 from __future__ import annotations
 
+import json
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
 from typing import TYPE_CHECKING, Any, NamedTuple
 
 from ..settings import Settings
 from .code_block_printer import CodeBlockPrinter
+from .function_cache import NAME_PLACEHOLDER, FunctionCache
 
 if TYPE_CHECKING:
     # Both import this module, so they can only be named in annotations.
     from .generator_factory import GeneratorFactory
+    from .hit_profile import HitProfile
+    from .runtime_stats import RuntimeStats
     from .type_cache import TypeCache
 
 # Names that can't be used as C identifiers: keywords, plus the stdbool.h macros.
@@ -45,6 +50,34 @@ C_RESERVED = frozenset((
     "bool", "true", "false",
 ))
 
+# The types a JSON value's first token can have.
+TOKEN_TYPES = frozenset(("JSMN_OBJECT", "JSMN_ARRAY", "JSMN_STRING", "JSMN_PRIMITIVE"))
+JSON_TYPES_BY_TOKEN_TYPE = {
+    "JSMN_OBJECT": frozenset(("object",)),
+    "JSMN_ARRAY": frozenset(("array",)),
+    "JSMN_STRING": frozenset(("string",)),
+    "JSMN_PRIMITIVE": frozenset(("number", "boolean", "null")),
+}
+
+
+def c_string_literal(value: bytes) -> str:
+    """ value as a C string literal. Anything but printable ASCII is an octal escape, which can't run into the next character. """
+    characters = []
+    for byte in value:
+        if chr(byte) in '"\\':
+            # Their short escapes can't run into the next character either.
+            characters.append("\\" + chr(byte))
+        elif 0x20 <= byte < 0x7F and chr(byte) != '?':
+            characters.append(chr(byte))
+        else:
+            characters.append(f"\\{byte:03o}")
+    return '"' + "".join(characters) + '"'
+
+
+def json_literal(value: Any) -> bytes:
+    """ value as compact JSON, in UTF-8, the way the serializers write it """
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
 
 class SchemaError(ValueError):
     def __init__(self, generator_or_path: Generator | str, message: str) -> None:
@@ -57,6 +90,16 @@ class SchemaError(ValueError):
         super().__init__(f"Schema error in '{path}': {message}")
 
 
+class SharedState(NamedTuple):
+    """ Shared by all the generators of a schema, which fill it while printing their functions """
+    function_cache: FunctionCache
+    hit_profile: HitProfile
+    runtime_stats: RuntimeStats
+    # The generator of every schema node by id(), so the uses of a resolved $ref share it. The node is kept,
+    # so its id can't be reused.
+    generators: dict[int, tuple[Any, Generator]]
+
+
 class GeneratorInitParameters(NamedTuple):
     path_in_schema: str
     base_name: str
@@ -65,6 +108,7 @@ class GeneratorInitParameters(NamedTuple):
     settings: Settings
     generator_factory: type[GeneratorFactory]
     type_cache: TypeCache
+    shared: SharedState
 
     def with_suffix(self, path_in_schema: str, type_name: str, suffix: str) -> GeneratorInitParameters:
         return GeneratorInitParameters(
@@ -75,6 +119,7 @@ class GeneratorInitParameters(NamedTuple):
             self.settings,
             self.generator_factory,
             self.type_cache,
+            self.shared,
         )
 
 
@@ -102,6 +147,9 @@ class Generator(ABC):
         self.path_in_schema = parameters.path_in_schema
         self.settings = parameters.settings
         self.parser_name = parameters.parser_name
+        # Only differs from parser_name if the serializer, or the parser, is shared with another generator.
+        self.serializer_name = parameters.parser_name
+        self.shared = parameters.shared
 
         # js2cDefault is pasted into the C code as-is, so anything whose str() is not a C
         # expression ends up in the output verbatim. bool is checked first, being an int.
@@ -117,6 +165,16 @@ class Generator(ABC):
         else:
             self.type_name = parameters.type_name
 
+    @property
+    def direct_backend(self) -> bool:
+        """ Whether the parser lexes the tokens straight from the JSON string, instead of a jsmn token buffer """
+        return self.settings.parser_backend == "direct"
+
+    @property
+    def arena_allocation(self) -> bool:
+        """ Whether strings and array items are allocated from the caller's arena, instead of stored inline """
+        return self.settings.allocation == "arena"
+
     @abstractmethod
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         pass
@@ -133,6 +191,30 @@ class Generator(ABC):
     def generate_parser_bodies(self, out_file: CodeBlockPrinter) -> None:
         pass
 
+    @contextmanager
+    def unique_functions(self, name_attribute: str, out_file: CodeBlockPrinter) -> Iterator[CodeBlockPrinter]:
+        """
+        Collect the functions of this generator (but not of its children) named after name_attribute,
+        "parser_name" or "serializer_name". If another generator printed the very same functions,
+        they are not printed again, and the name is switched to that generator's, so the calls go there.
+        """
+        name = getattr(self, name_attribute)
+        setattr(self, name_attribute, NAME_PLACEHOLDER)
+        functions = CodeBlockPrinter(out_file.filepath)
+        try:
+            yield functions
+        finally:
+            setattr(self, name_attribute, name)
+        setattr(self, name_attribute, self.shared.function_cache.print_unique(functions, name, out_file))
+
+    def first_token_types(self) -> frozenset[str]:
+        """ The token types a valid value can start with. A union only tries the options that accept the token. """
+        return TOKEN_TYPES
+
+    def json_types(self) -> frozenset[str]:
+        """ The JSON types a valid value can have. Options with none in common can be tried in any order. """
+        return frozenset().union(*(JSON_TYPES_BY_TOKEN_TYPE[token_type] for token_type in self.first_token_types()))
+
     def has_default_value(self) -> bool:
         return self.js2cDefault is not None
 
@@ -148,6 +230,32 @@ class Generator(ABC):
     def generate_set_default_value(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         """Emit the value of an absent field. Only called when has_default_value() is true."""
 
+    def can_serialize(self) -> bool:
+        """ Whether json_serialize_* can write the stored value back. The output of a js2cParseFunction can't be. """
+        return self.js2cParseFunction is None
+
+    @abstractmethod
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        """Emit writing the value in_var_name points to. Only called when can_serialize() is true."""
+
+    def generate_serializer_bodies(self, out_file: CodeBlockPrinter) -> None:
+        pass
+
+    @abstractmethod
+    def max_serialized_size(self) -> int | None:
+        """The length of the longest JSON written for a parsed value, or None if there is no limit."""
+
+    @classmethod
+    def generate_serialized_literal(cls, literal: bytes, out_file: CodeBlockPrinter) -> None:
+        with out_file.if_block(f"builtin_serialize_literal(serialize_state, {c_string_literal(literal)}, {len(literal)})"):
+            out_file.print("return true;")
+
+    def generate_serializer_error(self, log_message: str, log_arg: str, out_file: CodeBlockPrinter) -> None:
+        # There is no current key when serializing: the '%s' of the message is the place in the schema instead.
+        path = self.path_in_schema or "<root>"
+        out_file.print(f'LOG_ERROR(serialize_state->length, "{log_message}", "{path}", {log_arg});')
+        out_file.print("return true;")
+
     def generate_custom_parser_call(
         self,
         call_args: str,
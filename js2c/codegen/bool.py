@@ -44,11 +44,24 @@ class BoolGenerator(Generator):
     def can_parse_schema(cls, schema: dict[str, Any]) -> bool:
         return schema.get('type') == 'boolean'
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(("JSMN_PRIMITIVE",))
+
+    def json_types(self) -> frozenset[str]:
+        return frozenset(("boolean",))
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         parser_call = f"builtin_parse_bool(parse_state, {out_var_name})"
         with out_file.if_block(parser_call):
             out_file.print("return true;")
 
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        with out_file.if_block(f"builtin_serialize_bool(serialize_state, *{in_var_name})"):
+            out_file.print("return true;")
+
+    def max_serialized_size(self) -> int:
+        return len("false")
+
     def has_default_value(self) -> bool:
         return super().has_default_value() or self.default is not None
 
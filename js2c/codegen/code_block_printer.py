@@ -55,27 +55,29 @@ class CodeBlockPrinter:
         self.filepath = filepath
         self.indent_level = 0
         self.last_was_else = False
-        self.text = ""
+        # Appending to a single string copies it over and over once it's large, so the output is
+        # collected in pieces. Nothing is written until save_to_file, so a SchemaError leaves no file.
+        self.chunks: list[str] = []
 
     def save_to_file(self) -> None:
         with open(self.filepath, "w", encoding="utf-8") as file:
-            file.write(self.text)
+            file.writelines(self.chunks)
 
     def print(self, line: str) -> None:
         """ Print an indented line """
         if line == "else":
-            self.text += " else "
+            self.chunks.append(" else ")
         elif line == "{":
             if self.last_was_else:
-                self.text += "{"
+                self.chunks.append("{")
             else:
-                self.text += " {"
+                self.chunks.append(" {")
         elif not line:
-            self.text += "\n"
+            self.chunks.append("\n")
         elif self.last_was_else:
-            self.text += line
+            self.chunks.append(line)
         else:
-            self.text += f"\n{' ' * self.indent_level}{line}"
+            self.chunks.append(f"\n{' ' * self.indent_level}{line}")
         self.last_was_else = line == "else"
 
     def print_with_docstring(self, line: str, docstring: str | None) -> None:
@@ -91,12 +93,12 @@ class CodeBlockPrinter:
 
     def write(self, data: str) -> None:
         """ Write raw data to the file """
-        self.text += "\n"
-        self.text += data
+        self.chunks.append("\n")
+        self.chunks.append(data)
 
     def code_block(self, indent_level: int = 4, standalone: bool = False) -> CodeBlockContextManager:
         if standalone:
-            self.text += f"\n{' ' * self.indent_level}"
+            self.chunks.append(f"\n{' ' * self.indent_level}")
             # XXX: this is to prevent padding the opening brace that comes next
             self.last_was_else = True
         return CodeBlockContextManager(self, indent_level)
@@ -109,5 +111,9 @@ class CodeBlockPrinter:
         self.print(f"for ({for_stuff})")
         return self.code_block(indent_level, standalone)
 
+    def switch_block(self, expression: str, indent_level: int = 4) -> CodeBlockContextManager:
+        self.print(f"switch ({expression})")
+        return self.code_block(indent_level)
+
     def indent(self, indent_level: int = 4) -> CodeBlockContextManager:
         return CodeBlockContextManager(self, indent_level, indent_only=True)
@@ -24,8 +24,9 @@
 #
 from typing import Any
 
-from .base import Generator, SchemaError, GeneratorInitParameters
+from .base import Generator, SchemaError, GeneratorInitParameters, json_literal
 from .code_block_printer import CodeBlockPrinter
+from .runtime_stats import parser_function
 
 
 class ConstGenerator(Generator):
@@ -56,33 +57,43 @@ class ConstGenerator(Generator):
     def can_parse_schema(cls, schema: dict[str, Any]) -> bool:
         return "const" in schema
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(("JSMN_STRING",) if isinstance(self.const, str) else ("JSMN_PRIMITIVE",))
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         parser_call = f"parse_{self.parser_name}(parse_state)"
         with out_file.if_block(parser_call):
             out_file.print("return true;")
 
     def generate_parser_bodies(self, out_file: CodeBlockPrinter) -> None:
-        out_file.print(f"static bool parse_{self.parser_name}(parse_state_t *parse_state)")
-        error = [f"Invalid const value in '%s', expected: {self.const}", "parse_state->current_key"]
-        with out_file.code_block():
-            if isinstance(self.const, str):
-                with out_file.if_block("check_type(parse_state, JSMN_STRING)"):
-                    out_file.print("return true;")
-                with out_file.if_block(f'!current_string_is(parse_state, "{self.const}")'):
-                    self.generate_logged_error(error, out_file)
-                out_file.print("parse_state->current_token += 1;")
-            else:
-                with out_file.if_block("check_type(parse_state, JSMN_PRIMITIVE)"):
-                    out_file.print("return true;")
-                out_file.print("int64_t val;")
-                with out_file.if_block("builtin_parse_signed(parse_state, true, false, 10, &val)"):
-                    out_file.print("return true;")
-                with out_file.if_block(f"val != {self.const}"):
-                    # builtin_parse_signed already consumed the token; step back so the error points at it.
-                    out_file.print("parse_state->current_token -= 1;")
-                    self.generate_logged_error(error, out_file)
-            out_file.print("return false;")
-        out_file.print("")
+        with self.unique_functions("parser_name", out_file) as functions:
+            error = [f"Invalid const value in '%s', expected: {self.const}", "parse_state->current_key"]
+            with parser_function(self, None, functions):
+                if isinstance(self.const, str):
+                    with functions.if_block("check_type(parse_state, JSMN_STRING)"):
+                        functions.print("return true;")
+                    with functions.if_block(f'!current_string_is(parse_state, "{self.const}")'):
+                        self.generate_logged_error(error, functions)
+                    functions.print("builtin_consume_value(parse_state);")
+                else:
+                    with functions.if_block("check_type(parse_state, JSMN_PRIMITIVE)"):
+                        functions.print("return true;")
+                    functions.print("int64_t val;")
+                    with functions.if_block("builtin_parse_signed(parse_state, true, false, 10, &val)"):
+                        functions.print("return true;")
+                    with functions.if_block(f"val != {self.const}"):
+                        # builtin_parse_signed already consumed the token; step back so the error points at it.
+                        functions.print("builtin_unconsume_value(parse_state);")
+                        self.generate_logged_error(error, functions)
+                functions.print("return false;")
+            functions.print("")
+
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        # Nothing is stored, the value is always the same.
+        self.generate_serialized_literal(json_literal(self.const), out_file)
+
+    def max_serialized_size(self) -> int:
+        return len(json_literal(self.const))
 
     def generate_set_default_value(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         raise AssertionError("has_default_value() is always false: a const cannot have a js2cDefault.")
@@ -26,8 +26,11 @@ import re
 
 from typing import Any
 
-from .base import Generator, CType, SchemaError, GeneratorInitParameters
+from .base import Generator, CType, SchemaError, GeneratorInitParameters, c_string_literal, json_literal
 from .code_block_printer import CodeBlockPrinter
+from .hit_profile import counts_hits, generate_hit_count, generate_hit_counters, hot_first, profiled_hits
+from .runtime_stats import parser_function
+from .string_lookup import generate_unique_string_lookup
 
 
 class EnumType(CType):
@@ -95,39 +98,82 @@ class EnumGenerator(Generator):
         sanitized = self.SANITIZE_RE.sub("_", prefixed)
         return sanitized
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(("JSMN_STRING",))
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         parser_call = f"parse_{self.parser_name}(parse_state, {out_var_name})"
         with out_file.if_block(parser_call):
             out_file.print("return true;")
 
     def generate_parser_bodies(self, out_file: CodeBlockPrinter) -> None:
-        out_file.print(f"static bool parse_{self.parser_name}(parse_state_t *parse_state, {self.c_type} *out)")
-        with out_file.code_block():
-            with out_file.if_block("check_type(parse_state, JSMN_STRING)"):
-                out_file.print("return true;")
-
-            if self.js2cParseFunction is not None:
-                # A single membership check: the parser treats every label the same, so there is nothing to dispatch on.
-                is_a_label = " || ".join(f'current_string_is(parse_state, "{enum_label}")' for enum_label in self.enum)
-                with out_file.if_block(is_a_label):
-                    self.generate_custom_parser_call(
-                        "CURRENT_STRING(parse_state), CURRENT_STRING_LENGTH(parse_state), out",
-                        "%.*s",
-                        ["CURRENT_STRING_LENGTH(parse_state)", "CURRENT_STRING(parse_state)"],
-                        out_file)
-                out_file.print("else")
-            else:
-                for enum_label in self.enum:
-                    with out_file.if_block(f'current_string_is(parse_state, "{enum_label}")'):
-                        out_file.print(f"*out = {self.convert_enum_label(enum_label)};")
-                    out_file.print("else")
-
-            with out_file.code_block():
-                self.generate_logged_error(["Unknown enum value in '%s': %.*s", "parse_state->current_key", "CURRENT_STRING_FOR_ERROR(parse_state)"], out_file)
-
-            out_file.print("parse_state->current_token += 1;")
-            out_file.print("return false;")
-        out_file.print("")
+        # The lookup only depends on the labels, so enums of other types can share it too.
+        label_hits = profiled_hits(self, "labels", self.enum)
+        lookup_name = generate_unique_string_lookup(
+            f"lookup_{self.parser_name}_label", self.enum, self.shared.function_cache, out_file, label_hits)
+        with self.unique_functions("parser_name", out_file) as functions:
+            generate_hit_counters(self, "labels", self.enum, functions)
+            with parser_function(self, str(self.c_type), functions):
+                with functions.if_block("check_type(parse_state, JSMN_STRING)"):
+                    functions.print("return true;")
+
+                label_lookup = f"{lookup_name}(CURRENT_STRING(parse_state), CURRENT_STRING_LENGTH(parse_state))"
+                if self.js2cParseFunction is not None:
+                    if counts_hits(self):
+                        functions.print(f"const int label_index = {label_lookup};")
+                        label_lookup = "label_index"
+                    # A single membership check: the parser treats every label the same, so there is nothing to dispatch on.
+                    with functions.if_block(f"{label_lookup} >= 0"):
+                        generate_hit_count(self, "label_index", functions)
+                        self.generate_custom_parser_call(
+                            "CURRENT_STRING(parse_state), CURRENT_STRING_LENGTH(parse_state), out",
+                            "%.*s",
+                            ["CURRENT_STRING_LENGTH(parse_state)", "CURRENT_STRING(parse_state)"],
+                            functions)
+                    functions.print("else")
+                    with functions.code_block():
+                        self.generate_unknown_label_error(functions)
+                else:
+                    with functions.switch_block(label_lookup):
+                        labels = list(enumerate(self.enum))
+                        if label_hits is not None:
+                            labels = [labels[label_index] for label_index in hot_first(label_hits)]
+                        for label_index, enum_label in labels:
+                            functions.print(f"case {label_index}:")
+                            with functions.indent():
+                                generate_hit_count(self, label_index, functions)
+                                functions.print(f"*out = {self.convert_enum_label(enum_label)};")
+                                functions.print("break;")
+                        functions.print("default:")
+                        with functions.indent():
+                            self.generate_unknown_label_error(functions)
+
+                functions.print("builtin_consume_value(parse_state);")
+                functions.print("return false;")
+            functions.print("")
+
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        with out_file.if_block(f"serialize_{self.serializer_name}(serialize_state, {in_var_name})"):
+            out_file.print("return true;")
+
+    def generate_serializer_bodies(self, out_file: CodeBlockPrinter) -> None:
+        labels = [json_literal(label) for label in self.enum]
+        with self.unique_functions("serializer_name", out_file) as functions:
+            functions.print(f"static bool serialize_{self.serializer_name}(serialize_state_t *serialize_state, const {self.c_type} *in)")
+            with functions.code_block():
+                functions.print("// The JSON of each label, by enum value")
+                functions.print(f"static const char *const labels[{len(labels)}] = {{{', '.join(c_string_literal(label) for label in labels)}}};")
+                functions.print(f"static const size_t label_lengths[{len(labels)}] = {{{', '.join(str(len(label)) for label in labels)}}};")
+                with functions.if_block(f"(unsigned int)*in >= {len(labels)}"):
+                    self.generate_serializer_error("Invalid enum value in '%s': %i", "(int)*in", functions)
+                functions.print("return builtin_serialize_literal(serialize_state, labels[*in], label_lengths[*in]);")
+            functions.print("")
+
+    def max_serialized_size(self) -> int:
+        return max(len(json_literal(label)) for label in self.enum)
+
+    def generate_unknown_label_error(self, out_file: CodeBlockPrinter) -> None:
+        self.generate_logged_error(["Unknown enum value in '%s': %.*s", "parse_state->current_key", "CURRENT_STRING_FOR_ERROR(parse_state)"], out_file)
 
     def has_default_value(self) -> bool:
         return super().has_default_value() or self.default is not None
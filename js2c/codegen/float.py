@@ -28,6 +28,38 @@ from .base import Generator, CType, GeneratorInitParameters
 from .code_block_printer import CodeBlockPrinter
 
 
+# What builtin_serialize_double reserves: a sign, 17 digits and the decimal point, with an exponent or up to 6 zeros.
+MAX_SERIALIZED_DOUBLE_LENGTH = 25
+
+# The range of the powers of ten in the Eisel-Lemire table. Anything outside it is 0 or infinity anyway.
+MIN_POWER_OF_TEN = -348
+MAX_POWER_OF_TEN = 347
+
+
+def power_of_ten_mantissa(exponent: int) -> int:
+    """The 128 most significant bits of 10^exponent, rounded down."""
+    if exponent >= 0:
+        power = 10 ** exponent
+        shift = power.bit_length() - 128
+        return power >> shift if shift > 0 else power << -shift
+    divisor = 10 ** -exponent
+    return (1 << (divisor.bit_length() + 127)) // divisor
+
+
+def generate_powers_of_ten_table(out_file: CodeBlockPrinter) -> None:
+    """Emit the table of builtin_parse_double_fast, and enable it in the builtins."""
+    out_file.print("#define JS2C_FAST_FLOAT")
+    out_file.print(f"#define JS2C_MIN_POWER_OF_TEN ({MIN_POWER_OF_TEN})")
+    out_file.print(f"#define JS2C_MAX_POWER_OF_TEN {MAX_POWER_OF_TEN}")
+    out_file.print("// The low and high 64 bits of the powers of ten, normalized to 128 bits and rounded down")
+    out_file.print(f"static const uint64_t builtin_powers_of_ten[{MAX_POWER_OF_TEN - MIN_POWER_OF_TEN + 1}][2] = {{")
+    with out_file.indent():
+        for exponent in range(MIN_POWER_OF_TEN, MAX_POWER_OF_TEN + 1):
+            mantissa = power_of_ten_mantissa(exponent)
+            out_file.print(f"{{0x{mantissa & (2**64 - 1):016x}ULL, 0x{mantissa >> 64:016x}ULL}}, // 1e{exponent}")
+    out_file.print("};")
+
+
 class FloatGenerator(Generator):
     JSON_FIELDS = Generator.JSON_FIELDS + (
         "minimum",
@@ -51,6 +83,12 @@ class FloatGenerator(Generator):
     def can_parse_schema(cls, schema: dict[str, Any]) -> bool:
         return schema.get('type') == 'number'
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(("JSMN_PRIMITIVE",))
+
+    def json_types(self) -> frozenset[str]:
+        return frozenset(("number",))
+
     @classmethod
     def generate_range_check(
         cls,
@@ -64,7 +102,7 @@ class FloatGenerator(Generator):
             return
         with out_file.if_block(f"(*{out_var_name}) {inverted_check_operator} {check_number}"):
             # Roll back the token, as the value was not actually correct
-            out_file.print("parse_state->current_token -= 1;")
+            out_file.print("builtin_unconsume_value(parse_state);")
             cls.generate_logged_error(
                 [
                     f"Floating point value %.15g in '%s' out of range. It must be {check_operator} {check_number}.",
@@ -75,13 +113,21 @@ class FloatGenerator(Generator):
             )
 
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
-        with out_file.if_block(f"builtin_parse_double(parse_state, {out_var_name})"):
+        parser_fn = "builtin_parse_double_fast" if self.settings.float_parser == "eisel_lemire" else "builtin_parse_double"
+        with out_file.if_block(f"{parser_fn}(parse_state, {out_var_name})"):
             out_file.print("return true;")
         self.generate_range_check(self.minimum, out_var_name, ">=", "<", out_file)
         self.generate_range_check(self.maximum, out_var_name, "<=", ">", out_file)
         self.generate_range_check(self.exclusiveMinimum, out_var_name, ">", "<=", out_file)
         self.generate_range_check(self.exclusiveMaximum, out_var_name, "<", ">=", out_file)
 
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        with out_file.if_block(f"builtin_serialize_double(serialize_state, *{in_var_name})"):
+            out_file.print("return true;")
+
+    def max_serialized_size(self) -> int:
+        return MAX_SERIALIZED_DOUBLE_LENGTH
+
     def has_default_value(self) -> bool:
         return super().has_default_value() or self.default is not None
 
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from .code_block_printer import CodeBlockPrinter
+
+# Stands for the name of the functions while they are printed, so functions that only differ in their
+# name print the same. It can't be a C identifier, or it could be in the code for another reason.
+NAME_PLACEHOLDER = "\0js2c_name\0"
+
+
+class FunctionCache:
+    #pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        # The code of the printed functions, with NAME_PLACEHOLDER for their name, and the name they were printed with
+        self.names: dict[str, str] = {}
+
+    def print_unique(self, functions: CodeBlockPrinter, name: str, out_file: CodeBlockPrinter) -> str:
+        """
+        Print functions, printed with NAME_PLACEHOLDER as their name, into out_file as name,
+        unless the same functions were printed already. Returns the name of the printed functions.
+        """
+        code = "".join(functions.chunks)
+        if code in self.names:
+            return self.names[code]
+        self.names[code] = name
+        out_file.chunks.append(code.replace(NAME_PLACEHOLDER, name))
+        return name
@@ -56,6 +56,16 @@ class GeneratorFactory:
 
     @classmethod
     def get_generator_for(cls, schema: Any, parameters: GeneratorInitParameters) -> Generator:
+        # Every use of a $ref target is the same node: give them one generator, named after the first use,
+        # so they share its type and functions.
+        if id(schema) in parameters.shared.generators:
+            return parameters.shared.generators[id(schema)][1]
+        generator = cls._create_generator(schema, parameters)
+        parameters.shared.generators[id(schema)] = (schema, generator)
+        return generator
+
+    @classmethod
+    def _create_generator(cls, schema: Any, parameters: GeneratorInitParameters) -> Generator:
         if not isinstance(schema, dict):
             raise SchemaError(
                 parameters.path_in_schema,
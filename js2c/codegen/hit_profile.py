@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from __future__ import annotations
+
+import json
+from collections.abc import Sequence
+from typing import IO
+
+from .base import Generator, SchemaError, c_string_literal
+from .code_block_printer import CodeBlockPrinter
+
+# What is counted: the fields of objects, the labels of enums and the options of anyOfs, by index
+HIT_KINDS = ("fields", "labels", "options")
+
+
+def hot_first(hits: Sequence[int]) -> list[int]:
+    """ The indices of hits, the most hit first. Equal ones keep their order. """
+    return sorted(range(len(hits)), key=lambda index: -hits[index])
+
+
+def option_hit_names(option_count: int) -> list[str]:
+    """ The options of an anyOf are named by their index in a hit profile """
+    return [str(option_index) for option_index in range(option_count)]
+
+
+def counts_hits(generator: Generator) -> bool:
+    """ Whether the parser counts how often each field, enum label and anyOf option is parsed, for a hit profile """
+    return bool(generator.settings.count_hits)
+
+
+def hit_counts_array(generator: Generator) -> str:
+    return f"hit_counts_{generator.parser_name}"
+
+
+def profiled_hits(generator: Generator, kind: str, names: Sequence[str]) -> list[int] | None:
+    """ The hit counts of names in the hit_profile setting, or None if it has none for generator """
+    return generator.shared.hit_profile.hits(kind, generator.path_in_schema, names)
+
+
+def generate_hit_counters(generator: Generator, kind: str, names: Sequence[str], out_file: CodeBlockPrinter) -> None:
+    """ Declare the hit counters of names, one of the HIT_KINDS, if the parser counts hits """
+    if not counts_hits(generator) or not names:
+        return
+    out_file.print(f"static uint64_t {hit_counts_array(generator)}[{len(names)}];")
+    generator.shared.hit_profile.add_counters(kind, generator.path_in_schema, generator, names)
+
+
+def generate_hit_count(generator: Generator, index: int | str, out_file: CodeBlockPrinter) -> None:
+    """ Count a hit of the name at index, which may be a C expression, if the parser counts hits """
+    if counts_hits(generator):
+        out_file.print(f"builtin_count_hit(&{hit_counts_array(generator)}[{index}]);")
+
+
+class HitProfile:
+    """
+    The hit counts saved by a parser generated with count_hits, which are read back with the hit_profile
+    setting, so the generated code checks the most common fields, labels and options first.
+
+    The file is a JSON object, with an object for each of HIT_KINDS. These are keyed by the place in the
+    schema (like ".a.b", "" is the root), and map the names (the index, for options) to the hit count.
+    """
+
+    def __init__(self, counts: dict[str, dict[str, dict[str, int]]] | None = None) -> None:
+        self.counts = counts or {}
+        # The counters the generated parser has, for saving them: kind -> place in the schema -> (generator, names).
+        # The array is named after the parser only when saving, once it is known which parser is shared.
+        self.counters: dict[str, dict[str, tuple[Generator, list[str]]]] = {kind: {} for kind in HIT_KINDS}
+
+    @classmethod
+    def load(cls, profile_file: IO[str]) -> HitProfile:
+        try:
+            counts = json.load(profile_file)
+        except ValueError as e:
+            raise SchemaError("", f"Invalid hit profile '{profile_file.name}': {e}") from e
+        valid = isinstance(counts, dict) and all(
+            kind in HIT_KINDS and isinstance(by_path, dict) and all(
+                isinstance(by_name, dict) and all(
+                    isinstance(count, int) and not isinstance(count, bool) and count >= 0 for count in by_name.values()
+                )
+                for by_name in by_path.values()
+            )
+            for kind, by_path in counts.items()
+        )
+        if not valid:
+            raise SchemaError("", f"Invalid hit profile '{profile_file.name}': it must map {', '.join(HIT_KINDS)} to the hit counts by place")
+        return cls(counts)
+
+    def hits(self, kind: str, path_in_schema: str, names: Sequence[str]) -> list[int] | None:
+        """ The hit counts of names, or None if the profile has none for this place """
+        by_name = self.counts.get(kind, {}).get(path_in_schema)
+        if not by_name:
+            return None
+        return [by_name.get(name, 0) for name in names]
+
+    def add_counters(self, kind: str, path_in_schema: str, generator: Generator, names: Sequence[str]) -> None:
+        """ Save the hit counts of generator, by the index of names. Shared parsers share the counters. """
+        self.counters[kind][path_in_schema] = (generator, list(names))
+
+    def generate_save_function(self, function_name: str, out_file: CodeBlockPrinter) -> None:
+        out_file.print(f"bool {function_name}(const char *path)")
+        with out_file.code_block():
+            out_file.print('FILE *file = fopen(path, "w");')
+            with out_file.if_block("file == NULL"):
+                out_file.print("return true;")
+            # The hits are written in the format HitProfile.load reads, the JSON around them as string literals.
+            separator = "{\n"
+            for kind in HIT_KINDS:
+                text = separator + f"  {json.dumps(kind)}: {{"
+                for path_index, (path_in_schema, (generator, names)) in enumerate(sorted(self.counters[kind].items())):
+                    text += ("," if path_index else "") + f"\n    {json.dumps(path_in_schema)}: {{"
+                    for name_index, name in enumerate(names):
+                        text += ", " if name_index else ""
+                        text += f"{json.dumps(name)}: "
+                        out_file.print(
+                            f'fprintf(file, "%s%" PRIu64, {c_string_literal(text.encode("utf-8"))}, {hit_counts_array(generator)}[{name_index}]);'
+                        )
+                        text = ""
+                    text += "}"
+                text += "\n  }"
+                out_file.print(f'fputs({c_string_literal(text.encode("utf-8"))}, file);')
+                separator = ",\n"
+            out_file.print('fputs("\\n}\\n", file);')
+            out_file.print("bool error = ferror(file);")
+            out_file.print("return fclose(file) != 0 || error;")
+        out_file.print("")
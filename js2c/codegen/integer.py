@@ -43,6 +43,12 @@ class IntegerType(CType):
     def is_unsigned(self) -> bool:
         return self.type_name in self.UNSIGNED_TYPES
 
+    def value_range(self) -> tuple[int, int]:
+        bits = int(self.type_name.removeprefix("u").removeprefix("int").removesuffix("_t"))
+        if self.is_unsigned():
+            return 0, 2**bits - 1
+        return -2**(bits - 1), 2**(bits - 1) - 1
+
 
 class IntegerGeneratorBase(Generator):
     JSON_FIELDS = Generator.JSON_FIELDS + (
@@ -102,6 +108,14 @@ class IntegerGeneratorBase(Generator):
     def number_allowed(self) -> bool:
         pass
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(
+            (("JSMN_PRIMITIVE",) if self.number_allowed else ()) + (("JSMN_STRING",) if self.string_allowed else ())
+        )
+
+    def json_types(self) -> frozenset[str]:
+        return frozenset((("number",) if self.number_allowed else ()) + (("string",) if self.string_allowed else ()))
+
     def generate_range_check(
         self,
         check_number: int | None,
@@ -115,7 +129,7 @@ class IntegerGeneratorBase(Generator):
             return
         with out_file.if_block(f"int_parse_tmp {inverted_check_operator} {check_number}{self.default_suffix}"):
             # Roll back the token, as the value was not actually correct
-            out_file.print("parse_state->current_token -= 1;")
+            out_file.print("builtin_unconsume_value(parse_state);")
             self.generate_logged_error(
                 [
                     f"Integer %\" {out_var_printf_macro} \" in '%s' out of range. It must be {check_operator} {check_number}.",
@@ -125,6 +139,42 @@ class IntegerGeneratorBase(Generator):
                 out_file
             )
 
+    def generate_range_checks(self, out_file: CodeBlockPrinter) -> None:
+        # (bound, operator, inverted operator, inclusive bound): exclusive integer bounds are one step in.
+        checks = [
+            (self.minimum, ">=", "<", self.minimum),
+            (self.maximum, "<=", ">", self.maximum),
+            (self.exclusiveMinimum, ">", "<=", None if self.exclusiveMinimum is None else self.exclusiveMinimum + 1),
+            (self.exclusiveMaximum, "<", ">=", None if self.exclusiveMaximum is None else self.exclusiveMaximum - 1),
+        ]
+        if self.parsed_type == "uint64_t":
+            parsed_min, parsed_max = 0, 2**64 - 1
+        else:
+            parsed_min, parsed_max = -2**63, 2**63 - 1
+        # A bound that every parsed value satisfies needs no check.
+        checks = [
+            check for check in checks
+            if check[3] is not None and (check[3] > parsed_min if check[1] in (">=", ">") else check[3] < parsed_max)
+        ]
+        # The filter above already dropped the None bounds, this narrows the type.
+        lows = [inclusive for _, operator, _, inclusive in checks if inclusive is not None and operator in (">=", ">")]
+        highs = [inclusive for _, operator, _, inclusive in checks if inclusive is not None and operator in ("<=", "<")]
+
+        if len(checks) > 1 and lows and highs and max(lows) <= min(highs):
+            # In range if value - low <= high - low, as unsigned: a single comparison in the common case.
+            low, high = max(lows), min(highs)
+            if self.parsed_type == "uint64_t":
+                offset_value = f"int_parse_tmp - {low}ULL"
+            else:
+                offset_value = f"(uint64_t)int_parse_tmp - (uint64_t){low}LL"
+            with out_file.if_block(f"{offset_value} > {high - low}ULL"):
+                # Slow path: find the bound that failed, for the error message
+                for bound, check_operator, inverted_check_operator, _ in checks:
+                    self.generate_range_check(bound, self.parsed_type_printf_macro, check_operator, inverted_check_operator, out_file)
+            return
+        for bound, check_operator, inverted_check_operator, _ in checks:
+            self.generate_range_check(bound, self.parsed_type_printf_macro, check_operator, inverted_check_operator, out_file)
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         out_file.print(f"{self.parsed_type} int_parse_tmp;")
         number_allowed = 'true' if self.number_allowed else 'false'
@@ -134,24 +184,40 @@ class IntegerGeneratorBase(Generator):
         )
         with out_file.if_block(parser_call):
             out_file.print("return true;")
-        self.generate_range_check(self.minimum, self.parsed_type_printf_macro, ">=", "<", out_file)
-        self.generate_range_check(self.maximum, self.parsed_type_printf_macro, "<=", ">", out_file)
-        self.generate_range_check(self.exclusiveMinimum, self.parsed_type_printf_macro, ">", "<=", out_file)
-        self.generate_range_check(self.exclusiveMaximum, self.parsed_type_printf_macro, "<", ">=", out_file)
+        self.generate_range_checks(out_file)
         if self.js2cParseFunction is not None:
-            # The value was already parsed and current_token advanced past it, so point back at it
+            # The value was already parsed and consumed, so step back to it
             # for a correct error position, then restore.
-            out_file.print("parse_state->current_token -= 1;")
+            out_file.print("builtin_unconsume_value(parse_state);")
             self.generate_custom_parser_call(
                 f"int_parse_tmp, {out_var_name}",
                 f'%" {self.parsed_type_printf_macro} "',
                 ["int_parse_tmp"],
                 out_file
             )
-            out_file.print("parse_state->current_token += 1;")
+            out_file.print("builtin_consume_value(parse_state);")
         else:
             out_file.print(f"*{out_var_name} = int_parse_tmp;")
 
+    @property
+    def serialized_radix(self) -> int:
+        # Radix 0 reads decimal too, so only hex needs its own digits.
+        return 16 if self.radix == 16 else 10
+
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        serializer_fn = "builtin_serialize_unsigned" if self.parsed_type == "uint64_t" else "builtin_serialize_signed"
+        # A number that may be a string is written as one, which every pattern reads.
+        quoted = "true" if self.string_allowed else "false"
+        with out_file.if_block(f"{serializer_fn}(serialize_state, *{in_var_name}, {self.serialized_radix}, {quoted})"):
+            out_file.print("return true;")
+
+    def max_serialized_size(self) -> int:
+        # can_serialize() is false for a js2cParseFunction, the only case without an IntegerType.
+        assert isinstance(self.c_type, IntegerType)
+        digits = "x" if self.serialized_radix == 16 else "d"
+        size = max(len(format(value, digits)) for value in self.c_type.value_range())
+        return size + 2 if self.string_allowed else size
+
     def has_default_value(self) -> bool:
         return super().has_default_value() or self.default is not None
 
@@ -209,8 +275,9 @@ class NumericStringGenerator(IntegerGenerator):
 
     def __init__(self, schema: dict[str, Any], parameters: GeneratorInitParameters) -> None:
         # minimum might be in the schema if this constructor is called by IntegerStringAnyOfGenerator
+        # Copied, not set in place: the loader shares the definitions between the references.
         if 'minimum' not in schema and schema['pattern'] in self.UNSIGNED_PATTERNS:
-            schema['minimum'] = 0
+            schema = {**schema, 'minimum': 0}
         super().__init__(schema, parameters)
         # can_parse_schema() rejects js2cParseFunction, so the base built an IntegerType.
         assert isinstance(self.c_type, IntegerType)
@@ -248,9 +315,7 @@ class NumericStringGenerator(IntegerGenerator):
 
 class IntegerStringAnyOfGenerator(NumericStringGenerator):
     def __init__(self, schema: dict[str, Any], parameters: GeneratorInitParameters) -> None:
-        combined_schema = schema['anyOf'][0]
-        combined_schema.update(schema['anyOf'][1])
-        combined_schema['type'] = 'string'
+        combined_schema = {**schema['anyOf'][0], **schema['anyOf'][1], 'type': 'string'}
         super().__init__(combined_schema, parameters)
 
     @classmethod
@@ -23,12 +23,16 @@
 # SOFTWARE.
 #
 import collections
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
 
 from typing import Any
 
-from .base import Generator, CType, SchemaError, C_RESERVED, GeneratorInitParameters
+from .base import Generator, CType, SchemaError, C_RESERVED, GeneratorInitParameters, json_literal
+from .const import ConstGenerator
 from .code_block_printer import CodeBlockPrinter
+from .hit_profile import generate_hit_count, generate_hit_counters, hot_first, profiled_hits
+from .runtime_stats import collects_stats, parser_function
+from .string_lookup import generate_unique_string_lookup
 
 
 class ObjectType(CType):
@@ -64,6 +68,19 @@ class ObjectType(CType):
         )
 
 
+def seen_flag(field_index: int) -> tuple[str, str]:
+    """The seen bitset word and the bit in it for a field."""
+    return f"seen[{field_index // 64}]", f"(UINT64_C(1) << {field_index % 64})"
+
+
+def serialized_fields(fields: collections.OrderedDict[str, Generator]) -> list[tuple[str, Generator]]:
+    """ The fields written by the serializer. A void stores nothing, so it is left out, like an unknown field. """
+    return [
+        (field_name, field_generator) for field_name, field_generator in fields.items()
+        if field_generator.c_type is not None or isinstance(field_generator, ConstGenerator)
+    ]
+
+
 class ObjectGenerator(Generator):
     JSON_FIELDS = Generator.JSON_FIELDS + (
         "required",
@@ -90,6 +107,8 @@ class ObjectGenerator(Generator):
             collections.OrderedDict((k, v.c_type) for k, v in self.fields.items())
         )
         self.c_type = parameters.type_cache.try_get_cached(self.c_type, self.path_in_schema)
+        # Switched to an identical lookup of another object, if there is one, when the functions are printed
+        self.field_lookup = f"lookup_{self.parser_name}_field"
 
         if self.additionalProperties and not self.settings.allow_additional_properties:
             raise SchemaError(
@@ -102,39 +121,68 @@ class ObjectGenerator(Generator):
     def can_parse_schema(cls, schema: dict[str, Any]) -> bool:
         return schema.get('type') == 'object'
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(("JSMN_OBJECT",))
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         parser_call = f"parse_{self.parser_name}(parse_state, {out_var_name})"
         with out_file.if_block(parser_call):
             out_file.print("return true;")
 
+    def seen_masks(self, field_filter: Callable[[str, Generator], bool]) -> dict[int, int]:
+        """Masks of the fields that pass field_filter, by seen bitset word. Words with no such field are left out."""
+        masks: dict[int, int] = {}
+        for field_index, (field_name, field_generator) in enumerate(self.fields.items()):
+            if field_filter(field_name, field_generator):
+                masks[field_index // 64] = masks.get(field_index // 64, 0) | 1 << (field_index % 64)
+        return masks
+
     def generate_seen_flags(self, out_file: CodeBlockPrinter) -> None:
-        for field_name in self.fields:
-            out_file.print(f"bool seen_{field_name} = false;")
+        if self.fields:
+            out_file.print(f"uint64_t seen[{(len(self.fields) + 63) // 64}] = {{0}};")
 
     def generate_default_field_setting(self, out_file: CodeBlockPrinter) -> None:
-        for field_name, field_generator in self.fields.items():
-            if not field_generator.has_default_value():
-                continue
-            with out_file.if_block(f"!seen_{field_name}"):
-                field_generator.generate_set_default_value(
-                    f"out->{field_name}",
-                    out_file
-                )
+        field_items = list(self.fields.items())
+        for word, mask in self.seen_masks(lambda _, field_generator: field_generator.has_default_value()).items():
+            # Only the bits of the absent fields are visited, so a complete object costs a single test.
+            with out_file.for_block(f"uint64_t unset = ~seen[{word}] & 0x{mask:x}ULL; unset; unset &= unset - 1"):
+                with out_file.switch_block("builtin_lowest_set_bit(unset)"):
+                    for bit in range(64):
+                        if not mask & 1 << bit:
+                            continue
+                        field_name, field_generator = field_items[word * 64 + bit]
+                        out_file.print(f"case {bit}:")
+                        with out_file.code_block():
+                            field_generator.generate_set_default_value(
+                                f"out->{field_name}",
+                                out_file
+                            )
+                            out_file.print("break;")
 
     def generate_required_checks(self, out_file: CodeBlockPrinter) -> None:
         for field_name, field_generator in self.fields.items():
-            if field_generator.has_default_value():
+            if field_generator.has_default_value() or field_name in self.required:
                 continue
-            if field_name not in self.required:
-                # A const stores nothing; an absent one just goes unchecked, like in JSON Schema.
-                if field_generator.c_type is None:
-                    continue
-                raise SchemaError(
-                    self,
-                    f"Field '{field_name}' must be required or have a default value"
-                )
-            with out_file.if_block(f"!seen_{field_name}"):
-                self.generate_logged_error(f"Missing required field in '%s': {field_name}", out_file)
+            # A const stores nothing; an absent one just goes unchecked, like in JSON Schema.
+            if field_generator.c_type is None:
+                continue
+            raise SchemaError(
+                self,
+                f"Field '{field_name}' must be required or have a default value"
+            )
+
+        def is_checked(field_name: str, field_generator: Generator) -> bool:
+            return not field_generator.has_default_value() and field_name in self.required
+
+        for word, mask in self.seen_masks(is_checked).items():
+            with out_file.if_block(f"(seen[{word}] & 0x{mask:x}ULL) != 0x{mask:x}ULL"):
+                # Slow path: find the first missing field, to name it in the error.
+                for field_index, (field_name, field_generator) in enumerate(self.fields.items()):
+                    if field_index // 64 != word or not is_checked(field_name, field_generator):
+                        continue
+                    seen_word, seen_bit = seen_flag(field_index)
+                    with out_file.if_block(f"!({seen_word} & {seen_bit})"):
+                        self.generate_logged_error(f"Missing required field in '%s': {field_name}", out_file)
 
     def generate_key_children_check(self, out_file: CodeBlockPrinter) -> None:
         with out_file.if_block("CURRENT_TOKEN(parse_state).size > 1"):
@@ -158,58 +206,142 @@ class ObjectGenerator(Generator):
             )
 
     def generate_field_parsers(self, out_file: CodeBlockPrinter) -> None:
-        self.generate_key_children_check(out_file)
-        for field_name, field_generator in self.fields.items():
-            with out_file.if_block(f'current_string_is(parse_state, "{field_name}")'):
-                with out_file.if_block(f"seen_{field_name}"):
-                    self.generate_logged_error(f"Duplicate field definition in '%s': {field_name}", out_file)
-                out_file.print(f"seen_{field_name} = true;")
-                out_file.print("parse_state->current_token += 1;")
-                out_file.print("const char* saved_key = parse_state->current_key;")
-                out_file.print(f'parse_state->current_key = "{field_name}";')
-                field_generator.generate_parser_call(
-                    f"&out->{field_name}",
-                    out_file
-                )
-                out_file.print("parse_state->current_key = saved_key;")
-            out_file.print("else")
-        with out_file.code_block():
-            if self.settings.allow_additional_properties:
-                out_file.print("parse_state->current_token += 1;")
-                out_file.print("builtin_skip(parse_state);")
-            else:
-                self.generate_logged_error(["Unknown field in '%s': %.*s", "parse_state->current_key", "CURRENT_STRING_FOR_ERROR(parse_state)"], out_file)
+        if not self.direct_backend:
+            # The direct backend's builtin_next_key does these checks while lexing the key.
+            self.generate_key_children_check(out_file)
+        field_lookup = f"{self.field_lookup}(CURRENT_STRING(parse_state), CURRENT_STRING_LENGTH(parse_state))"
+        fields = list(enumerate(self.fields.items()))
+        field_hits = profiled_hits(self, "fields", list(self.fields))
+        if field_hits is not None:
+            # The code of the common fields comes first
+            fields = [fields[field_index] for field_index in hot_first(field_hits)]
+        with out_file.switch_block(field_lookup):
+            for field_index, (field_name, field_generator) in fields:
+                out_file.print(f"case {field_index}:")
+                with out_file.code_block():
+                    generate_hit_count(self, field_index, out_file)
+                    seen_word, seen_bit = seen_flag(field_index)
+                    with out_file.if_block(f"{seen_word} & {seen_bit}"):
+                        self.generate_logged_error(f"Duplicate field definition in '%s': {field_name}", out_file)
+                    out_file.print(f"{seen_word} |= {seen_bit};")
+                    with out_file.if_block("builtin_consume_key(parse_state)"):
+                        out_file.print("return true;")
+                    out_file.print("const char* saved_key = parse_state->current_key;")
+                    out_file.print(f'parse_state->current_key = "{field_name}";')
+                    field_generator.generate_parser_call(
+                        f"&out->{field_name}",
+                        out_file
+                    )
+                    out_file.print("parse_state->current_key = saved_key;")
+                    out_file.print("break;")
+            out_file.print("default:")
+            with out_file.code_block():
+                if self.settings.allow_additional_properties:
+                    skip = "builtin_skip_unknown" if collects_stats(self) else "builtin_skip"
+                    with out_file.if_block(f"builtin_consume_key(parse_state) || {skip}(parse_state)"):
+                        out_file.print("return true;")
+                    out_file.print("break;")
+                else:
+                    self.generate_logged_error(["Unknown field in '%s': %.*s", "parse_state->current_key", "CURRENT_STRING_FOR_ERROR(parse_state)"], out_file)
+
+    def generate_jsmn_object_parser(self, out_file: CodeBlockPrinter) -> None:
+        out_file.print("const int object_start_token = parse_state->current_token;")
+        out_file.print("const uint64_t n = parse_state->tokens[parse_state->current_token].size;")
+        out_file.print("parse_state->current_token += 1;")
+        with out_file.for_block("uint64_t i = 0; i < n; ++i"):
+            self.generate_field_parsers(out_file)
+
+        # This little magic is needed because both required checks and default setting
+        # use CURRENT_TOKEN, which may be past the token list by now, and also we want
+        # to report the issue at the start of the object.
+        out_file.print("const int saved_current_token = parse_state->current_token;")
+        out_file.print("parse_state->current_token = object_start_token;")
+
+        self.generate_required_checks(out_file)
+        self.generate_default_field_setting(out_file)
+
+        out_file.print("parse_state->current_token = saved_current_token;")
+
+    def generate_direct_object_parser(self, out_file: CodeBlockPrinter) -> None:
+        # The number of fields is only known at the closing brace, so the keys are lexed until then.
+        out_file.print("const jsmntok_t object_start_token = CURRENT_TOKEN(parse_state);")
+        with out_file.for_block("bool first = true; ; first = false"):
+            with out_file.if_block("builtin_next_key(parse_state, first)"):
+                out_file.print("return true;")
+            with out_file.if_block("CURRENT_TOKEN(parse_state).type == JSMN_UNDEFINED"):
+                out_file.print("break;")
+            self.generate_field_parsers(out_file)
+
+        # The object stays the current token, so the errors below are reported at its start.
+        out_file.print("CURRENT_TOKEN(parse_state) = object_start_token;")
+
+        self.generate_required_checks(out_file)
+        self.generate_default_field_setting(out_file)
 
     def generate_parser_bodies(self, out_file: CodeBlockPrinter) -> None:
         for field_generator in self.fields.values():
             field_generator.generate_parser_bodies(out_file)
 
-        out_file.print(f"static bool parse_{self.parser_name}(parse_state_t *parse_state, {self.c_type} *out)")
-        with out_file.code_block():
-            with out_file.if_block("check_type(parse_state, JSMN_OBJECT)"):
-                out_file.print("return true;")
+        # The lookup only depends on the field names, so objects of other types can share it too.
+        self.field_lookup = generate_unique_string_lookup(
+            f"lookup_{self.parser_name}_field", list(self.fields), self.shared.function_cache, out_file,
+            profiled_hits(self, "fields", list(self.fields)))
+        with self.unique_functions("parser_name", out_file) as functions:
+            generate_hit_counters(self, "fields", list(self.fields), functions)
+            with parser_function(self, str(self.c_type), functions):
+                with functions.if_block("check_type(parse_state, JSMN_OBJECT)"):
+                    functions.print("return true;")
 
-            self.generate_seen_flags(out_file)
+                self.generate_seen_flags(functions)
 
-            out_file.print("const int object_start_token = parse_state->current_token;")
-            out_file.print("const uint64_t n = parse_state->tokens[parse_state->current_token].size;")
-            out_file.print("parse_state->current_token += 1;")
-            with out_file.for_block("uint64_t i = 0; i < n; ++i"):
-                self.generate_field_parsers(out_file)
+                if self.direct_backend:
+                    self.generate_direct_object_parser(functions)
+                else:
+                    self.generate_jsmn_object_parser(functions)
 
-            # This little magic is needed because both required checks and default setting
-            # use CURRENT_TOKEN, which may be past the token list by now, and also we want
-            # to report the issue at the start of the object.
-            out_file.print("const int saved_current_token = parse_state->current_token;")
-            out_file.print("parse_state->current_token = object_start_token;")
+                functions.print("return false;")
+            functions.print("")
 
-            self.generate_required_checks(out_file)
-            self.generate_default_field_setting(out_file)
+    def can_serialize(self) -> bool:
+        return super().can_serialize() and all(field_generator.can_serialize() for field_generator in self.fields.values())
 
-            out_file.print("parse_state->current_token = saved_current_token;")
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        with out_file.if_block(f"serialize_{self.serializer_name}(serialize_state, {in_var_name})"):
+            out_file.print("return true;")
 
-            out_file.print("return false;")
-        out_file.print("")
+    def generate_serializer_bodies(self, out_file: CodeBlockPrinter) -> None:
+        for _, field_generator in serialized_fields(self.fields):
+            field_generator.generate_serializer_bodies(out_file)
+
+        with self.unique_functions("serializer_name", out_file) as functions:
+            functions.print(f"static bool serialize_{self.serializer_name}(serialize_state_t *serialize_state, const {self.c_type} *in)")
+            with functions.code_block():
+                # The keys, the separators and the consts between two values are written as a single literal.
+                literal = b"{"
+                for field_index, (field_name, field_generator) in enumerate(serialized_fields(self.fields)):
+                    if field_index != 0:
+                        literal += b","
+                    literal += json_literal(field_name) + b":"
+                    if isinstance(field_generator, ConstGenerator):
+                        literal += json_literal(field_generator.const)
+                        continue
+                    self.generate_serialized_literal(literal, functions)
+                    literal = b""
+                    field_generator.generate_serializer_call(f"&in->{field_name}", functions)
+                self.generate_serialized_literal(literal + b"}", functions)
+                functions.print("return false;")
+            functions.print("")
+
+    def max_serialized_size(self) -> int | None:
+        fields = serialized_fields(self.fields)
+        # The braces, the separators, and the keys with their colons
+        size = 2 + max(len(fields) - 1, 0)
+        for field_name, field_generator in fields:
+            field_size = field_generator.max_serialized_size()
+            if field_size is None:
+                return None
+            size += len(json_literal(field_name)) + 1 + field_size
+        return size
 
     def has_default_value(self) -> bool:
         if super().has_default_value():
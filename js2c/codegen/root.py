@@ -27,24 +27,85 @@ import re
 from typing import Any
 
 from .code_block_printer import CodeBlockPrinter
+from .float import generate_powers_of_ten_table
 
 from .generator_factory import GeneratorFactory
 from .type_cache import TypeCache
-from .base import GeneratorInitParameters, SchemaError
+from .function_cache import FunctionCache
+from .hit_profile import HitProfile
+from .stream import generate_stream_parser
+from .runtime_stats import RuntimeStats
+from .base import GeneratorInitParameters, SchemaError, SharedState
+from ..profiling import Profiler
 from ..settings import Settings
 
 
 DIR_OF_THIS_FILE = os.path.dirname(__file__)
 
+PARSER_BACKENDS = ("jsmn", "direct")
+FLOAT_PARSERS = ("strtod", "eisel_lemire")
+STRING_STORAGES = ("escaped", "unescaped")
+ALLOCATIONS = ("inline", "arena")
+RUNTIME_STATS = ("counts", "timing")
+
 NOTE_FOR_GENERATED_FILES = """
 /* This file was generated by JSON Schema to C.
  * Any changes made to it will be lost on regeneration. */
 """
 
 
+def generate_record_loop(out_file: CodeBlockPrinter, record_parser_call: str) -> None:
+    """ Parse each record of an NDJSON buffer with record_parser_call, which returns true on error """
+    out_file.print("const char *record = ndjson;")
+    out_file.print("const char *end = ndjson + ndjson_len;")
+    out_file.print("size_t record_len = 0;")
+    out_file.print("size_t record_count = 0;")
+    out_file.print("*error_count = 0;")
+    with out_file.for_block("; record_count < max_records && builtin_next_record(&record, end, &record_len); ++record_count"):
+        with out_file.if_block(record_parser_call):
+            out_file.print("error_indices[*error_count] = record_count;")
+            out_file.print("*error_count += 1;")
+        out_file.print("record += record_len;")
+    out_file.print("*consumed_len = (size_t)(record - ndjson);")
+    out_file.print("return record_count;")
+
+
+def generate_builtin_features(settings: Settings, c_file: CodeBlockPrinter) -> None:
+    """ The macros that enable the parts of the builtins the settings use, which must come before them """
+    if settings.parser_backend == "direct":
+        c_file.print("#define JS2C_DIRECT_PARSER")
+    if settings.float_parser == "eisel_lemire":
+        generate_powers_of_ten_table(c_file)
+    if settings.string_storage == "unescaped":
+        c_file.print("#define JS2C_UNESCAPE_STRINGS")
+    if settings.allocation == "arena":
+        c_file.print("#define JS2C_ARENA")
+    if settings.runtime_stats:
+        c_file.print("#define JS2C_RUNTIME_STATS")
+    if settings.runtime_stats == "timing":
+        c_file.print("#define JS2C_RUNTIME_STATS_TIMING")
+
+
 class RootGenerator:
-    def __init__(self, schema: dict[str, Any], settings: Settings) -> None:
+    def __init__(self, schema: dict[str, Any], settings: Settings, profiler: Profiler | None = None) -> None:
         self.settings = settings
+        self.profiler = profiler or Profiler()
+        if settings.parser_backend is not None and settings.parser_backend not in PARSER_BACKENDS:
+            raise SchemaError("", f"Unknown parser backend '{settings.parser_backend}', it must be one of: {', '.join(PARSER_BACKENDS)}")
+        self.direct_backend = settings.parser_backend == "direct"
+        if settings.float_parser is not None and settings.float_parser not in FLOAT_PARSERS:
+            raise SchemaError("", f"Unknown float parser '{settings.float_parser}', it must be one of: {', '.join(FLOAT_PARSERS)}")
+        if settings.string_storage is not None and settings.string_storage not in STRING_STORAGES:
+            raise SchemaError("", f"Unknown string storage '{settings.string_storage}', it must be one of: {', '.join(STRING_STORAGES)}")
+        if settings.allocation is not None and settings.allocation not in ALLOCATIONS:
+            raise SchemaError("", f"Unknown allocation '{settings.allocation}', it must be one of: {', '.join(ALLOCATIONS)}")
+        self.arena_allocation = settings.allocation == "arena"
+        if settings.count_hits not in (None, 0, 1):
+            raise SchemaError("", f"Invalid count hits setting '{settings.count_hits}', it must be 0 or 1")
+        hit_profile = HitProfile.load(settings.hit_profile) if settings.hit_profile else HitProfile()
+        if settings.runtime_stats is not None and settings.runtime_stats not in RUNTIME_STATS:
+            raise SchemaError("", f"Unknown runtime stats '{settings.runtime_stats}', it must be one of: {', '.join(RUNTIME_STATS)}")
+        self.shared = SharedState(FunctionCache(), hit_profile, RuntimeStats(), {})
         if '$id' not in schema:
             raise SchemaError("", "All schemas must have an ID (a field named '$id')")
         self.root_generator = GeneratorFactory.get_generator_for(
@@ -57,34 +118,272 @@ class RootGenerator:
                 settings,
                 GeneratorFactory,
                 TypeCache(),
+                self.shared,
             )
         )
         if self.root_generator.c_type is None:
             raise SchemaError("", "The root schema must store a value")
         self.name = schema['$id']
 
+    def out_parameters(self) -> str:
+        """ The parameters of the root parsers that receive the parsed value """
+        arena = f"json_arena_{self.name}_t *arena, " if self.arena_allocation else ""
+        return f"{arena}{self.root_generator.c_type} *out"
+
+    def out_arguments(self, out: str) -> str:
+        return f"arena, {out}" if self.arena_allocation else out
+
+    def generate_begin_arena(self, out_file: CodeBlockPrinter) -> None:
+        if self.arena_allocation:
+            out_file.print("builtin_begin_arena(parse_state, arena->buffer, arena->size, arena->used);")
+
+    def generate_parsed(self, out_file: CodeBlockPrinter) -> None:
+        """ Return after a successful parse. The caller's arena only grows if the whole document was parsed. """
+        if self.arena_allocation:
+            out_file.print("arena->used = parse_state->arena_used;")
+        out_file.print("return false;")
+
+    def generate_direct_root_parser(self, out_file: CodeBlockPrinter, max_token_num: int) -> None:
+        out_file.print(f"static bool parse_document_{self.name}(parse_state_t *parse_state, {self.out_parameters()})")
+        with out_file.code_block():
+            self.generate_begin_arena(out_file)
+            self.root_generator.generate_parser_call(
+                "out",
+                out_file,
+            )
+            if self.arena_allocation:
+                with out_file.if_block("builtin_end_document(parse_state)"):
+                    out_file.print("return true;")
+                self.generate_parsed(out_file)
+            else:
+                out_file.print("return builtin_end_document(parse_state);")
+        out_file.print("")
+
+        out_file.print(f"bool json_parse_{self.name}_with_len(const char *json_string, size_t json_string_len, {self.out_parameters()})")
+        with out_file.code_block():
+            out_file.print("parse_state_t parse_state;")
+            with out_file.if_block(f"builtin_begin_document(&parse_state, json_string, json_string_len, {max_token_num})"):
+                out_file.print("return true;")
+            with out_file.if_block(f"parse_document_{self.name}(&parse_state, {self.out_arguments('out')})"):
+                out_file.print(f"builtin_check_failed_document(&parse_state, json_string, json_string_len, {max_token_num});")
+                out_file.print("return true;")
+            out_file.print("return false;")
+        out_file.print("")
+
+        out_file.print(f"bool json_parse_{self.name}(const char *json_string, {self.out_parameters()})")
+        with out_file.code_block():
+            out_file.print(f"return json_parse_{self.name}_with_len(json_string, strlen(json_string), {self.out_arguments('out')});")
+        out_file.print("")
+
+        out_file.print(f"size_t json_parse_{self.name}_many({self.many_parameters()})")
+        with out_file.code_block():
+            generate_record_loop(
+                out_file, f"json_parse_{self.name}_with_len(record, record_len, {self.out_arguments('&out[record_count]')})"
+            )
+        out_file.print("")
+
+    def many_parameters(self) -> str:
+        return (
+            f"const char *ndjson, size_t ndjson_len, {self.out_parameters()}, size_t max_records, "
+            "size_t *error_indices, size_t *error_count, size_t *consumed_len"
+        )
+
+    def generate_parallel_many_parser(self, out_file: CodeBlockPrinter, max_token_num: int) -> None:
+        """ json_parse_*_many on several threads, with pthreads. Only compiled with JS2C_PTHREADS defined. """
+        out_file.print("#ifdef JS2C_PTHREADS")
+        out_file.print(f"static void *json_parse_{self.name}_shard(void *shard_ptr)")
+        with out_file.code_block():
+            out_file.print("builtin_shard_t *shard = (builtin_shard_t *)shard_ptr;")
+            out_file.print(f"{self.root_generator.c_type} *out = ({self.root_generator.c_type} *)shard->out + shard->record_offset;")
+            if self.arena_allocation:
+                out_file.print(f"json_arena_{self.name}_t shard_arena = {{ shard->arena, shard->arena_size, 0 }};")
+                out_file.print(f"json_arena_{self.name}_t *arena = &shard_arena;")
+            # Every thread has its own parse state, and its own token buffer on its own stack.
+            out_file.print(
+                f"(void)json_parse_{self.name}_many(shard->start, shard->length, {self.out_arguments('out')}, shard->max_records, "
+                "shard->error_indices, &shard->error_count, &shard->consumed_len);"
+            )
+            if self.arena_allocation:
+                out_file.print("shard->arena_used = shard_arena.used;")
+            out_file.print("return NULL;")
+        out_file.print("")
+
+        out_file.print(f"size_t json_parse_{self.name}_many_parallel({self.many_parameters()}, unsigned int thread_count)")
+        with out_file.code_block():
+            out_file.print("builtin_shard_t shards[JS2C_MAX_THREADS];")
+            if self.direct_backend:
+                out_file.print("const size_t stack_size = (size_t)1 << 20;")
+            else:
+                out_file.print(f"const size_t stack_size = ((size_t)1 << 20) + {max_token_num} * sizeof(jsmntok_t);")
+            with out_file.if_block("thread_count == 0"):
+                out_file.print("thread_count = 1;")
+            with out_file.if_block("thread_count > JS2C_MAX_THREADS"):
+                out_file.print("thread_count = JS2C_MAX_THREADS;")
+            out_file.print("builtin_split_shards(ndjson, ndjson_len, shards, thread_count);")
+            if self.arena_allocation:
+                # Each thread allocates from its own part of the free space of the arena
+                out_file.print("char *free_arena = (char *)arena->buffer + arena->used;")
+                out_file.print("builtin_split_arena(shards, thread_count, ndjson_len, free_arena, arena->size - arena->used);")
+            out_file.print(
+                f"builtin_run_shards(json_parse_{self.name}_shard, shards, thread_count, stack_size, out, error_indices, max_records);"
+            )
+            if self.arena_allocation:
+                out_file.print("arena->used += builtin_merge_arenas(shards, thread_count, free_arena);")
+            out_file.print(
+                "return builtin_merge_shards(shards, thread_count, ndjson, ndjson_len, max_records, error_indices, error_count, consumed_len);"
+            )
+        out_file.print("#endif /* JS2C_PTHREADS */")
+        out_file.print("")
+
     def generate_root_parser(self, out_file: CodeBlockPrinter, max_token_num: int) -> None:
-        out_file.print(f"bool json_parse_{self.name}_with_len(const char *json_string, size_t json_string_len, {self.root_generator.c_type} *out)")
+        token_type = f"json_parser_{self.name}_token_t"
+        out_file.print(
+            f"_Static_assert(sizeof({token_type}) == sizeof(jsmntok_t) && _Alignof({token_type}) == _Alignof(jsmntok_t), "
+            f'"{token_type} must match jsmntok_t, define JSMN_PARENT_LINKS for both or neither");'
+        )
+        out_file.print("")
+        out_file.print(f"void json_parser_{self.name}_init(json_parser_{self.name}_t *parser, void *token_buffer, size_t token_buffer_size)")
+        with out_file.code_block():
+            # An unaligned buffer starts at its first aligned byte instead, so it may fit one less token.
+            out_file.print("const size_t misalignment = (uintptr_t)token_buffer % _Alignof(jsmntok_t);")
+            out_file.print("const size_t padding = misalignment == 0 ? 0 : _Alignof(jsmntok_t) - misalignment;")
+            out_file.print("parser->token_buffer = token_buffer;")
+            out_file.print("parser->max_token_num = 0;")
+            with out_file.if_block("token_buffer_size >= padding"):
+                out_file.print("parser->token_buffer = (char *)token_buffer + padding;")
+                # A smaller buffer is allowed: it just makes the parser reject documents with more tokens.
+                out_file.print("parser->max_token_num = (token_buffer_size - padding) / sizeof(jsmntok_t);")
+        out_file.print("")
+
+        out_file.print(
+            f"bool json_parser_{self.name}_parse(json_parser_{self.name}_t *parser, const char *json_string, size_t json_string_len, "
+            f"{self.out_parameters()})"
+        )
         with out_file.code_block():
             out_file.print("parse_state_t parse_state_var;")
             out_file.print("parse_state_t *parse_state = &parse_state_var;")
-            out_file.print(f"jsmntok_t token_buffer[{max_token_num}];")
             parser_call = \
-                f"builtin_parse_json_string(parse_state, token_buffer, {max_token_num}, json_string, json_string_len)"
+                "builtin_parse_json_string(parse_state, parser->token_buffer, parser->max_token_num, json_string, json_string_len)"
             with out_file.if_block(parser_call):
                 out_file.print("return true;")
+            self.generate_begin_arena(out_file)
             self.root_generator.generate_parser_call(
                 "out",
                 out_file,
             )
-            out_file.print("return false;")
+            self.generate_parsed(out_file)
+        out_file.print("")
+
+        out_file.print(f"size_t json_parser_{self.name}_parse_many(json_parser_{self.name}_t *parser, {self.many_parameters()})")
+        with out_file.code_block():
+            generate_record_loop(
+                out_file, f"json_parser_{self.name}_parse(parser, record, record_len, {self.out_arguments('&out[record_count]')})"
+            )
         out_file.print("")
 
-        out_file.print(f"bool json_parse_{self.name}(const char *json_string, {self.root_generator.c_type} *out)")
+        generate_stream_parser(self, out_file)
+
+        out_file.print(f"bool json_parse_{self.name}_with_len(const char *json_string, size_t json_string_len, {self.out_parameters()})")
+        with out_file.code_block():
+            out_file.print(f"jsmntok_t token_buffer[{max_token_num}];")
+            out_file.print(f"json_parser_{self.name}_t parser;")
+            out_file.print(f"json_parser_{self.name}_init(&parser, token_buffer, sizeof(token_buffer));")
+            out_file.print(f"return json_parser_{self.name}_parse(&parser, json_string, json_string_len, {self.out_arguments('out')});")
+        out_file.print("")
+
+        out_file.print(f"bool json_parse_{self.name}(const char *json_string, {self.out_parameters()})")
         with out_file.code_block():
-            out_file.print(f"return json_parse_{self.name}_with_len(json_string, strlen(json_string), out);")
+            out_file.print(f"return json_parse_{self.name}_with_len(json_string, strlen(json_string), {self.out_arguments('out')});")
         out_file.print("")
 
+        out_file.print(f"size_t json_parse_{self.name}_many({self.many_parameters()})")
+        with out_file.code_block():
+            # One token buffer and context for all the records
+            out_file.print(f"jsmntok_t token_buffer[{max_token_num}];")
+            out_file.print(f"json_parser_{self.name}_t parser;")
+            out_file.print(f"json_parser_{self.name}_init(&parser, token_buffer, sizeof(token_buffer));")
+            out_file.print(
+                f"return json_parser_{self.name}_parse_many(&parser, ndjson, ndjson_len, {self.out_arguments('out')}, max_records, "
+                "error_indices, error_count, consumed_len);"
+            )
+        out_file.print("")
+
+    def serializer_declaration(self) -> str:
+        return f"bool json_serialize_{self.name}(const {self.root_generator.c_type} *in, char *buffer, size_t buffer_size, size_t *length)"
+
+    def generate_serializer(self, out_file: CodeBlockPrinter) -> None:
+        out_file.print(self.serializer_declaration())
+        with out_file.code_block():
+            out_file.print("serialize_state_t serialize_state_var;")
+            out_file.print("serialize_state_t *serialize_state = &serialize_state_var;")
+            out_file.print("builtin_begin_serialize(serialize_state, buffer, buffer_size);")
+            self.root_generator.generate_serializer_call("in", out_file)
+            out_file.print("return builtin_end_serialize(serialize_state, length);")
+        out_file.print("")
+
+    def generate_serializer_declarations(self, h_file: CodeBlockPrinter) -> None:
+        max_serialized_size = self.root_generator.max_serialized_size()
+        if max_serialized_size is not None:
+            h_file.print_with_docstring(
+                f"#define JSON_MAX_SERIALIZED_SIZE_{self.name.upper()} {max_serialized_size + 1}",
+                "Buffer bytes json_serialize_* needs for any parsed value, with the terminating NUL"
+            )
+        h_file.print(f"{self.serializer_declaration()};")
+
+    def max_token_num(self) -> int:
+        max_token_num = self.root_generator.max_token_num()
+        if self.settings.allow_additional_properties is not None:
+            max_token_num += self.settings.allow_additional_properties
+        return max_token_num
+
+    def generate_parser_context_declaration(self, h_file: CodeBlockPrinter) -> None:
+        # The header does not include jsmn.h: this copy of jsmntok_t is checked against it in the parser
+        h_file.print("/* Has the size and alignment of a JSMN token (jsmntok_t), so it can size and declare token buffers */")
+        h_file.print(f"typedef struct json_parser_{self.name}_token_s {{")
+        with h_file.indent():
+            h_file.print("int type;")
+            h_file.print("int start;")
+            h_file.print("int end;")
+            h_file.print("int size;")
+        h_file.print("#ifdef JSMN_PARENT_LINKS")
+        with h_file.indent():
+            h_file.print("int parent;")
+        h_file.print("#endif")
+        h_file.print(f"}} json_parser_{self.name}_token_t;")
+        h_file.print_with_docstring(
+            f"#define JSON_PARSER_{self.name.upper()}_TOKEN_BUFFER_SIZE ({self.max_token_num()} * sizeof(json_parser_{self.name}_token_t))",
+            "Token buffer bytes needed for the most complex valid document"
+        )
+        h_file.print(f"typedef struct json_parser_{self.name}_s {{")
+        with h_file.indent():
+            h_file.print_with_docstring("void *token_buffer;", "Caller-owned, reused by every parse")
+            h_file.print_with_docstring("uint64_t max_token_num;", "Number of tokens fitting in token_buffer")
+            h_file.print("/* State of a streamed document, see json_parser_*_begin */")
+            h_file.print_with_docstring("char *document;", "Caller-owned, the chunks are collected here")
+            h_file.print("size_t document_size;")
+            h_file.print("size_t document_length;")
+            h_file.print("unsigned int tokenizer_pos;")
+            h_file.print("unsigned int tokenizer_next_token;")
+            h_file.print("int tokenizer_super_token;")
+            h_file.print("int tokenizer_result;")
+        h_file.print(f"}} json_parser_{self.name}_t;")
+        h_file.print("")
+        h_file.print(f"typedef struct json_parser_{self.name}_segment_s {{")
+        with h_file.indent():
+            h_file.print("const char *data;")
+            h_file.print("size_t length;")
+        h_file.print(f"}} json_parser_{self.name}_segment_t;")
+        h_file.print("")
+
+    def generate_arena_declaration(self, h_file: CodeBlockPrinter) -> None:
+        h_file.print(f"typedef struct json_arena_{self.name}_s {{")
+        with h_file.indent():
+            h_file.print_with_docstring("void *buffer;", "Caller-owned, strings and array items are allocated here")
+            h_file.print("size_t size;")
+            h_file.print_with_docstring("size_t used;", "Grows with every parsed document. Set it to 0 to reuse the arena.")
+        h_file.print(f"}} json_arena_{self.name}_t;")
+        h_file.print("")
+
     def generate_parser_h(self, h_file_path: str) -> CodeBlockPrinter:
         h_file = CodeBlockPrinter(h_file_path)
 
@@ -109,8 +408,24 @@ class RootGenerator:
         h_file.print_separator("Generated type declarations")
         assert self.root_generator.c_type is not None, "__init__ rejects a root that stores nothing."
         self.root_generator.c_type.generate_type_declaration(h_file)
-        h_file.print(f"bool json_parse_{self.name}(const char *json_string, {self.root_generator.c_type} *out);")
-        h_file.print(f"bool json_parse_{self.name}_with_len(const char *json_string, size_t json_string_len, {self.root_generator.c_type} *out);")
+        if self.arena_allocation:
+            self.generate_arena_declaration(h_file)
+        h_file.print(f"bool json_parse_{self.name}(const char *json_string, {self.out_parameters()});")
+        h_file.print(f"bool json_parse_{self.name}_with_len(const char *json_string, size_t json_string_len, {self.out_parameters()});")
+        h_file.print(f"size_t json_parse_{self.name}_many({self.many_parameters()});")
+        # Only defined with JS2C_PTHREADS, so without it, a call is a compile error, not a link error.
+        h_file.print("#ifdef JS2C_PTHREADS")
+        h_file.print(f"size_t json_parse_{self.name}_many_parallel({self.many_parameters()}, unsigned int thread_count);")
+        h_file.print("#endif")
+        if not self.direct_backend:
+            self.generate_parser_context_api_declarations(h_file)
+        if self.root_generator.can_serialize():
+            self.generate_serializer_declarations(h_file)
+        if self.settings.count_hits:
+            h_file.print(f"bool json_hit_counts_{self.name}_save(const char *path);")
+        if self.settings.runtime_stats:
+            h_file.print(f"bool json_runtime_stats_{self.name}_save(const char *path);")
+            h_file.print(f"void json_runtime_stats_{self.name}_reset(void);")
 
         h_file.print("#ifdef __cplusplus")
         h_file.print("}")
@@ -124,6 +439,24 @@ class RootGenerator:
         h_file.print("")
         return h_file
 
+    def generate_parser_context_api_declarations(self, h_file: CodeBlockPrinter) -> None:
+        """ The token buffer contexts, and the streaming API built on them, only exist for the jsmn backend """
+        h_file.print("")
+        self.generate_parser_context_declaration(h_file)
+        h_file.print(f"void json_parser_{self.name}_init(json_parser_{self.name}_t *parser, void *token_buffer, size_t token_buffer_size);")
+        h_file.print(
+            f"bool json_parser_{self.name}_parse(json_parser_{self.name}_t *parser, const char *json_string, size_t json_string_len, "
+            f"{self.out_parameters()});"
+        )
+        h_file.print(f"size_t json_parser_{self.name}_parse_many(json_parser_{self.name}_t *parser, {self.many_parameters()});")
+        parser_type = f"json_parser_{self.name}_t"
+        h_file.print(f"void json_parser_{self.name}_begin({parser_type} *parser, char *document_buffer, size_t document_buffer_size);")
+        h_file.print(f"bool json_parser_{self.name}_feed({parser_type} *parser, const char *chunk, size_t chunk_len);")
+        h_file.print(
+            f"bool json_parser_{self.name}_feedv({parser_type} *parser, const json_parser_{self.name}_segment_t *segments, size_t segment_count);"
+        )
+        h_file.print(f"bool json_parser_{self.name}_finish({parser_type} *parser, {self.out_parameters()});")
+
     @classmethod
     def manually_include_jsmn(cls, c_file: CodeBlockPrinter) -> None:
         with open(os.path.join(DIR_OF_THIS_FILE, '..', '..', 'jsmn', 'jsmn.h'), encoding='utf-8') as jsmn_h:
@@ -133,20 +466,28 @@ class RootGenerator:
             c_file.print_separator("end of jsmn.h")
             c_file.print("")
 
-    @classmethod
-    def manually_include_builtins(cls, c_file: CodeBlockPrinter) -> None:
+    def manually_include_builtins(self, c_file: CodeBlockPrinter) -> None:
         with open(os.path.join(DIR_OF_THIS_FILE, 'js2c_builtins.h'), encoding='utf-8') as builtins_file:
             c_file.print_separator("js2c_builtins.h")
             builtins_file_contents = builtins_file.read()
             jsmn_include_string = '#include "jsmn.h"\n'
             split_pos = builtins_file_contents.index(jsmn_include_string)
             c_file.write(builtins_file_contents[:split_pos])
-            cls.manually_include_jsmn(c_file)
+            if not self.direct_backend:
+                self.manually_include_jsmn(c_file)
             c_file.write(builtins_file_contents[split_pos + len(jsmn_include_string):])
 
             c_file.print_separator("end of js2c_builtins.h")
             c_file.print("")
 
+    def generate_profiling_functions(self, c_file: CodeBlockPrinter) -> None:
+        """ The functions saving the hit counts and the runtime statistics, if the parser collects them """
+        if self.settings.count_hits:
+            self.shared.hit_profile.generate_save_function(f"json_hit_counts_{self.name}_save", c_file)
+        if self.settings.runtime_stats:
+            self.shared.runtime_stats.generate_save_function(f"json_runtime_stats_{self.name}_save", c_file)
+            self.shared.runtime_stats.generate_reset_function(f"json_runtime_stats_{self.name}_reset", c_file)
+
     def generate_parser_c(self, c_file_path: str, h_file_name: str) -> CodeBlockPrinter:
         c_file = CodeBlockPrinter(c_file_path)
 
@@ -157,18 +498,30 @@ class RootGenerator:
             c_file.print_separator("User-added prefix")
             c_file.write(self.settings.c_prefix_file.read())
 
+        generate_builtin_features(self.settings, c_file)
         if self.settings.include_external_builtins_file:
             c_file.print(f'#include "{self.settings.include_external_builtins_file}"')
         else:
             self.manually_include_builtins(c_file)
         c_file.print_separator("Generated parsers")
         c_file.print("")
-        self.root_generator.generate_parser_bodies(c_file)
+        with self.profiler.phase("generate_parser_bodies"):
+            self.root_generator.generate_parser_bodies(c_file)
 
-        max_token_num = self.root_generator.max_token_num()
-        if self.settings.allow_additional_properties is not None:
-            max_token_num += self.settings.allow_additional_properties
-        self.generate_root_parser(c_file, max_token_num)
+        with self.profiler.phase("generate_root_parsers"):
+            if self.direct_backend:
+                self.generate_direct_root_parser(c_file, self.max_token_num())
+            else:
+                self.generate_root_parser(c_file, self.max_token_num())
+            self.generate_parallel_many_parser(c_file, self.max_token_num())
+            self.generate_profiling_functions(c_file)
+
+        if self.root_generator.can_serialize():
+            c_file.print_separator("Generated serializers")
+            c_file.print("")
+            with self.profiler.phase("generate_serializer_bodies"):
+                self.root_generator.generate_serializer_bodies(c_file)
+                self.generate_serializer(c_file)
 
         if self.settings.c_postfix_file:
             c_file.print_separator("User-added postfix")
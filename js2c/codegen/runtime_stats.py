@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from .base import Generator, c_string_literal
+from .code_block_printer import CodeBlockPrinter
+
+# The fields of builtin_function_stats_t, in the order they are saved
+FUNCTION_STATS = ("calls", "errors", "tokens", "nanoseconds")
+# The counters of the whole parser, builtin_stats_*
+PARSER_STATS = ("skipped_tokens", "failed_attempts")
+
+
+def collects_stats(generator: Generator) -> bool:
+    """ Whether every parse function updates its runtime statistics """
+    return generator.settings.runtime_stats is not None
+
+
+def runtime_stats_variable(generator: Generator) -> str:
+    return f"runtime_stats_{generator.parser_name}"
+
+
+@contextmanager
+def parser_function(generator: Generator, out_type: str | None, out_file: CodeBlockPrinter) -> Iterator[None]:
+    """
+    Print parse_<parser_name>, storing into a pointer to out_type (if not None), with the body printed in
+    the with block. With runtime_stats, the body goes to parse_<parser_name>_body, called by a parse
+    function which updates the statistics.
+    """
+    parser_name = generator.parser_name
+    parameters = "parse_state_t *parse_state" + (f", {out_type} *out" if out_type is not None else "")
+    if not collects_stats(generator):
+        out_file.print(f"static bool parse_{parser_name}({parameters})")
+        with out_file.code_block():
+            yield
+        return
+    out_file.print(f"static bool parse_{parser_name}_body({parameters})")
+    with out_file.code_block():
+        yield
+    out_file.print("")
+    out_file.print(f"static builtin_function_stats_t {runtime_stats_variable(generator)};")
+    out_file.print(f"static bool parse_{parser_name}({parameters})")
+    with out_file.code_block():
+        out_file.print("const builtin_function_start_t start = builtin_function_begin(parse_state);")
+        arguments = "parse_state" + (", out" if out_type is not None else "")
+        out_file.print(
+            f"return builtin_function_end(&{runtime_stats_variable(generator)}, parse_state, start, "
+            f"parse_{parser_name}_body({arguments}));"
+        )
+    generator.shared.runtime_stats.add_function(generator)
+
+
+class RuntimeStats:
+    """
+    The parse functions of a parser generated with the runtime_stats setting, each of which has a
+    builtin_function_stats_t, for the functions that save and reset them.
+
+    The saved file is a JSON object, with PARSER_STATS, and the FUNCTION_STATS of each function by name.
+    """
+
+    def __init__(self) -> None:
+        # The generators with a parse function. Its name is only looked up when saving, once it is known which parser is shared.
+        self.generators: list[Generator] = []
+
+    def add_function(self, generator: Generator) -> None:
+        self.generators.append(generator)
+
+    def stats_variables(self) -> list[str]:
+        """ The builtin_function_stats_t variables of the parse functions, each once, by function name """
+        return sorted({runtime_stats_variable(generator) for generator in self.generators})
+
+    def generate_save_function(self, function_name: str, out_file: CodeBlockPrinter) -> None:
+        out_file.print(f"bool {function_name}(const char *path)")
+        with out_file.code_block():
+            out_file.print('FILE *file = fopen(path, "w");')
+            with out_file.if_block("file == NULL"):
+                out_file.print("return true;")
+            separator = "{"
+            for stat in PARSER_STATS:
+                text = f"{separator}\n  {json.dumps(stat)}: "
+                out_file.print(f'fprintf(file, "%s%" PRIu64, {c_string_literal(text.encode("utf-8"))}, builtin_stats_{stat});')
+                separator = ","
+            text = ',\n  "functions": {'
+            for variable_index, variable in enumerate(self.stats_variables()):
+                function = variable.removeprefix("runtime_stats_")
+                text += ("," if variable_index else "") + f"\n    {json.dumps(f'parse_{function}')}: {{"
+                for stat_index, stat in enumerate(FUNCTION_STATS):
+                    text += (", " if stat_index else "") + f"{json.dumps(stat)}: "
+                    out_file.print(f'fprintf(file, "%s%" PRIu64, {c_string_literal(text.encode("utf-8"))}, {variable}.{stat});')
+                    text = ""
+                text += "}"
+            text += "\n  }\n}\n"
+            out_file.print(f'fputs({c_string_literal(text.encode("utf-8"))}, file);')
+            out_file.print("bool error = ferror(file);")
+            out_file.print("return fclose(file) != 0 || error;")
+        out_file.print("")
+
+    def generate_reset_function(self, function_name: str, out_file: CodeBlockPrinter) -> None:
+        # Not atomic: it is meant to be called between parses.
+        out_file.print(f"void {function_name}(void)")
+        with out_file.code_block():
+            for stat in PARSER_STATS:
+                out_file.print(f"builtin_stats_{stat} = 0;")
+            for variable in self.stats_variables():
+                out_file.print(f"memset(&{variable}, 0, sizeof({variable}));")
+        out_file.print("")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .code_block_printer import CodeBlockPrinter
+
+if TYPE_CHECKING:
+    # It imports this module, so it can only be named in annotations.
+    from .root import RootGenerator
+
+
+def generate_stream_parser(root: RootGenerator, out_file: CodeBlockPrinter) -> None:
+    """ json_parser_*_begin, _feed, _feedv and _finish: a document tokenized as its chunks arrive, then parsed """
+    parser_type = f"json_parser_{root.name}_t"
+    out_file.print(f"void json_parser_{root.name}_begin({parser_type} *parser, char *document_buffer, size_t document_buffer_size)")
+    with out_file.code_block():
+        out_file.print("jsmn_parser tokenizer;")
+        out_file.print("jsmn_init(&tokenizer);")
+        out_file.print("parser->document = document_buffer;")
+        out_file.print("parser->document_size = document_buffer_size;")
+        out_file.print("parser->document_length = 0;")
+        out_file.print("parser->tokenizer_pos = tokenizer.pos;")
+        out_file.print("parser->tokenizer_next_token = tokenizer.toknext;")
+        out_file.print("parser->tokenizer_super_token = tokenizer.toksuper;")
+        out_file.print("parser->tokenizer_result = 0;")
+    out_file.print("")
+    generate_stream_feed(root, out_file)
+    generate_stream_finish(root, out_file)
+
+
+def generate_stream_feed(root: RootGenerator, out_file: CodeBlockPrinter) -> None:
+    parser_type = f"json_parser_{root.name}_t"
+    out_file.print(f"bool json_parser_{root.name}_feed({parser_type} *parser, const char *chunk, size_t chunk_len)")
+    with out_file.code_block():
+        # A failed stream stays failed until the next begin.
+        with out_file.if_block("parser->tokenizer_result < 0 && parser->tokenizer_result != JSMN_ERROR_PART"):
+            out_file.print("return true;")
+        with out_file.if_block("chunk_len > parser->document_size - parser->document_length"):
+            out_file.print('LOG_ERROR(parser->document_length, "Document too large for the stream buffer");')
+            out_file.print("parser->tokenizer_result = JSMN_ERROR_NOMEM;")
+            out_file.print("return true;")
+        # Data received straight into the document buffer is already in place.
+        with out_file.if_block("chunk != parser->document + parser->document_length"):
+            out_file.print("memcpy(parser->document + parser->document_length, chunk, chunk_len);")
+        out_file.print("parser->document_length += chunk_len;")
+        out_file.print("jsmn_parser tokenizer;")
+        out_file.print("tokenizer.pos = parser->tokenizer_pos;")
+        out_file.print("tokenizer.toknext = parser->tokenizer_next_token;")
+        out_file.print("tokenizer.toksuper = parser->tokenizer_super_token;")
+        out_file.print(
+            "const bool result = builtin_tokenize_more(&tokenizer, parser->token_buffer, parser->max_token_num, "
+            "parser->document, parser->document_length, &parser->tokenizer_result);"
+        )
+        out_file.print("parser->tokenizer_pos = tokenizer.pos;")
+        out_file.print("parser->tokenizer_next_token = tokenizer.toknext;")
+        out_file.print("parser->tokenizer_super_token = tokenizer.toksuper;")
+        out_file.print("return result;")
+    out_file.print("")
+
+    out_file.print(
+        f"bool json_parser_{root.name}_feedv({parser_type} *parser, const json_parser_{root.name}_segment_t *segments, size_t segment_count)"
+    )
+    with out_file.code_block():
+        with out_file.for_block("size_t i = 0; i < segment_count; ++i"):
+            with out_file.if_block(f"json_parser_{root.name}_feed(parser, segments[i].data, segments[i].length)"):
+                out_file.print("return true;")
+        out_file.print("return false;")
+    out_file.print("")
+
+
+def generate_stream_finish(root: RootGenerator, out_file: CodeBlockPrinter) -> None:
+    out_file.print(f"bool json_parser_{root.name}_finish(json_parser_{root.name}_t *parser, {root.out_parameters()})")
+    with out_file.code_block():
+        with out_file.if_block("builtin_check_token_num(parser->tokenizer_result, parser->tokenizer_pos)"):
+            out_file.print("return true;")
+        out_file.print("parse_state_t parse_state_var;")
+        out_file.print("parse_state_t *parse_state = &parse_state_var;")
+        out_file.print("builtin_init_parse_state(parse_state, parser->token_buffer, parser->max_token_num, parser->document);")
+        root.generate_begin_arena(out_file)
+        root.root_generator.generate_parser_call(
+            "out",
+            out_file,
+        )
+        root.generate_parsed(out_file)
+    out_file.print("")
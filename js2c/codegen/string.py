@@ -24,26 +24,36 @@
 #
 from typing import Any
 
-from .base import Generator, CType, SchemaError, GeneratorInitParameters
+from .base import Generator, CType, SchemaError, GeneratorInitParameters, c_string_literal
 from .code_block_printer import CodeBlockPrinter
 
 
 class StringType(CType):
-    def __init__(self, type_name: str, description: str | None, max_length: int) -> None:
+    def __init__(self, type_name: str, description: str | None, max_length: int, arena: bool = False) -> None:
         super().__init__(type_name, description)
         self.max_length = max_length
+        # The characters are allocated from the caller's arena, instead of stored in the struct
+        self.arena = arena
 
     def generate_type_declaration_impl(self, out_file: CodeBlockPrinter) -> None:
-        out_file.print_with_docstring(
-            f"typedef char {self.type_name}[{self.max_length + 1}];", self.description
-        )
+        if self.arena:
+            out_file.print_with_docstring(f"typedef struct {self.type_name}_s {{", self.description)
+            with out_file.indent():
+                out_file.print_with_docstring("const char *chars;", "NUL terminated")
+                out_file.print_with_docstring("size_t length;", "Without the terminating NUL")
+            out_file.print(f"}} {self.type_name};")
+        else:
+            out_file.print_with_docstring(
+                f"typedef char {self.type_name}[{self.max_length + 1}];", self.description
+            )
         out_file.print("")
 
     def __eq__(self, other: object) -> bool:
         return (
             super().__eq__(other) and
             isinstance(other, StringType) and
-            self.max_length == other.max_length
+            self.max_length == other.max_length and
+            self.arena == other.arena
         )
 
 
@@ -66,10 +76,10 @@ class StringGenerator(Generator):
         if self.maxLength is None:
             raise SchemaError(self, "Strings must have maxLength")
 
-        if self.default is not None and len(self.default) > self.maxLength:
+        if self.default is not None and self.stored_length(self.default) > self.maxLength:
             raise SchemaError(self, "String default value longer than maxLength")
 
-        if self.default is not None and len(self.default) < self.minLength:
+        if self.default is not None and self.stored_length(self.default) < self.minLength:
             raise SchemaError(self, "String default value shorter than minLength")
 
         if self.js2cParseFunction is not None:
@@ -77,13 +87,24 @@ class StringGenerator(Generator):
                 raise SchemaError(self, "js2cParseFunction needs js2cType, as its output type cannot be guessed")
             self.c_type = CType(self.js2cType, self.description)
         else:
-            self.c_type = StringType(self.type_name, self.description, self.maxLength)
+            self.c_type = StringType(self.type_name, self.description, self.maxLength, self.arena_allocation)
         self.c_type = parameters.type_cache.try_get_cached(self.c_type, self.path_in_schema)
 
     @classmethod
     def can_parse_schema(cls, schema: dict[str, Any]) -> bool:
         return schema.get('type') == 'string'
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset(("JSMN_STRING",))
+
+    @property
+    def unescaped(self) -> bool:
+        """ Whether the escapes are decoded when the string is stored, and the lengths are UTF-8 bytes """
+        return self.settings.string_storage == "unescaped"
+
+    def stored_length(self, value: str) -> int:
+        return len(value.encode("utf-8")) if self.unescaped else len(value)
+
     def generate_parser_call(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         if self.js2cParseFunction is not None:
             length_check = \
@@ -97,19 +118,50 @@ class StringGenerator(Generator):
                 ["CURRENT_STRING_LENGTH(parse_state)", "CURRENT_STRING(parse_state)"],
                 out_file
             )
-            out_file.print("parse_state->current_token += 1;")
+            out_file.print("builtin_consume_value(parse_state);")
+        elif self.arena_allocation:
+            parser_fn = "builtin_parse_unescaped_arena_string" if self.unescaped else "builtin_parse_arena_string"
+            # out_var_name is a pointer, usually the address of a field
+            out_var = out_var_name[1:] + "." if out_var_name.startswith("&") else out_var_name + "->"
+            length_check = \
+                f"{parser_fn}(parse_state, &{out_var}chars, &{out_var}length, {self.minLength}, {self.maxLength})"
+            with out_file.if_block(length_check):
+                out_file.print("return true;")
         else:
+            parser_fn = "builtin_parse_unescaped_string" if self.unescaped else "builtin_parse_string"
             length_check = \
-                f"builtin_parse_string(parse_state, {out_var_name}[0], {self.minLength}, {self.maxLength})"
+                f"{parser_fn}(parse_state, {out_var_name}[0], {self.minLength}, {self.maxLength})"
             with out_file.if_block(length_check):
                 out_file.print("return true;")
 
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        # An escaped string is still JSON, so it is written back as it was read.
+        serializer_fn = "builtin_serialize_escaped_string" if self.unescaped else "builtin_serialize_string"
+        if self.arena_allocation:
+            # in_var_name is a pointer, usually the address of a field
+            in_var = in_var_name[1:] + "." if in_var_name.startswith("&") else in_var_name + "->"
+            serializer_call = f"{serializer_fn}(serialize_state, {in_var}chars, {in_var}length)"
+        else:
+            serializer_call = \
+                f"{serializer_fn}(serialize_state, {in_var_name}[0], builtin_string_length({in_var_name}[0], {self.maxLength}))"
+        with out_file.if_block(serializer_call):
+            out_file.print("return true;")
+
+    def max_serialized_size(self) -> int:
+        assert self.maxLength is not None, "__init__ rejects a string without maxLength."
+        # Every character may become a 6 character \u escape, between the quotes.
+        return (6 if self.unescaped else 1) * self.maxLength + 2
+
     def has_default_value(self) -> bool:
         return super().has_default_value() or self.default is not None
 
     def generate_set_default_value(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         assert self.has_default_value(), "Caller is responsible for checking this."
         assert self.maxLength is not None, "__init__ rejects a string without maxLength."
+        if self.js2cDefault is not None and self.arena_allocation and self.js2cParseFunction is None:
+            out_file.print(f"{out_var_name}.chars = {self.js2cDefault};")
+            out_file.print(f"{out_var_name}.length = strlen({out_var_name}.chars);")
+            return
         if self.js2cDefault is not None:
             out_file.print(
                 f'strncpy({out_var_name}, {self.js2cDefault}, {self.maxLength + 1});'
@@ -128,6 +180,16 @@ class StringGenerator(Generator):
                     [str(len(self.default)), f'"{self.default}"'],
                     out_file
                 )
+        elif self.arena_allocation:
+            # A default is not copied to the arena, it points to a string literal
+            default_literal = c_string_literal(self.default.encode("utf-8")) if self.unescaped else f'"{self.default}"'
+            out_file.print(f"{out_var_name}.chars = {default_literal};")
+            out_file.print(f"{out_var_name}.length = {self.stored_length(self.default)};")
+        elif self.unescaped:
+            default = self.default.encode("utf-8")
+            out_file.print(
+                f'memcpy({out_var_name}, {c_string_literal(default)}, {len(default) + 1});'
+            )
         else:
             out_file.print(
                 f'memcpy({out_var_name}, "{self.default}", {len(self.default) + 1});'
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+from collections.abc import Sequence
+
+from .code_block_printer import CodeBlockPrinter
+from .function_cache import NAME_PLACEHOLDER, FunctionCache
+from .hit_profile import hot_first
+
+
+def c_char_literal(byte: int) -> str:
+    if byte in (ord("'"), ord("\\")):
+        return f"'\\{chr(byte)}'"
+    if 0x20 <= byte < 0x7f:
+        return f"'{chr(byte)}'"
+    return f"'\\x{byte:02x}'"
+
+
+# A string gets its own comparison, before the decision tree, if it has at least this share of the hits.
+HOT_STRING_SHARE = 0.1
+
+
+def generate_string_lookup(
+    function_name: str,
+    strings: Sequence[str],
+    out_file: CodeBlockPrinter,
+    hits: Sequence[int] | None = None,
+) -> None:
+    """
+    Emit a function returning the index of a (not zero terminated) string in strings, or -1.
+    hits are how often each string was looked up, from a hit profile. The common ones are then checked first.
+    """
+    # The decision tree is built here: a switch on the length, then on the bytes that differ between
+    # the remaining candidates, so a lookup is a few jumps and a single memcmp, however many strings.
+    out_file.print(f"static inline int {function_name}(const char *string, int length)")
+    with out_file.code_block():
+        if not strings:
+            out_file.print("(void)string;")
+            out_file.print("(void)length;")
+            out_file.print("return -1;")
+            return
+        unique: dict[str, int] = {}
+        for index, string in enumerate(strings):
+            # Only the first of duplicate strings can ever match.
+            unique.setdefault(string, index)
+        if hits is not None:
+            # A few comparisons are cheaper than the jumps of the tree, when they are nearly always the match.
+            total_hits = sum(hits)
+            for index in hot_first(hits):
+                if strings[index] in unique and total_hits and hits[index] >= HOT_STRING_SHARE * total_hits:
+                    del unique[strings[index]]
+                    length = len(strings[index].encode("utf-8"))
+                    with out_file.if_block(f'length == {length} && memcmp(string, "{strings[index]}", {length}) == 0'):
+                        out_file.print(f"return {index};")
+        by_length: dict[int, list[tuple[int, str]]] = {}
+        for string, index in unique.items():
+            by_length.setdefault(len(string.encode("utf-8")), []).append((index, string))
+        if by_length:
+            with out_file.switch_block("length"):
+                for length, candidates in ordered_by_hits(sorted(by_length.items()), hits):
+                    out_file.print(f"case {length}:")
+                    with out_file.indent():
+                        generate_candidate_dispatch(candidates, out_file, hits)
+                        out_file.print("break;")
+        out_file.print("return -1;")
+    out_file.print("")
+
+
+def ordered_by_hits(
+    groups: Sequence[tuple[int, list[tuple[int, str]]]],
+    hits: Sequence[int] | None,
+) -> Sequence[tuple[int, list[tuple[int, str]]]]:
+    """ The cases of a switch, the most hit first, so that their code is laid out in that order """
+    if hits is None:
+        return groups
+    return sorted(groups, key=lambda group: -sum(hits[index] for index, _ in group[1]))
+
+
+def generate_candidate_dispatch(
+    candidates: Sequence[tuple[int, str]],
+    out_file: CodeBlockPrinter,
+    hits: Sequence[int] | None = None,
+) -> None:
+    # All candidates have the same length here.
+    if len(candidates) == 1:
+        index, string = candidates[0]
+        with out_file.if_block(f'memcmp(string, "{string}", {len(string.encode("utf-8"))}) == 0'):
+            out_file.print(f"return {index};")
+        return
+
+    encoded = [string.encode("utf-8") for _, string in candidates]
+    # Switch on the byte that splits the candidates into the most groups. The strings are
+    # distinct, so there is always one that splits them into at least two.
+    position = max(range(len(encoded[0])), key=lambda p: len({e[p] for e in encoded}))
+    groups: dict[int, list[tuple[int, str]]] = {}
+    for candidate, encoded_candidate in zip(candidates, encoded):
+        groups.setdefault(encoded_candidate[position], []).append(candidate)
+    with out_file.switch_block(f"string[{position}]"):
+        for byte, group in ordered_by_hits(list(groups.items()), hits):
+            out_file.print(f"case {c_char_literal(byte)}:")
+            with out_file.indent():
+                generate_candidate_dispatch(group, out_file, hits)
+                out_file.print("break;")
+
+
+def generate_unique_string_lookup(
+    function_name: str,
+    strings: Sequence[str],
+    function_cache: FunctionCache,
+    out_file: CodeBlockPrinter,
+    hits: Sequence[int] | None = None,
+) -> str:
+    """
+    generate_string_lookup, unless the very same lookup was printed already, for other strings of the same type
+    or of another type. Returns the name of the function to call.
+    """
+    lookup = CodeBlockPrinter(out_file.filepath)
+    generate_string_lookup(NAME_PLACEHOLDER, strings, lookup, hits)
+    return function_cache.print_unique(lookup, function_name, out_file)
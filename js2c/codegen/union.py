@@ -24,12 +24,18 @@
 #
 import os.path
 
+from collections.abc import Sequence
 from typing import Any
 
-from .base import Generator, CType, SchemaError, C_RESERVED, GeneratorInitParameters
+from .base import Generator, CType, SchemaError, C_RESERVED, TOKEN_TYPES, GeneratorInitParameters
 from .code_block_printer import CodeBlockPrinter
+from .const import ConstGenerator
+from .hit_profile import generate_hit_count, generate_hit_counters, hot_first, option_hit_names, profiled_hits
+from .object import ObjectGenerator
+from .runtime_stats import collects_stats, parser_function
+from .string_lookup import generate_string_lookup
 from .type_cache import TypeCache
-from .enum import EnumType
+from .enum import EnumGenerator, EnumType
 
 
 class UnionType(CType):
@@ -116,43 +122,233 @@ class UnionGenerator(Generator):
             out_file.print("return true;")
 
     def generate_parser_bodies(self, out_file: CodeBlockPrinter) -> None:
-        option_parsers = []
-        for i, option_generator in enumerate(self.option_generators):
+        for option_generator in self.option_generators:
             option_generator.generate_parser_bodies(out_file)
-            # Give each option a bool-returning parser, so a failed attempt can be caught at the call
-            # site (rewind and try the next) without threading a failure action through every generator.
-            option_parser = f"parse_{self.parser_name}_try_{i}"
-            out_file.print(f"static bool {option_parser}(parse_state_t *parse_state, {option_generator.c_type} *out)")
-            with out_file.code_block():
-                option_generator.generate_parser_call("out", out_file)
-                out_file.print("return false;")
-            out_file.print("")
-            option_parsers.append(option_parser)
-
-        out_file.print(f"static bool parse_{self.parser_name}(parse_state_t *parse_state, {self.c_type} *out)")
-        with out_file.code_block():
-            # Each option runs on a copy, so a failed attempt leaves parse_state untouched, and its
-            # errors (an expected failure) are muted just on that copy.
-            out_file.print("parse_state_t attempt = *parse_state;")
-            out_file.print("attempt.inhibit_errors = true;")
-            for i, (option_parser, option_name, enum_label) in enumerate(zip(option_parsers, self.c_type.option_names, self.c_type.tag_type.enum_labels)):
-                if i != 0:
-                    out_file.print("else")
-                retry = "" if i == 0 else "attempt = *parse_state, attempt.inhibit_errors = true, "
-                with out_file.if_block(f"{retry}!{option_parser}(&attempt, &out->{option_name})"):
-                    out_file.print(f"out->type = {enum_label};")
-            out_file.print("else")
-            with out_file.code_block():
+
+        with self.unique_functions("parser_name", out_file) as functions:
+            generate_hit_counters(self, "options", option_hit_names(len(self.option_generators)), functions)
+            option_parsers = []
+            for i, option_generator in enumerate(self.option_generators):
+                # Give each option a bool-returning parser, so a failed attempt can be caught at the call
+                # site (rewind and try the next) without threading a failure action through every generator.
+                option_parser = f"parse_{self.parser_name}_try_{i}"
+                functions.print(f"static bool {option_parser}(parse_state_t *parse_state, {option_generator.c_type} *out)")
+                with functions.code_block():
+                    option_generator.generate_parser_call("out", functions)
+                    functions.print("return false;")
+                functions.print("")
+                option_parsers.append(option_parser)
+
+            # The options that accept each token type, in order. Types with the same options share a case.
+            candidates_by_type: dict[tuple[int, ...], list[str]] = {}
+            for token_type in sorted(TOKEN_TYPES):
+                candidates = tuple(
+                    i for i, option in enumerate(self.option_generators) if token_type in option.first_token_types()
+                )
+                if candidates:
+                    candidates_by_type.setdefault(candidates, []).append(token_type)
+            object_candidates = next((c for c, types in candidates_by_type.items() if "JSMN_OBJECT" in types), ())
+            if len(object_candidates) > 1:
+                self.generate_discriminator_lookups(object_candidates, functions)
+
+            with parser_function(self, str(self.c_type), functions):
+                # Each option runs on a copy, so a failed attempt leaves parse_state untouched, and its
+                # errors (an expected failure) are muted just on that copy.
+                functions.print("parse_state_t attempt = *parse_state;")
+                functions.print("attempt.inhibit_errors = true;")
+                # An option is only tried on a token it accepts. The attempts break out of the switch when none matched.
+                with functions.switch_block("CURRENT_TOKEN(parse_state).type"):
+                    for candidates, token_types in candidates_by_type.items():
+                        for token_type in token_types:
+                            functions.print(f"case {token_type}:")
+                        with functions.code_block():
+                            if "JSMN_OBJECT" in token_types and self.can_dispatch_objects(candidates):
+                                self.generate_object_dispatch(candidates, option_parsers, functions)
+                            else:
+                                self.generate_attempts(candidates, option_parsers, functions)
+                            functions.print("break;")
+                    functions.print("default:")
+                    with functions.indent():
+                        functions.print("break;")
+                if self.direct_backend:
+                    # A syntax error is in the document, not in the option: the other options would hit it too.
+                    with functions.if_block("attempt.syntax_error"):
+                        functions.print("parse_state->syntax_error = true;")
+                        functions.print("return true;")
                 self.generate_logged_error(
                     ["Invalid anyOf value in '%s': no option matched", "parse_state->current_key"],
-                    out_file)
-            out_file.print("parse_state->current_token = attempt.current_token;")
+                    functions)
+            functions.print("")
+
+    def generate_attempt(self, option_index: int, option_parsers: list[str], out_file: CodeBlockPrinter) -> None:
+        """ Try an option on attempt, which must be a fresh copy of parse_state. Returns if it matched. """
+        option_name = self.c_type.option_names[option_index]
+        with out_file.if_block(f"!{option_parsers[option_index]}(&attempt, &out->{option_name})"):
+            generate_hit_count(self, option_index, out_file)
+            out_file.print(f"out->type = {self.c_type.tag_type.enum_labels[option_index]};")
+            out_file.print("builtin_commit_attempt(parse_state, &attempt);")
             out_file.print("return false;")
-        out_file.print("")
+        if collects_stats(self):
+            out_file.print("builtin_stats_add(&builtin_stats_failed_attempts, 1);")
+
+    def generate_attempts(self, candidates: Sequence[int], option_parsers: list[str], out_file: CodeBlockPrinter) -> None:
+        """ Try the candidates one after the other. The code after them runs if none matched. """
+        option_hits = profiled_hits(self, "options", option_hit_names(len(self.option_generators)))
+        if option_hits is not None and self.mutually_exclusive(candidates):
+            # Only one of them can match, so the one that usually does is tried first.
+            candidates = [candidates[i] for i in hot_first([option_hits[option_index] for option_index in candidates])]
+        for i, option_index in enumerate(candidates):
+            if i != 0:
+                if self.direct_backend:
+                    with out_file.if_block("attempt.syntax_error"):
+                        out_file.print("break;")
+                out_file.print("attempt = *parse_state;")
+                out_file.print("attempt.inhibit_errors = true;")
+            self.generate_attempt(option_index, option_parsers, out_file)
+
+    def mutually_exclusive(self, candidates: Sequence[int]) -> bool:
+        """ Whether no value can match two of the candidates, so trying them in a different order gives the same result """
+        for i, first_index in enumerate(candidates):
+            for second_index in candidates[i + 1:]:
+                first, second = self.option_generators[first_index], self.option_generators[second_index]
+                if not first.json_types() & second.json_types():
+                    continue
+                if isinstance(first, EnumGenerator) and isinstance(second, EnumGenerator) and not set(first.enum) & set(second.enum):
+                    continue
+                return False
+        return True
+
+    def object_options(self, candidates: Sequence[int]) -> list[ObjectGenerator] | None:
+        options = [self.option_generators[i] for i in candidates]
+        if not all(isinstance(option, ObjectGenerator) for option in options):
+            return None
+        return [option for option in options if isinstance(option, ObjectGenerator)]
+
+    @classmethod
+    def checked_required_field(cls, option: ObjectGenerator, key: str) -> bool:
+        """ Whether a valid object always has this key: a required field, with no default to fall back to """
+        return key in option.required and key in option.fields and not option.fields[key].has_default_value()
+
+    def const_discriminator(self, candidates: Sequence[int]) -> tuple[str, list[str]] | None:
+        """ A required string const field of every candidate object, with a different value in each """
+        options = self.object_options(candidates)
+        if options is None:
+            return None
+        for key in options[0].required:
+            values = []
+            for option in options:
+                field = option.fields.get(key)
+                if not self.checked_required_field(option, key) or not isinstance(field, ConstGenerator) \
+                        or not isinstance(field.const, str):
+                    break
+                values.append(field.const)
+            else:
+                if len(set(values)) == len(values):
+                    return key, values
+        return None
+
+    def unique_required_keys(self, candidates: Sequence[int]) -> list[str] | None:
+        """ A required key of each candidate object, which all the other candidates reject as unknown """
+        options = self.object_options(candidates)
+        # With allow_additional_properties, every object skips the keys it does not know.
+        if options is None or self.settings.allow_additional_properties or any(option.additionalProperties for option in options):
+            return None
+        keys = []
+        for option in options:
+            others = [other for other in options if other is not option]
+            key = next(
+                (
+                    key for key in option.required
+                    if self.checked_required_field(option, key) and all(key not in other.fields for other in others)
+                ),
+                None
+            )
+            if key is None:
+                return None
+            keys.append(key)
+        return keys
+
+    def can_dispatch_objects(self, candidates: Sequence[int]) -> bool:
+        return len(candidates) > 1 and (
+            self.const_discriminator(candidates) is not None or self.unique_required_keys(candidates) is not None
+        )
+
+    def generate_discriminator_lookups(self, candidates: Sequence[int], out_file: CodeBlockPrinter) -> None:
+        const_discriminator = self.const_discriminator(candidates)
+        if const_discriminator is not None:
+            key, values = const_discriminator
+            generate_string_lookup(f"lookup_{self.parser_name}_discriminator_key", [key], out_file)
+            generate_string_lookup(f"lookup_{self.parser_name}_discriminator", values, out_file)
+            return
+        keys = self.unique_required_keys(candidates)
+        if keys is not None:
+            generate_string_lookup(f"lookup_{self.parser_name}_discriminator_key", keys, out_file)
+
+    def generate_object_dispatch(self, candidates: Sequence[int], option_parsers: list[str], out_file: CodeBlockPrinter) -> None:
+        """ Find the only candidate that can match the object from its keys, then try just that one """
+        # Only the keys are looked at on the way, and the values before the one we look for are skipped.
+        out_file.print("int candidate = -1;")
+        with out_file.if_block(
+            f"builtin_find_key(&attempt, lookup_{self.parser_name}_discriminator_key, &candidate)"
+        ):
+            out_file.print("break;")
+        if self.const_discriminator(candidates) is not None:
+            with out_file.if_block("candidate >= 0"):
+                out_file.print(
+                    "candidate = CURRENT_TOKEN(&attempt).type != JSMN_STRING ? -1 : "
+                    f"lookup_{self.parser_name}_discriminator(CURRENT_STRING(&attempt), CURRENT_STRING_LENGTH(&attempt));"
+                )
+        out_file.print("attempt = *parse_state;")
+        out_file.print("attempt.inhibit_errors = true;")
+        with out_file.switch_block("candidate"):
+            for i, option_index in enumerate(candidates):
+                out_file.print(f"case {i}:")
+                with out_file.code_block():
+                    self.generate_attempt(option_index, option_parsers, out_file)
+                    out_file.print("break;")
+            out_file.print("default:")
+            with out_file.indent():
+                out_file.print("break;")
+
+    def can_serialize(self) -> bool:
+        return super().can_serialize() and all(option.can_serialize() for option in self.option_generators)
+
+    def generate_serializer_call(self, in_var_name: str, out_file: CodeBlockPrinter) -> None:
+        with out_file.if_block(f"serialize_{self.serializer_name}(serialize_state, {in_var_name})"):
+            out_file.print("return true;")
+
+    def generate_serializer_bodies(self, out_file: CodeBlockPrinter) -> None:
+        for option_generator in self.option_generators:
+            option_generator.generate_serializer_bodies(out_file)
+
+        with self.unique_functions("serializer_name", out_file) as functions:
+            functions.print(f"static bool serialize_{self.serializer_name}(serialize_state_t *serialize_state, const {self.c_type} *in)")
+            with functions.code_block():
+                # The tag tells which option was parsed, so the value is written as that option.
+                with functions.switch_block("in->type"):
+                    for option_index, option_generator in enumerate(self.option_generators):
+                        functions.print(f"case {self.c_type.tag_type.enum_labels[option_index]}:")
+                        with functions.code_block():
+                            option_generator.generate_serializer_call(f"&in->{self.c_type.option_names[option_index]}", functions)
+                            functions.print("break;")
+                    functions.print("default:")
+                    with functions.code_block():
+                        self.generate_serializer_error("Invalid anyOf type in '%s': %i", "(int)in->type", functions)
+                functions.print("return false;")
+            functions.print("")
+
+    def max_serialized_size(self) -> int | None:
+        option_sizes = [option.max_serialized_size() for option in self.option_generators]
+        if any(size is None for size in option_sizes):
+            return None
+        return max(size for size in option_sizes if size is not None)
 
     def generate_set_default_value(self, out_var_name: str, out_file: CodeBlockPrinter) -> None:
         raise AssertionError("has_default_value() is always false: an anyOf cannot have a js2cDefault.")
 
+    def first_token_types(self) -> frozenset[str]:
+        return frozenset().union(*(option.first_token_types() for option in self.option_generators))
+
     def max_token_num(self) -> int:
         # Only one option's value ends up in the document, so the worst case is the largest option.
         return max(option.max_token_num() for option in self.option_generators)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+DIR_OF_THIS_FILE = os.path.dirname(os.path.abspath(__file__))
+
+# Everything that the generated code depends on, besides the inputs
+GENERATOR_FILES = sorted(
+    glob.glob(os.path.join(DIR_OF_THIS_FILE, "**", "*.py"), recursive=True) +
+    glob.glob(os.path.join(DIR_OF_THIS_FILE, "**", "*.h"), recursive=True) + [
+        os.path.join(DIR_OF_THIS_FILE, "..", "json_schema_to_c.py"),
+        os.path.join(DIR_OF_THIS_FILE, "..", "jsmn", "jsmn.h"),
+    ]
+)
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def generator_version() -> str:
+    """ A hash of the generator's own code, so changing it invalidates everything it generated """
+    version = hashlib.sha256()
+    for path in GENERATOR_FILES:
+        version.update(file_hash(path).encode())
+    return version.hexdigest()
+
+
+class GenerationCache:
+    """
+    An entry of the cache of generated files, so generating from the same inputs again only copies them.
+
+    An entry is keyed by the generator's version, the command line, and the path and content of the
+    schema file (including its js2cSettings). Its manifest lists the files loaded while generating
+    (referenced schema files, prefix and postfix files) with the hash of their contents, which are
+    all checked before the entry is used. The generated files themselves are stored by the hash
+    of their contents.
+    """
+
+    def __init__(self, cache_dir: str, schema_file: str, output_files: Sequence[str], arguments: dict[str, Any]) -> None:
+        self.manifest_dir = os.path.join(cache_dir, "manifests")
+        self.object_dir = os.path.join(cache_dir, "objects")
+        self.output_files = output_files
+        key = {
+            "generator": generator_version(),
+            # Relative references are resolved from the schema's directory, and relative settings files
+            # from the working directory.
+            "schema_file": os.path.abspath(schema_file),
+            "schema": file_hash(schema_file),
+            "working_directory": os.getcwd(),
+            # The name of the .h is in the generated files, for the #include and the header guard
+            "output_files": [os.path.basename(f) for f in output_files],
+            "arguments": {
+                name: os.path.abspath(value.name) if hasattr(value, "name") else value
+                for name, value in arguments.items()
+            },
+        }
+        self.manifest_file = os.path.join(self.manifest_dir, hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest() + ".json")
+
+    def restore(self) -> bool:
+        """ Copy the generated files to the output files. Returns whether the entry was there and up to date. """
+        try:
+            with open(self.manifest_file, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if any(file_hash(path) != content_hash for path, content_hash in manifest["inputs"].items()):
+                return False
+            objects = [os.path.join(self.object_dir, object_hash) for object_hash in manifest["outputs"]]
+            if len(objects) != len(self.output_files) or not all(os.path.exists(o) for o in objects):
+                return False
+        except (OSError, ValueError, KeyError):
+            return False
+        for object_file, output_file in zip(objects, self.output_files):
+            shutil.copyfile(object_file, output_file)
+        return True
+
+    def store(self, input_files: Iterable[str]) -> None:
+        """ Store the output files, generated from the schema and input_files """
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        os.makedirs(self.object_dir, exist_ok=True)
+        outputs = []
+        for output_file in self.output_files:
+            object_hash = file_hash(output_file)
+            object_file = os.path.join(self.object_dir, object_hash)
+            if not os.path.exists(object_file):
+                with open(output_file, "rb") as f:
+                    self.write_atomically(object_file, f.read())
+            outputs.append(object_hash)
+        manifest = {
+            "inputs": {os.path.abspath(path): file_hash(path) for path in input_files},
+            "outputs": outputs,
+        }
+        # Written last, so that a manifest (even one from another process running in parallel) only
+        # ever refers to complete objects.
+        self.write_atomically(self.manifest_file, json.dumps(manifest, indent=4).encode())
+
+    @classmethod
+    def write_atomically(cls, path: str, data: bytes) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Alex Badics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+import gc
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TextIO
+
+from .codegen.base import Generator
+
+
+class PhaseRecord:
+    # pylint: disable=too-few-public-methods
+    def __init__(self, name: str, depth: int) -> None:
+        self.name = name
+        self.depth = depth
+        self.calls = 0
+        self.wall_seconds = 0.0
+        # Bytes still allocated at the end of the phase, compared to its start
+        self.allocated = 0
+        # The most bytes allocated at any point during the phase, compared to its start
+        self.peak = 0
+        # The most bytes allocated during the current run of the phase, nested phases update it
+        self.peak_memory = 0
+
+
+class Profiler:
+    """
+    Measures the wall time and the memory allocated by the phases of the generation.
+
+    A disabled profiler (the default) does nothing, so the phases can be marked unconditionally.
+    Phases nest: a phase started inside another one is reported under it.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.phases: dict[tuple[str, ...], PhaseRecord] = {}
+        self.generator_counts: Counter[str] = Counter()
+        self.running: list[PhaseRecord] = []
+
+    def start(self) -> None:
+        if self.enabled:
+            tracemalloc.start()
+
+    def stop(self) -> None:
+        if self.enabled:
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        path = tuple(record.name for record in self.running) + (name,)
+        record = self.phases.setdefault(path, PhaseRecord(name, len(self.running)))
+        if self.running:
+            # The peak is reset for the nested phase, so the outer one keeps what it has seen so far
+            self.running[-1].peak_memory = max(self.running[-1].peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        start_memory = record.peak_memory = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        self.running.append(record)
+        try:
+            yield
+        finally:
+            self.running.pop()
+            record.wall_seconds += time.perf_counter() - start_time
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            record.peak_memory = max(record.peak_memory, peak_memory)
+            if self.running:
+                self.running[-1].peak_memory = max(self.running[-1].peak_memory, record.peak_memory)
+            record.calls += 1
+            record.allocated += current_memory - start_memory
+            record.peak = max(record.peak, record.peak_memory - start_memory)
+
+    def count_generators(self) -> None:
+        """ Count the generators that are alive, i.e. the ones in the generator tree, by class """
+        if self.enabled:
+            self.generator_counts.update(type(o).__name__ for o in gc.get_objects() if isinstance(o, Generator))
+
+    def print_report(self, out_file: TextIO) -> None:
+        print(f"{'phase':<40} {'calls':>6} {'wall ms':>10} {'allocated KiB':>14} {'peak KiB':>10}", file=out_file)
+        for record in self.phases.values():
+            print(
+                f"{'  ' * record.depth + record.name:<40} {record.calls:>6} {record.wall_seconds * 1000:>10.2f} "
+                f"{record.allocated / 1024:>14.1f} {record.peak / 1024:>10.1f}",
+                file=out_file,
+            )
+        if self.generator_counts:
+            print("", file=out_file)
+            print(f"{'generator class':<40} {'count':>6}", file=out_file)
+            for class_name, count in self.generator_counts.most_common():
+                print(f"{class_name:<40} {count:>6}", file=out_file)
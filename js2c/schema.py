@@ -29,70 +29,119 @@ from collections.abc import Sequence
 from typing import Any
 from urllib.parse import urlparse
 
+from .profiling import Profiler
+
 
 # Foreign schema files, keyed by canonical path; a None slot marks a load in progress.
+# Kept for the whole process, so a batch of schemas only loads a shared file once.
 SCHEMA_CACHE: dict[str, Any] = {}
+# The files each foreign schema file loaded in turn, transitively
+SCHEMA_REFERENCES: dict[str, frozenset[str]] = {}
 
 
-def get_schema_from_path(path: str, relative_to: str, authorized_paths: Sequence[str]) -> Any:
-    path = os.path.abspath(os.path.join(os.path.dirname(relative_to), path))
+def check_authorized_path(path: str, authorized_paths: Sequence[str]) -> None:
     roots = [os.path.abspath(a) for a in authorized_paths]
     if not any(path == root or path.startswith(root + os.sep) for root in roots):
         raise ValueError(
             f"Cannot resolve reference to unauthorized path (use --authorized-paths to allow it): {path}"
         )
+
+
+def get_schema_from_path(path: str, relative_to: str, authorized_paths: Sequence[str], loaded_files: set[str]) -> Any:
+    path = os.path.abspath(os.path.join(os.path.dirname(relative_to), path))
+    check_authorized_path(path, authorized_paths)
     if path in SCHEMA_CACHE:
         if SCHEMA_CACHE[path] is None:
             raise ValueError("Circular dependency detected in JSON schema reference")
+        # It may have been loaded for another schema, with other authorized paths
+        for referenced_path in SCHEMA_REFERENCES[path]:
+            check_authorized_path(referenced_path, authorized_paths)
     else:
         SCHEMA_CACHE[path] = None  # Reserve the slot first, so a ref back into this file is caught.
-        SCHEMA_CACHE[path] = load_schema(path, authorized_paths)
+        references: set[str] = set()
+        try:
+            SCHEMA_CACHE[path] = load_schema(path, authorized_paths, loaded_files=references)
+        except BaseException:
+            del SCHEMA_CACHE[path]
+            raise
+        SCHEMA_REFERENCES[path] = frozenset(references)
+    loaded_files.add(path)
+    loaded_files.update(SCHEMA_REFERENCES[path])
     return SCHEMA_CACHE[path]
 
 
-# WARNING: reviewing the following algorithm might cause brain damage
-# Sorry for that.
-def resolve_children(full_schema: Any, part_to_resolve: Any, schema_filepath: str, authorized_paths: Sequence[str]) -> None:
-    if part_to_resolve is None:
-        return
-    if isinstance(part_to_resolve, (str, int, bool, float)):
-        return
-    if isinstance(part_to_resolve, list):
-        for i, v in enumerate(part_to_resolve):
-            part_to_resolve[i] = resolve_ref(full_schema, v, schema_filepath, authorized_paths)
-            resolve_children(full_schema, v, schema_filepath, authorized_paths)
-        return
-    assert isinstance(part_to_resolve, dict), f"Value {part_to_resolve} is not supported by the schema loader"
-    for k, v in part_to_resolve.items():
-        part_to_resolve[k] = resolve_ref(full_schema, v, schema_filepath, authorized_paths)
-        resolve_children(full_schema, v, schema_filepath, authorized_paths)
-
-
-def resolve_ref(full_schema: Any, part_to_resolve: Any, schema_filepath: str, authorized_paths: Sequence[str]) -> Any:
-    if not isinstance(part_to_resolve, dict) or "$ref" not in part_to_resolve:
-        return part_to_resolve
-    if len(part_to_resolve) > 1:
-        raise ValueError("Reference nodes should not contain other fields")
-
-    ref_uri = urlparse(part_to_resolve["$ref"])
-    if ref_uri.scheme not in ("", "file"):
-        raise ValueError(f"Unsupported reference scheme: {ref_uri.scheme}")
-    if ref_uri.netloc != "" or ref_uri.params != "" or ref_uri.query != "":
-        raise ValueError(f'Unsupported reference: {part_to_resolve["$ref"]}')
-    if not ref_uri.fragment.startswith("/"):
-        raise ValueError("Only path-like references are supported. (Id-based references are not)")
-
-    # A path (or an explicit file: scheme) points at another schema file; a bare fragment stays in this one.
-    if ref_uri.scheme == "file" or ref_uri.path != "":
-        full_schema = get_schema_from_path(ref_uri.path, schema_filepath, authorized_paths)
-
-    ref_str = ref_uri.fragment[1:] + '/'
-    replacement = full_schema
-    while ref_str:
-        part, ref_str = ref_str.split('/', 1)
-        replacement = replacement[part]
-    return replacement
-# WARNING OVER
+def is_ref(part: Any) -> bool:
+    return isinstance(part, dict) and "$ref" in part
+
+
+class RefResolver:
+    """
+    Replaces every $ref node of a schema with the object it points to, in place.
+
+    References to the same definition all get the same object, so the result is a graph, not a tree.
+    Every dict and list is only walked once, however many references point to it, and every $ref node
+    is only looked up once, so resolution is linear in the size of the schema file.
+    """
+
+    def __init__(self, full_schema: Any, schema_filepath: str, authorized_paths: Sequence[str], loaded_files: set[str]) -> None:
+        self.full_schema = full_schema
+        self.schema_filepath = schema_filepath
+        self.authorized_paths = authorized_paths
+        self.loaded_files = loaded_files
+        # id() of the dicts and lists already walked. They are all referenced by the schema, so the ids stay unique.
+        self.walked: set[int] = set()
+        # id() of the $ref nodes already looked up, with their target. None while it is being looked up.
+        self.targets: dict[int, Any] = {}
+
+    def resolve_children(self, part_to_resolve: Any) -> None:
+        # Walked with an explicit stack, as long chains of definitions would hit the recursion limit.
+        to_walk = [part_to_resolve]
+        while to_walk:
+            part = to_walk.pop()
+            if isinstance(part, (str, int, bool, float)) or part is None or id(part) in self.walked:
+                continue
+            self.walked.add(id(part))
+            if isinstance(part, list):
+                children: Any = enumerate(part)
+            else:
+                assert isinstance(part, dict), f"Value {part} is not supported by the schema loader"
+                children = part.items()
+            for k, v in list(children):
+                part[k] = self.resolve_ref(v)
+                to_walk.append(part[k])
+
+    def resolve_ref(self, part_to_resolve: Any) -> Any:
+        """ The target of a $ref node, following references to references, or part_to_resolve if it is not one """
+        if not is_ref(part_to_resolve):
+            return part_to_resolve
+        if id(part_to_resolve) in self.targets:
+            if self.targets[id(part_to_resolve)] is None:
+                raise ValueError("Circular dependency detected in JSON schema reference")
+            return self.targets[id(part_to_resolve)]
+        self.targets[id(part_to_resolve)] = None
+        if len(part_to_resolve) > 1:
+            raise ValueError("Reference nodes should not contain other fields")
+
+        ref_uri = urlparse(part_to_resolve["$ref"])
+        if ref_uri.scheme not in ("", "file"):
+            raise ValueError(f"Unsupported reference scheme: {ref_uri.scheme}")
+        if ref_uri.netloc != "" or ref_uri.params != "" or ref_uri.query != "":
+            raise ValueError(f'Unsupported reference: {part_to_resolve["$ref"]}')
+        if not ref_uri.fragment.startswith("/"):
+            raise ValueError("Only path-like references are supported. (Id-based references are not)")
+
+        # A path (or an explicit file: scheme) points at another schema file; a bare fragment stays in this one.
+        # The other file is already resolved, so only the nodes of this one can be $refs on the way.
+        if ref_uri.scheme == "file" or ref_uri.path != "":
+            replacement = get_schema_from_path(ref_uri.path, self.schema_filepath, self.authorized_paths, self.loaded_files)
+        else:
+            replacement = self.full_schema
+        ref_str = ref_uri.fragment[1:] + '/'
+        while ref_str:
+            part, ref_str = ref_str.split('/', 1)
+            replacement = self.resolve_ref(replacement[part])
+        self.targets[id(part_to_resolve)] = replacement
+        return replacement
 
 
 def all_of_merge_single_pair(element1: Any, element2: Any, key: str) -> Any:
@@ -126,23 +175,48 @@ def all_of_merge_dict(schema1: dict[str, Any], schema2: dict[str, Any]) -> dict[
     return result
 
 
-def resolve_all_of(schema: Any) -> Any:
+def resolve_all_of(schema: Any, resolved: dict[int, Any] | None = None) -> Any:
+    """
+    Merge the allOf lists into their parents, into a new schema.
+
+    resolved maps the id() of the dicts already processed to the result, so a definition that
+    many references share is only processed once, and the results share it the same way.
+    """
     if not isinstance(schema, dict):
         # TODO: Also process arrays in the schema. I'm not sure it's needed though, there are not many arrays
         #       in schema definitions, and I think none of them need allOf expansion.
         return schema
+    if resolved is None:
+        resolved = {}
+    if id(schema) in resolved:
+        if resolved[id(schema)] is None:
+            raise ValueError("Circular dependency detected in JSON schema reference")
+        return resolved[id(schema)]
+    resolved[id(schema)] = None
 
-    result: dict[str, Any] = OrderedDict((k, resolve_all_of(v)) for k, v in schema.items() if k != "allOf")
+    result: dict[str, Any] = OrderedDict((k, resolve_all_of(v, resolved)) for k, v in schema.items() if k != "allOf")
     if "allOf" in schema:
         for schema_to_process in schema["allOf"]:
-            schema_to_process = resolve_all_of(schema_to_process)
+            schema_to_process = resolve_all_of(schema_to_process, resolved)
             result = all_of_merge_dict(result, schema_to_process)
+    resolved[id(schema)] = result
     return result
 
 
-def load_schema(schema_filepath: str, authorized_paths: Sequence[str]) -> Any:
-    with open(schema_filepath, encoding="utf-8") as schema_file:
-        schema = json.load(schema_file, object_pairs_hook=OrderedDict)
-    resolve_children(schema, schema, schema_filepath, authorized_paths)
-    schema = resolve_all_of(schema)
+def load_schema(
+    schema_filepath: str,
+    authorized_paths: Sequence[str],
+    profiler: Profiler | None = None,
+    loaded_files: set[str] | None = None,
+) -> Any:
+    """ loaded_files collects the paths of the other schema files the references loaded, transitively """
+    profiler = profiler or Profiler()
+    loaded_files = set() if loaded_files is None else loaded_files
+    with profiler.phase("json.load"):
+        with open(schema_filepath, encoding="utf-8") as schema_file:
+            schema = json.load(schema_file, object_pairs_hook=OrderedDict)
+    with profiler.phase("resolve_children"):
+        RefResolver(schema, schema_filepath, authorized_paths, loaded_files).resolve_children(schema)
+    with profiler.phase("resolve_all_of"):
+        schema = resolve_all_of(schema)
     return schema
@@ -43,6 +43,13 @@ class Settings:
     c_postfix_file: IO[str] | None = None
     allow_additional_properties: int | None = None
     include_external_builtins_file: str | None = None
+    parser_backend: str | None = None
+    float_parser: str | None = None
+    string_storage: str | None = None
+    allocation: str | None = None
+    count_hits: int | None = None
+    hit_profile: IO[str] | None = None
+    runtime_stats: str | None = None
 
     FIELDS = [
         SettingsField(
@@ -83,6 +90,58 @@ class Settings:
             "with this path will be generated. Be sure to copy js2c_builtins.h there.",
             metavar="file",
         ),
+        SettingsField(
+            "parser_backend",
+            type=str,
+            help="How the generated parser reads the JSON string. 'jsmn' (the default) tokenizes the whole document into a \n"
+            "token buffer first. 'direct' lexes each token straight from the string, when the parser gets to it.",
+            metavar="jsmn|direct",
+        ),
+        SettingsField(
+            "float_parser",
+            type=str,
+            help="How numbers are parsed. 'strtod' (the default) calls strtod. 'eisel_lemire' uses a correctly rounded, \n"
+            "locale independent parser, which only falls back to strtod for the rare hard cases, but adds a 11 KB table.",
+            metavar="strtod|eisel_lemire",
+        ),
+        SettingsField(
+            "string_storage",
+            type=str,
+            help="How strings are stored. 'escaped' (the default) copies them as they are in the JSON, escape sequences \n"
+            "included. 'unescaped' decodes the escapes and validates the UTF-8 while copying. maxLength is then the \n"
+            "decoded length in bytes.",
+            metavar="escaped|unescaped",
+        ),
+        SettingsField(
+            "allocation",
+            type=str,
+            help="Where strings and array items are stored. 'inline' (the default) stores them in the generated structs, \n"
+            "sized for maxLength and maxItems. 'arena' allocates them from a caller-provided arena instead, and only \n"
+            "stores a pointer and a length.",
+            metavar="inline|arena",
+        ),
+        SettingsField(
+            "count_hits",
+            type=int,
+            help="If 1, the parser counts how often each object field, enum label and anyOf option is parsed, and \n"
+            "json_hit_counts_*_save writes the counts to a file, which can be passed to --hit-profile.",
+            metavar="0|1",
+        ),
+        SettingsField(
+            "hit_profile",
+            type=argparse.FileType('r'),
+            help="Hit counts saved by a parser generated with --count-hits 1. The most common fields and enum labels \n"
+            "are then looked up first, and anyOf options that can't match the same value are tried in that order.",
+            metavar="file",
+        ),
+        SettingsField(
+            "runtime_stats",
+            type=str,
+            help="Make every parse function collect statistics: calls, errors and tokens consumed, plus the tokens of \n"
+            "skipped unknown fields and the failed anyOf attempts. 'timing' also measures the time spent, with \n"
+            "clock_gettime. json_runtime_stats_*_save writes them to a file. Without it, nothing is collected.",
+            metavar="counts|timing",
+        ),
     ]
 
     def __init__(self, args: dict[str, Any], settings_json: dict[str, Any]) -> None:
@@ -31,6 +31,57 @@
 #include <stdlib.h>
 #include <string.h>
 
+#ifdef JS2C_PTHREADS
+#include <pthread.h>
+#endif
+
+#ifdef JS2C_FAST_FLOAT
+#include <float.h>
+#endif
+
+#ifdef JS2C_RUNTIME_STATS_TIMING
+#include <time.h>
+#endif
+
+// Word-at-a-time tricks need the first byte in memory to be the lowest one in the word
+#if defined(__BYTE_ORDER__) && __BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__
+#define JS2C_SWAR
+#endif
+
+#if (defined(JS2C_DIRECT_PARSER) || defined(JS2C_UNESCAPE_STRINGS)) && defined(__SSE2__)
+#include <emmintrin.h>
+#endif
+
+// AVX2 is not in the x86-64 baseline, so it is only used if the CPU running the parser has it
+#if defined(JS2C_DIRECT_PARSER) && defined(__x86_64__) && defined(__GNUC__) && !defined(JS2C_NO_AVX2)
+#define JS2C_AVX2_DISPATCH
+#include <immintrin.h>
+#endif
+
+#ifdef JS2C_DIRECT_PARSER
+/* The direct backend lexes the tokens straight from the JSON string, when a parser asks for them.
+ * Its tokens have the same types as jsmn's, so the generated parsers work with both backends. */
+typedef enum {
+    JSMN_UNDEFINED = 0,
+    JSMN_OBJECT = 1 << 0,
+    JSMN_ARRAY = 1 << 1,
+    JSMN_STRING = 1 << 2,
+    JSMN_PRIMITIVE = 1 << 3
+} jsmntype_t;
+
+enum jsmnerr {
+    JSMN_ERROR_NOMEM = -1,
+    JSMN_ERROR_INVAL = -2,
+    JSMN_ERROR_PART = -3
+};
+
+typedef struct jsmntok {
+    jsmntype_t type;
+    int start;
+    int end;
+    int size;
+} jsmntok_t;
+#else
 #ifndef JSMN_STATIC
 #define JSMN_STATIC
 #endif
@@ -40,6 +91,7 @@
 #endif
 
 #include "jsmn.h"
+#endif
 
 #ifndef LOG_ERROR
 #define LOG_ERROR(position, ...)
@@ -48,6 +100,26 @@
 // Suppressed while a union tries each option, since a failing option is expected.
 #define TRY_LOG_ERROR(position, ...) { if (!parse_state->inhibit_errors) { LOG_ERROR(position, __VA_ARGS__); } }
 
+#ifdef JS2C_DIRECT_PARSER
+typedef struct parse_state_s {
+    const char *json_string;
+    const char *current_key;
+    size_t json_string_len;
+    size_t pos;                 // Where lexing continues
+    jsmntok_t token;            // The current token. Stays current after it is consumed, until the next one is lexed.
+    uint64_t token_num;         // Lexed so far. Limited to max_token_num, like jsmn's token buffer.
+    uint64_t max_token_num;
+    bool inhibit_errors;
+    bool syntax_error;          // A union does not try further options after a syntax error
+#ifdef JS2C_ARENA
+    char *arena;                // Caller-owned, strings and array items are allocated here
+    size_t arena_size;
+    size_t arena_used;
+#endif
+} parse_state_t;
+
+#define CURRENT_TOKEN(parse_state) ((parse_state)->token)
+#else
 typedef struct parse_state_s {
     const char *json_string;
     const char *current_key;
@@ -55,9 +127,15 @@ typedef struct parse_state_s {
     uint64_t current_token;
     uint64_t max_token_num;
     bool inhibit_errors;
+#ifdef JS2C_ARENA
+    char *arena;                // Caller-owned, strings and array items are allocated here
+    size_t arena_size;
+    size_t arena_used;
+#endif
 } parse_state_t;
 
 #define CURRENT_TOKEN(parse_state) ((parse_state)->tokens[(parse_state)->current_token])
+#endif
 #define CURRENT_STRING(parse_state) ((parse_state)->json_string + CURRENT_TOKEN(parse_state).start)
 #define CURRENT_STRING_LENGTH(parse_state) (CURRENT_TOKEN(parse_state).end - CURRENT_TOKEN(parse_state).start)
 #define CURRENT_STRING_FOR_ERROR(parse_state) CURRENT_STRING_LENGTH(parse_state), CURRENT_STRING(parse_state)
@@ -92,200 +170,2191 @@ static inline const char *jsmn_error_as_string(int err) {
     }
 }
 
-static inline bool check_type(const parse_state_t *parse_state, jsmntype_t type) {
-    const jsmntok_t *token = &parse_state->tokens[parse_state->current_token];
-    if (token->type != type) {
-        TRY_LOG_ERROR(
-            token->start,
-            "Unexpected token in '%s': %s instead of %s",
-            parse_state->current_key,
-            token_type_as_string(token->type),
-            token_type_as_string(type))
-        return true;
+// Counts a hit of a count_hits parser. Documents may be parsed on many threads at once.
+static inline void builtin_count_hit(uint64_t *counter) {
+#if defined(__GNUC__)
+    __atomic_fetch_add(counter, 1, __ATOMIC_RELAXED);
+#else
+    *counter += 1;
+#endif
+}
+
+// Index of the lowest set bit. value must not be 0.
+static inline int builtin_lowest_set_bit(uint64_t value) {
+#if defined(__GNUC__)
+    return __builtin_ctzll(value);
+#else
+    int bit = 0;
+    while (!(value & 1)) {
+        value >>= 1;
+        bit += 1;
+    }
+    return bit;
+#endif
+}
+
+#ifdef JS2C_SWAR
+// The high bit of every zero byte of value is set, everything else is cleared
+static inline uint64_t builtin_zero_bytes(uint64_t value) {
+    return (value - 0x0101010101010101ULL) & ~value & 0x8080808080808080ULL;
+}
+#endif
+
+#ifdef JS2C_DIRECT_PARSER
+
+static inline bool builtin_syntax_error(parse_state_t *parse_state, int error, size_t position) {
+    // Only used by LOG_ERROR, which may be empty
+    (void)error;
+    (void)position;
+    parse_state->syntax_error = true;
+    LOG_ERROR(position, "JSON syntax error: %s", jsmn_error_as_string(error));
+    return true;
+}
+
+static inline bool builtin_at_end(const parse_state_t *parse_state) {
+    return parse_state->pos >= parse_state->json_string_len || parse_state->json_string[parse_state->pos] == '\0';
+}
+
+static inline void builtin_skip_whitespace(parse_state_t *parse_state) {
+    while (!builtin_at_end(parse_state)) {
+        const char c = parse_state->json_string[parse_state->pos];
+        if (c != ' ' && c != '\t' && c != '\n' && c != '\r') {
+            return;
+        }
+        parse_state->pos += 1;
+    }
+}
+
+static inline void builtin_set_token(parse_state_t *parse_state, jsmntype_t type, size_t start, size_t end, int size) {
+    parse_state->token.type = type;
+    parse_state->token.start = (int)start;
+    parse_state->token.end = (int)end;
+    parse_state->token.size = size;
+}
+
+// Every key and value counts against max_token_num, so a document is exactly as complex as for jsmn.
+static inline bool builtin_count_token(parse_state_t *parse_state) {
+    if (parse_state->token_num >= parse_state->max_token_num) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_NOMEM, parse_state->pos);
     }
+    parse_state->token_num += 1;
     return false;
 }
 
-static inline bool current_string_is(const parse_state_t *parse_state, const char *s) {
-    const jsmntok_t *token = &parse_state->tokens[parse_state->current_token];
-    if (token->type != JSMN_STRING) {
-        return false;
+#ifdef JS2C_AVX2_DISPATCH
+// Whether the CPU running the parser has AVX2. Only asked once.
+static inline bool builtin_has_avx2(void) {
+    static int has_avx2 = -1;
+    int result = __atomic_load_n(&has_avx2, __ATOMIC_RELAXED);
+    if (result < 0) {
+        result = __builtin_cpu_supports("avx2") != 0;
+        __atomic_store_n(&has_avx2, result, __ATOMIC_RELAXED);
     }
-    if (strlen(s) != (size_t)(token->end - token->start)) {
-        return false;
+    return result;
+}
+
+__attribute__((target("avx2")))
+static inline const char *builtin_find_string_special_avx2(const char *position, const char *end) {
+    const __m256i quote = _mm256_set1_epi8('"');
+    const __m256i backslash = _mm256_set1_epi8('\\');
+    const __m256i zero = _mm256_setzero_si256();
+    for (; end - position >= 32; position += 32) {
+        const __m256i block = _mm256_loadu_si256((const __m256i *)(const void *)position);
+        const __m256i special = _mm256_or_si256(
+            _mm256_or_si256(_mm256_cmpeq_epi8(block, quote), _mm256_cmpeq_epi8(block, backslash)),
+            _mm256_cmpeq_epi8(block, zero)
+        );
+        const uint32_t mask = (uint32_t)_mm256_movemask_epi8(special);
+        if (mask != 0) {
+            return position + builtin_lowest_set_bit(mask);
+        }
     }
-    return memcmp(parse_state->json_string + token->start, s, token->end - token->start) == 0;
+    return position;
 }
+#endif
 
-static inline bool builtin_check_current_string(parse_state_t *parse_state, int min_len, int max_len) {
-    if (check_type(parse_state, JSMN_STRING)) {
-        return true;
+/* The first '"', '\\' or '\0' in [position, end), or end. Finding the closing quote is most of the work
+ * on long strings, so the bytes are checked a block at a time. */
+static inline const char *builtin_find_string_special(const char *position, const char *end) {
+#ifdef JS2C_AVX2_DISPATCH
+    if (end - position >= 64 && builtin_has_avx2()) {
+        position = builtin_find_string_special_avx2(position, end);
     }
-    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
-    if (token->end - token->start > max_len) {
-        TRY_LOG_ERROR(token->start, "String too large in '%s'. Length: %i. Maximum length: %i.", parse_state->current_key, token->end - token->start, max_len);
-        return true;
+#endif
+#if defined(__SSE2__)
+    const __m128i quote = _mm_set1_epi8('"');
+    const __m128i backslash = _mm_set1_epi8('\\');
+    const __m128i zero = _mm_setzero_si128();
+    for (; end - position >= 16; position += 16) {
+        const __m128i block = _mm_loadu_si128((const __m128i *)(const void *)position);
+        const __m128i special = _mm_or_si128(
+            _mm_or_si128(_mm_cmpeq_epi8(block, quote), _mm_cmpeq_epi8(block, backslash)),
+            _mm_cmpeq_epi8(block, zero)
+        );
+        const uint32_t mask = (uint32_t)_mm_movemask_epi8(special);
+        if (mask != 0) {
+            return position + builtin_lowest_set_bit(mask);
+        }
     }
-    if (token->end - token->start < min_len) {
-        TRY_LOG_ERROR(token->start, "String too short in '%s'. Length: %i. Minimum length: %i.", parse_state->current_key, token->end - token->start, min_len);
-        return true;
+#elif defined(JS2C_SWAR)
+    for (; end - position >= 8; position += 8) {
+        uint64_t chunk;
+        memcpy(&chunk, position, sizeof(chunk));
+        const uint64_t special =
+            builtin_zero_bytes(chunk ^ 0x2222222222222222ULL) |
+            builtin_zero_bytes(chunk ^ 0x5C5C5C5C5C5C5C5CULL) |
+            builtin_zero_bytes(chunk);
+        if (special != 0) {
+            return position + builtin_lowest_set_bit(special) / 8;
+        }
     }
-    return false;
+#endif
+    while (position < end && *position != '"' && *position != '\\' && *position != '\0') {
+        position += 1;
+    }
+    return position;
 }
 
-static inline bool builtin_parse_string(parse_state_t *parse_state, char *out, int min_len, int max_len) {
-    if (builtin_check_current_string(parse_state, min_len, max_len)){
-        return true;
+// The string starting at pos, which is at its opening quote. Accepts the same escapes as jsmn.
+static inline bool builtin_lex_string(parse_state_t *parse_state) {
+    const size_t start = parse_state->pos;
+    const char *json_string = parse_state->json_string;
+    const char *json_string_end = json_string + parse_state->json_string_len;
+    parse_state->pos += 1;
+    while (true) {
+        parse_state->pos = (size_t)(builtin_find_string_special(json_string + parse_state->pos, json_string_end) - json_string);
+        if (builtin_at_end(parse_state)) {
+            break;
+        }
+        if (json_string[parse_state->pos] == '"') {
+            builtin_set_token(parse_state, JSMN_STRING, start + 1, parse_state->pos, 0);
+            parse_state->pos += 1;
+            return false;
+        }
+        if (parse_state->pos + 1 < parse_state->json_string_len) {
+            parse_state->pos += 1;
+            switch (json_string[parse_state->pos]) {
+            case '"': case '/': case '\\': case 'b': case 'f': case 'r': case 'n': case 't':
+                break;
+            case 'u':
+                for (int i = 0; i < 4 && parse_state->pos + 1 < parse_state->json_string_len && json_string[parse_state->pos + 1] != '\0'; ++i) {
+                    const char hex = json_string[parse_state->pos + 1];
+                    if (!((hex >= '0' && hex <= '9') || (hex >= 'A' && hex <= 'F') || (hex >= 'a' && hex <= 'f'))) {
+                        return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, start);
+                    }
+                    parse_state->pos += 1;
+                }
+                break;
+            default:
+                return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, start);
+            }
+        }
+        parse_state->pos += 1;
     }
-    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
-    memcpy(out, parse_state->json_string + token->start, token->end - token->start);
-    out[token->end - token->start] = 0;
-    parse_state->current_token += 1;
+    return builtin_syntax_error(parse_state, JSMN_ERROR_PART, start);
+}
+
+// A number, true, false or null, starting at pos. The end of the string also ends it.
+static inline bool builtin_lex_primitive(parse_state_t *parse_state) {
+    const size_t start = parse_state->pos;
+    while (!builtin_at_end(parse_state)) {
+        const char c = parse_state->json_string[parse_state->pos];
+        if (c == ' ' || c == '\t' || c == '\n' || c == '\r' || c == ',' || c == ']' || c == '}') {
+            break;
+        }
+        if (c < 32 || c >= 127) {
+            return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, start);
+        }
+        parse_state->pos += 1;
+    }
+    builtin_set_token(parse_state, JSMN_PRIMITIVE, start, parse_state->pos, 0);
     return false;
 }
 
-static inline bool builtin_parse_bool(parse_state_t *parse_state, bool *out) {
-    if (check_type(parse_state, JSMN_PRIMITIVE)) {
-        return true;
+/* Lex the value at pos. A container is only opened: its token ends at the opening bracket,
+ * and its contents are lexed by builtin_next_key or builtin_next_element. */
+static inline bool builtin_lex_value(parse_state_t *parse_state) {
+    builtin_skip_whitespace(parse_state);
+    if (builtin_at_end(parse_state)) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_PART, parse_state->pos);
     }
-    const jsmntok_t *token = &parse_state->tokens[parse_state->current_token];
-    const char first_char = parse_state->json_string[token->start];
-    if (first_char != 't' && first_char != 'f') {
-        TRY_LOG_ERROR(token->start, "Invalid boolean literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+    if (builtin_count_token(parse_state)) {
         return true;
     }
-    *out = first_char == 't';
-    parse_state->current_token += 1;
+    const size_t start = parse_state->pos;
+    switch (parse_state->json_string[start]) {
+    case '{':
+        parse_state->pos += 1;
+        builtin_set_token(parse_state, JSMN_OBJECT, start, parse_state->pos, 0);
+        return false;
+    case '[':
+        parse_state->pos += 1;
+        builtin_set_token(parse_state, JSMN_ARRAY, start, parse_state->pos, 0);
+        return false;
+    case '"':
+        return builtin_lex_string(parse_state);
+    case '-': case '0': case '1': case '2': case '3': case '4': case '5': case '6': case '7': case '8': case '9':
+    case 't': case 'f': case 'n':
+        return builtin_lex_primitive(parse_state);
+    default:
+        return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, start);
+    }
+}
+
+// The closing bracket of a container, as an UNDEFINED token.
+static inline bool builtin_lex_container_end(parse_state_t *parse_state) {
+    builtin_set_token(parse_state, JSMN_UNDEFINED, parse_state->pos, parse_state->pos + 1, 0);
+    parse_state->pos += 1;
     return false;
 }
 
-static inline bool builtin_parse_signed(
-    parse_state_t *parse_state,
-    bool number_allowed,
-    bool string_allowed,
-    int radix,
-    int64_t *out) {
-    const jsmntok_t *token = &parse_state->tokens[parse_state->current_token];
-    if (!((number_allowed && token->type == JSMN_PRIMITIVE) || (string_allowed && token->type == JSMN_STRING))) {
-        TRY_LOG_ERROR(token->start, "Unexpected token in '%s': %s", parse_state->current_key, token_type_as_string(token->type))
+// The current token is the last value of a container, or the end of a nested one.
+static inline bool builtin_after_container(const parse_state_t *parse_state) {
+    const jsmntype_t type = CURRENT_TOKEN(parse_state).type;
+    return type == JSMN_OBJECT || type == JSMN_ARRAY || type == JSMN_UNDEFINED;
+}
+
+/* Lex the next key of the current object, and the colon after it. At the end of the object, the
+ * current token is UNDEFINED. Accepts what jsmn accepts: a trailing comma, or a missing one after
+ * a container. Reports a missing value the same way as the jsmn backend's object parsers. */
+static inline bool builtin_next_key(parse_state_t *parse_state, bool first) {
+    const char *json_string = parse_state->json_string;
+    builtin_skip_whitespace(parse_state);
+    if (builtin_at_end(parse_state)) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_PART, parse_state->pos);
+    }
+    if (!first && json_string[parse_state->pos] == ',') {
+        parse_state->pos += 1;
+        builtin_skip_whitespace(parse_state);
+        if (builtin_at_end(parse_state)) {
+            return builtin_syntax_error(parse_state, JSMN_ERROR_PART, parse_state->pos);
+        }
+    } else if (!first && json_string[parse_state->pos] != '}' && !builtin_after_container(parse_state)) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, parse_state->pos);
+    }
+    if (json_string[parse_state->pos] == '}') {
+        return builtin_lex_container_end(parse_state);
+    }
+    if (json_string[parse_state->pos] != '"') {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, parse_state->pos);
+    }
+    if (builtin_count_token(parse_state) || builtin_lex_string(parse_state)) {
         return true;
     }
-    if (token->type == JSMN_PRIMITIVE) {
-        radix = 10;
+    parse_state->token.size = 1; // Keys have a size of 1 in jsmn too
+    builtin_skip_whitespace(parse_state);
+    const bool has_colon = !builtin_at_end(parse_state) && json_string[parse_state->pos] == ':';
+    if (has_colon) {
+        parse_state->pos += 1;
+        builtin_skip_whitespace(parse_state);
     }
-    char *end_char = NULL;
-    *out = strtoll(parse_state->json_string + token->start, &end_char, radix);
-    if (end_char != parse_state->json_string + token->end) {
-        TRY_LOG_ERROR(token->start, "Invalid signed integer literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+    if (builtin_at_end(parse_state)) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_PART, parse_state->pos);
+    }
+    const char c = json_string[parse_state->pos];
+    if (c == '}' || c == ',' || (!has_colon && c == '"')) {
+        TRY_LOG_ERROR(
+            CURRENT_TOKEN(parse_state).start,
+            "Missing value in '%s', after key: %.*s",
+            parse_state->current_key,
+            CURRENT_STRING_FOR_ERROR(parse_state));
         return true;
     }
-    parse_state->current_token += 1;
+    if (!has_colon) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, parse_state->pos);
+    }
     return false;
 }
 
-static inline bool builtin_parse_unsigned(
-    parse_state_t *parse_state,
-    bool number_allowed,
-    bool string_allowed,
-    int radix,
-    uint64_t *out
-) {
-    const jsmntok_t *token = &parse_state->tokens[parse_state->current_token];
-    if (!((number_allowed && token->type == JSMN_PRIMITIVE) || (string_allowed && token->type == JSMN_STRING))) {
-        TRY_LOG_ERROR(token->start, "Unexpected token in '%s': %s", parse_state->current_key, token_type_as_string(token->type))
-        return true;
+/* Lex the next element of the current array. At the end of the array, the current token is UNDEFINED.
+ * A trailing comma is accepted, like jsmn does. */
+static inline bool builtin_next_element(parse_state_t *parse_state, bool first) {
+    builtin_skip_whitespace(parse_state);
+    if (builtin_at_end(parse_state)) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_PART, parse_state->pos);
     }
-    if (token->type == JSMN_PRIMITIVE) {
-        radix = 10;
+    if (!first && parse_state->json_string[parse_state->pos] == ',') {
+        parse_state->pos += 1;
+        builtin_skip_whitespace(parse_state);
+        if (builtin_at_end(parse_state)) {
+            return builtin_syntax_error(parse_state, JSMN_ERROR_PART, parse_state->pos);
+        }
+    } else if (!first && parse_state->json_string[parse_state->pos] != ']') {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, parse_state->pos);
     }
-    const char *start_char = parse_state->json_string + token->start;
-    char *end_char = NULL;
-    if (*start_char == '-') {
-        TRY_LOG_ERROR(token->start, "Invalid unsigned integer literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+    if (parse_state->json_string[parse_state->pos] == ']') {
+        return builtin_lex_container_end(parse_state);
+    }
+    return builtin_lex_value(parse_state);
+}
+
+// Step past the current value. The lexer is already past it.
+static inline void builtin_consume_value(parse_state_t *parse_state) {
+    (void)parse_state;
+}
+
+// Step back to the value just consumed, to report an error at it. It is still the current token.
+static inline void builtin_unconsume_value(parse_state_t *parse_state) {
+    (void)parse_state;
+}
+
+/* Step from a key to its value. A second value right after a simple one is reported here, before
+ * the first one is parsed, like the jsmn backend's object parsers do. */
+static inline bool builtin_consume_key(parse_state_t *parse_state) {
+    const jsmntok_t key = CURRENT_TOKEN(parse_state);
+    (void)key; // Only used by TRY_LOG_ERROR, which may be empty
+    if (builtin_lex_value(parse_state)) {
         return true;
     }
-    *out = strtoull(start_char, &end_char, radix);
-    if (end_char != parse_state->json_string + token->end) {
-        TRY_LOG_ERROR(token->start, "Invalid unsigned integer literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+    if (builtin_after_container(parse_state)) {
+        return false;
+    }
+    builtin_skip_whitespace(parse_state);
+    if (builtin_at_end(parse_state)) {
+        return false;
+    }
+    const char c = parse_state->json_string[parse_state->pos];
+    if (c == '"' || c == '{' || c == '[') {
+        TRY_LOG_ERROR(
+            key.start,
+            "Missing separator between values in '%s', after key: %.*s",
+            parse_state->current_key,
+            key.end - key.start,
+            parse_state->json_string + key.start);
         return true;
     }
-    parse_state->current_token += 1;
     return false;
 }
 
-static inline bool builtin_parse_double(parse_state_t *parse_state, double *out) {
-    const jsmntok_t *token = &parse_state->tokens[parse_state->current_token];
-    if (check_type(parse_state, JSMN_PRIMITIVE)) {
-        return true;
+#ifndef JS2C_MAX_SKIP_DEPTH
+#define JS2C_MAX_SKIP_DEPTH 1024
+#endif
+
+/* Skip the current value. A skipped container is lexed up to its closing bracket, and stays the
+ * current token, spanning the whole container. */
+static inline bool builtin_skip(parse_state_t *parse_state) {
+    jsmntok_t container = CURRENT_TOKEN(parse_state);
+    if (container.type != JSMN_OBJECT && container.type != JSMN_ARRAY) {
+        return false;
     }
-    const char *start_char = parse_state->json_string + token->start;
-    if (token->end - token->start >= 2) {
-        if (start_char[1] != '.' && start_char[1] != 'e' && start_char[1] != 'E' &&
-            !(start_char[1] >= '0' && start_char[1] <= '9')) {
-            TRY_LOG_ERROR(token->start, "Invalid floating point literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+    uint64_t in_object[JS2C_MAX_SKIP_DEPTH / 64] = {container.type == JSMN_OBJECT}; // A bit per nesting level
+    unsigned int depth = 0;
+    bool first = true;
+    while (true) {
+        const bool object = (in_object[depth / 64] >> (depth % 64)) & 1;
+        if (object ? builtin_next_key(parse_state, first) : builtin_next_element(parse_state, first)) {
             return true;
         }
+        first = false;
+        if (CURRENT_TOKEN(parse_state).type == JSMN_UNDEFINED) {
+            if (depth == 0) {
+                break;
+            }
+            depth -= 1;
+            continue;
+        }
+        if (object && builtin_consume_key(parse_state)) {
+            return true;
+        }
+        const jsmntype_t type = CURRENT_TOKEN(parse_state).type;
+        if (type == JSMN_OBJECT || type == JSMN_ARRAY) {
+            depth += 1;
+            if (depth >= JS2C_MAX_SKIP_DEPTH) {
+                return builtin_syntax_error(parse_state, JSMN_ERROR_NOMEM, (size_t)CURRENT_TOKEN(parse_state).start);
+            }
+            const uint64_t bit = UINT64_C(1) << (depth % 64);
+            in_object[depth / 64] = type == JSMN_OBJECT ? in_object[depth / 64] | bit : in_object[depth / 64] & ~bit;
+            first = true;
+        }
     }
-    char *end_char = NULL;
-    *out = strtod(start_char, &end_char);
-    if (end_char != parse_state->json_string + token->end) {
-        TRY_LOG_ERROR(token->start, "Invalid floating point literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
-        return true;
-    }
-    parse_state->current_token += 1;
+    container.end = (int)parse_state->pos;
+    parse_state->token = container;
     return false;
 }
 
-static inline bool builtin_skip(parse_state_t *parse_state) {
-    /* The algorithm works, because of how .size behaves on JSMN tokens:
-     *   - Arrays have size = number of elements
-     *   - Objects have size = number of fields
-     *   - Object keys have a size of 1. This is important, because {"a": "b"} is 3 tokens this way:
-     *       - An object of size 1,
-     *       - A key of size 1
-     *       - A string of size 0.
-     *   - All other tokens are size 0.
-     */
-    uint32_t skip_tokens = 1;
-    while (skip_tokens > 0) {
-        skip_tokens += CURRENT_TOKEN(parse_state).size;
-        if (parse_state->current_token >= parse_state->max_token_num) {
-            /* Should never happen */
+/* Look for a key of the current object that lookup_key knows, lexing ahead on a copy of the parse
+ * state. If there is one, its index is in *key_index, and its value is the current token of scan. */
+static inline bool builtin_find_key(parse_state_t *scan, int (*lookup_key)(const char *string, int length), int *key_index) {
+    *key_index = -1;
+    for (bool first = true; ; first = false) {
+        if (builtin_next_key(scan, first)) {
+            return true;
+        }
+        if (CURRENT_TOKEN(scan).type == JSMN_UNDEFINED) {
+            return false;
+        }
+        const int index = lookup_key(CURRENT_STRING(scan), CURRENT_STRING_LENGTH(scan));
+        if (builtin_consume_key(scan)) {
+            return true;
+        }
+        if (index >= 0) {
+            *key_index = index;
+            return false;
+        }
+        if (builtin_skip(scan)) {
             return true;
         }
-        parse_state->current_token += 1;
-        skip_tokens -= 1;
     }
-    return false;
 }
 
-static inline bool builtin_parse_json_string(
+// Make the outcome of a successful union option the current state.
+static inline void builtin_commit_attempt(parse_state_t *parse_state, const parse_state_t *attempt) {
+    parse_state->pos = attempt->pos;
+    parse_state->token = attempt->token;
+    parse_state->token_num = attempt->token_num;
+#ifdef JS2C_ARENA
+    parse_state->arena_used = attempt->arena_used;
+#endif
+}
+
+#ifdef JS2C_ARENA
+/* The number of elements of the current array, lexed ahead on a copy of the parse state, so that they
+ * can be allocated before they are parsed. */
+static inline bool builtin_count_elements(parse_state_t *parse_state, int *n) {
+    parse_state_t scan = *parse_state;
+    for (*n = 0; ; *n += 1) {
+        if (builtin_next_element(&scan, *n == 0)) {
+            parse_state->syntax_error = scan.syntax_error;
+            return true;
+        }
+        if (CURRENT_TOKEN(&scan).type == JSMN_UNDEFINED) {
+            return false;
+        }
+        if (builtin_skip(&scan)) {
+            parse_state->syntax_error = scan.syntax_error;
+            return true;
+        }
+    }
+}
+#endif
+
+// Start parsing a document: the root value becomes the current token.
+static inline bool builtin_begin_document(
     parse_state_t *parse_state,
-    jsmntok_t *token_buffer,
-    uint64_t token_buffer_size,
     const char *json_string,
-    size_t json_string_len
+    size_t json_string_len,
+    uint64_t max_token_num
 ) {
-    jsmn_parser parser = {0};
-
     parse_state->json_string = json_string;
-    parse_state->tokens = token_buffer;
-    parse_state->current_token = 0;
-    parse_state->max_token_num = token_buffer_size;
     parse_state->current_key = "document root";
+    parse_state->json_string_len = json_string_len;
+    parse_state->pos = 0;
+    parse_state->token_num = 0;
+    parse_state->max_token_num = max_token_num;
     parse_state->inhibit_errors = false;
-
-    jsmn_init(&parser);
-    int token_num = jsmn_parse(&parser, json_string, json_string_len, parse_state->tokens, token_buffer_size);
-    if (token_num < 0) {
-        LOG_ERROR(parser.pos, "JSON syntax error: %s", jsmn_error_as_string(token_num));
+    parse_state->syntax_error = false;
+    builtin_skip_whitespace(parse_state);
+    if (builtin_at_end(parse_state)) {
+        LOG_ERROR(parse_state->pos, "String did not contain any JSON tokens");
         return true;
     }
-    if (token_num == 0) {
-        LOG_ERROR(parser.pos, "String did not contain any JSON tokens");
-        return true;
+    return builtin_lex_value(parse_state);
+}
+
+// Only whitespace may follow the root value.
+static inline bool builtin_end_document(parse_state_t *parse_state) {
+    builtin_skip_whitespace(parse_state);
+    if (!builtin_at_end(parse_state)) {
+        return builtin_syntax_error(parse_state, JSMN_ERROR_INVAL, parse_state->pos);
     }
     return false;
 }
 
+/* jsmn tokenizes the whole document before it is parsed, so its syntax errors, "too complex" included, take
+ * precedence over the parser's errors. To report the same error, the rest of a document whose parse failed
+ * for another reason is lexed from the start. Only run on the error path, so it costs nothing otherwise. */
+static inline void builtin_check_failed_document(
+    const parse_state_t *failed_parse_state,
+    const char *json_string,
+    size_t json_string_len,
+    uint64_t max_token_num
+) {
+    if (failed_parse_state->syntax_error) {
+        return;
+    }
+    parse_state_t parse_state;
+    if (builtin_begin_document(&parse_state, json_string, json_string_len, max_token_num) || builtin_skip(&parse_state)) {
+        return;
+    }
+    builtin_end_document(&parse_state);
+}
+
+#else
+
+// Step past the current value.
+static inline void builtin_consume_value(parse_state_t *parse_state) {
+    parse_state->current_token += 1;
+}
+
+// Step back to the value just consumed, to report an error at it.
+static inline void builtin_unconsume_value(parse_state_t *parse_state) {
+    parse_state->current_token -= 1;
+}
+
+// Step from a key to its value. Never fails: the document was tokenized up front.
+static inline bool builtin_consume_key(parse_state_t *parse_state) {
+    parse_state->current_token += 1;
+    return false;
+}
+
+#endif /* JS2C_DIRECT_PARSER */
+
+static inline bool check_type(const parse_state_t *parse_state, jsmntype_t type) {
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    if (token->type != type) {
+        TRY_LOG_ERROR(
+            token->start,
+            "Unexpected token in '%s': %s instead of %s",
+            parse_state->current_key,
+            token_type_as_string(token->type),
+            token_type_as_string(type))
+        return true;
+    }
+    return false;
+}
+
+static inline bool current_string_is(const parse_state_t *parse_state, const char *s) {
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    if (token->type != JSMN_STRING) {
+        return false;
+    }
+    if (strlen(s) != (size_t)(token->end - token->start)) {
+        return false;
+    }
+    return memcmp(parse_state->json_string + token->start, s, token->end - token->start) == 0;
+}
+
+/* Find the next record of a newline-delimited JSON buffer, skipping blank lines. Returns false if
+ * there are no more records. JSON strings cannot contain raw newlines, so memchr finds the end. */
+static inline bool builtin_next_record(const char **record, const char *end, size_t *record_len) {
+    const char *start = *record;
+    while (start < end && (*start == '\n' || *start == '\r' || *start == ' ' || *start == '\t')) {
+        start += 1;
+    }
+    if (start == end) {
+        *record = end;
+        return false;
+    }
+    const char *newline = (const char *)memchr(start, '\n', (size_t)(end - start));
+    *record = start;
+    *record_len = (size_t)((newline != NULL ? newline : end) - start);
+    return true;
+}
+
+static inline bool builtin_check_current_string(parse_state_t *parse_state, int min_len, int max_len) {
+    if (check_type(parse_state, JSMN_STRING)) {
+        return true;
+    }
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    if (token->end - token->start > max_len) {
+        TRY_LOG_ERROR(token->start, "String too large in '%s'. Length: %i. Maximum length: %i.", parse_state->current_key, token->end - token->start, max_len);
+        return true;
+    }
+    if (token->end - token->start < min_len) {
+        TRY_LOG_ERROR(token->start, "String too short in '%s'. Length: %i. Minimum length: %i.", parse_state->current_key, token->end - token->start, min_len);
+        return true;
+    }
+    return false;
+}
+
+static inline bool builtin_parse_string(parse_state_t *parse_state, char *out, int min_len, int max_len) {
+    if (builtin_check_current_string(parse_state, min_len, max_len)){
+        return true;
+    }
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    memcpy(out, parse_state->json_string + token->start, token->end - token->start);
+    out[token->end - token->start] = 0;
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+#ifdef JS2C_ARENA
+
+#ifndef JS2C_ARENA_ALIGNMENT
+#define JS2C_ARENA_ALIGNMENT 8
+#endif
+
+static inline void builtin_begin_arena(parse_state_t *parse_state, void *arena, size_t arena_size, size_t arena_used) {
+    parse_state->arena = (char *)arena;
+    parse_state->arena_size = arena_size;
+    parse_state->arena_used = arena_used;
+}
+
+/* Allocate from the end of the arena. Nothing is freed one by one: the caller's arena is only updated
+ * after a successful parse, and an anyOf only keeps what its matching option allocated. */
+static inline void *builtin_arena_alloc(parse_state_t *parse_state, size_t size, size_t alignment) {
+    const uintptr_t base = (uintptr_t)parse_state->arena;
+    const size_t start = (size_t)(((base + parse_state->arena_used + alignment - 1) & ~(uintptr_t)(alignment - 1)) - base);
+    if (start > parse_state->arena_size || size > parse_state->arena_size - start) {
+        TRY_LOG_ERROR(CURRENT_TOKEN(parse_state).start, "Arena too small for '%s'", parse_state->current_key);
+        return NULL;
+    }
+    parse_state->arena_used = start + size;
+    return parse_state->arena + start;
+}
+
+// The current string, NUL terminated, in the arena
+static inline bool builtin_parse_arena_string(parse_state_t *parse_state, const char **chars, size_t *length, int min_len, int max_len) {
+    if (builtin_check_current_string(parse_state, min_len, max_len)) {
+        return true;
+    }
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    char *out = (char *)builtin_arena_alloc(parse_state, (size_t)(token->end - token->start) + 1, 1);
+    if (out == NULL) {
+        return true;
+    }
+    memcpy(out, parse_state->json_string + token->start, (size_t)(token->end - token->start));
+    out[token->end - token->start] = 0;
+    *chars = out;
+    *length = (size_t)(token->end - token->start);
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+#endif /* JS2C_ARENA */
+
+#ifdef JS2C_UNESCAPE_STRINGS
+
+/* The first backslash or non-ASCII byte in [position, end), or end. Everything before it is copied as-is,
+ * so strings without escapes or multi-byte characters are a single memcpy. */
+static inline const char *builtin_find_escape_or_non_ascii(const char *position, const char *end) {
+#if defined(__SSE2__)
+    const __m128i backslash = _mm_set1_epi8('\\');
+    for (; end - position >= 16; position += 16) {
+        const __m128i block = _mm_loadu_si128((const __m128i *)(const void *)position);
+        const uint32_t mask = (uint32_t)(_mm_movemask_epi8(_mm_cmpeq_epi8(block, backslash)) | _mm_movemask_epi8(block));
+        if (mask != 0) {
+            return position + builtin_lowest_set_bit(mask);
+        }
+    }
+#elif defined(JS2C_SWAR)
+    for (; end - position >= 8; position += 8) {
+        uint64_t chunk;
+        memcpy(&chunk, position, sizeof(chunk));
+        const uint64_t special = builtin_zero_bytes(chunk ^ 0x5C5C5C5C5C5C5C5CULL) | (chunk & 0x8080808080808080ULL);
+        if (special != 0) {
+            return position + builtin_lowest_set_bit(special) / 8;
+        }
+    }
+#endif
+    while (position < end && *position != '\\' && !((unsigned char)*position & 0x80)) {
+        position += 1;
+    }
+    return position;
+}
+
+// The length of the valid UTF-8 sequence at start, or 0 if it is overlong, a surrogate, above U+10FFFF or truncated
+static inline int builtin_utf8_sequence_length(const unsigned char *start, const unsigned char *end) {
+    unsigned char min_second = 0x80;
+    unsigned char max_second = 0xBF;
+    int length;
+    if (start[0] >= 0xC2 && start[0] <= 0xDF) {
+        length = 2;
+    } else if (start[0] >= 0xE0 && start[0] <= 0xEF) {
+        length = 3;
+        min_second = start[0] == 0xE0 ? 0xA0 : 0x80;
+        max_second = start[0] == 0xED ? 0x9F : 0xBF;
+    } else if (start[0] >= 0xF0 && start[0] <= 0xF4) {
+        length = 4;
+        min_second = start[0] == 0xF0 ? 0x90 : 0x80;
+        max_second = start[0] == 0xF4 ? 0x8F : 0xBF;
+    } else {
+        return 0;
+    }
+    if (end - start < length || start[1] < min_second || start[1] > max_second) {
+        return 0;
+    }
+    for (int i = 2; i < length; ++i) {
+        if ((start[i] & 0xC0) != 0x80) {
+            return 0;
+        }
+    }
+    return length;
+}
+
+// The code unit of the \uXXXX escape at start. Returns true if it is not one.
+static inline bool builtin_parse_unicode_escape(const char *start, const char *end, uint32_t *code_unit) {
+    if (end - start < 6 || start[0] != '\\' || start[1] != 'u') {
+        return true;
+    }
+    *code_unit = 0;
+    for (int i = 2; i < 6; ++i) {
+        const char hex = start[i];
+        uint32_t digit;
+        if (hex >= '0' && hex <= '9') {
+            digit = (uint32_t)(hex - '0');
+        } else if (hex >= 'a' && hex <= 'f') {
+            digit = (uint32_t)(hex - 'a' + 10);
+        } else if (hex >= 'A' && hex <= 'F') {
+            digit = (uint32_t)(hex - 'A' + 10);
+        } else {
+            return true;
+        }
+        *code_unit = *code_unit * 16 + digit;
+    }
+    return false;
+}
+
+static inline int builtin_encode_utf8(uint32_t code_point, char *out) {
+    if (code_point < 0x80) {
+        out[0] = (char)code_point;
+        return 1;
+    }
+    if (code_point < 0x800) {
+        out[0] = (char)(0xC0 | (code_point >> 6));
+        out[1] = (char)(0x80 | (code_point & 0x3F));
+        return 2;
+    }
+    if (code_point < 0x10000) {
+        out[0] = (char)(0xE0 | (code_point >> 12));
+        out[1] = (char)(0x80 | ((code_point >> 6) & 0x3F));
+        out[2] = (char)(0x80 | (code_point & 0x3F));
+        return 3;
+    }
+    out[0] = (char)(0xF0 | (code_point >> 18));
+    out[1] = (char)(0x80 | ((code_point >> 12) & 0x3F));
+    out[2] = (char)(0x80 | ((code_point >> 6) & 0x3F));
+    out[3] = (char)(0x80 | (code_point & 0x3F));
+    return 4;
+}
+
+/* Decode the escape sequence at position into decoded, and return the position after it, or NULL if it is
+ * invalid. A \u escape of a high surrogate must be followed by the escape of a low surrogate. */
+static inline const char *builtin_decode_escape(const char *position, const char *end, char *decoded, int *decoded_len) {
+    if (end - position < 2) {
+        return NULL;
+    }
+    *decoded_len = 1;
+    switch (position[1]) {
+    case '"': decoded[0] = '"'; return position + 2;
+    case '\\': decoded[0] = '\\'; return position + 2;
+    case '/': decoded[0] = '/'; return position + 2;
+    case 'b': decoded[0] = '\b'; return position + 2;
+    case 'f': decoded[0] = '\f'; return position + 2;
+    case 'n': decoded[0] = '\n'; return position + 2;
+    case 'r': decoded[0] = '\r'; return position + 2;
+    case 't': decoded[0] = '\t'; return position + 2;
+    case 'u': break;
+    default: return NULL;
+    }
+    uint32_t code_point;
+    if (builtin_parse_unicode_escape(position, end, &code_point) || (code_point >= 0xDC00 && code_point <= 0xDFFF)) {
+        return NULL;
+    }
+    position += 6;
+    if (code_point >= 0xD800 && code_point <= 0xDBFF) {
+        uint32_t low_surrogate;
+        if (builtin_parse_unicode_escape(position, end, &low_surrogate) || low_surrogate < 0xDC00 || low_surrogate > 0xDFFF) {
+            return NULL;
+        }
+        code_point = 0x10000 + ((code_point - 0xD800) << 10) + (low_surrogate - 0xDC00);
+        position += 6;
+    }
+    *decoded_len = builtin_encode_utf8(code_point, decoded);
+    return position;
+}
+
+/* Copy the current string into out with its escapes decoded, checking that it is valid UTF-8 and that its
+ * decoded length (in bytes) is within the limits, in a single pass. */
+static inline bool builtin_unescape_current_string(parse_state_t *parse_state, char *out, int min_len, int max_len, int *decoded_length) {
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    const char *position = parse_state->json_string + token->start;
+    const char *end = parse_state->json_string + token->end;
+    int length = 0;
+    while (true) {
+        const char *special = builtin_find_escape_or_non_ascii(position, end);
+        const int run_length = (int)(special - position);
+        // Past max_len nothing is written, only counted for the error message
+        if (length + run_length <= max_len) {
+            memcpy(out + length, position, (size_t)run_length);
+        }
+        length += run_length;
+        position = special;
+        if (position == end) {
+            break;
+        }
+        char decoded[4];
+        int decoded_len;
+        if (*position == '\\') {
+            const char *next = builtin_decode_escape(position, end, decoded, &decoded_len);
+            if (next == NULL) {
+                TRY_LOG_ERROR(
+                    (int)(position - parse_state->json_string), "Invalid escape sequence in '%s': %.*s",
+                    parse_state->current_key, (int)(end - position < 12 ? end - position : 12), position
+                );
+                return true;
+            }
+            position = next;
+        } else {
+            decoded_len = builtin_utf8_sequence_length((const unsigned char *)position, (const unsigned char *)end);
+            if (decoded_len == 0) {
+                TRY_LOG_ERROR((int)(position - parse_state->json_string), "Invalid UTF-8 in '%s'", parse_state->current_key);
+                return true;
+            }
+            memcpy(decoded, position, (size_t)decoded_len);
+            position += decoded_len;
+        }
+        if (length + decoded_len <= max_len) {
+            memcpy(out + length, decoded, (size_t)decoded_len);
+        }
+        length += decoded_len;
+    }
+    if (length > max_len) {
+        TRY_LOG_ERROR(token->start, "String too large in '%s'. Length: %i. Maximum length: %i.", parse_state->current_key, length, max_len);
+        return true;
+    }
+    if (length < min_len) {
+        TRY_LOG_ERROR(token->start, "String too short in '%s'. Length: %i. Minimum length: %i.", parse_state->current_key, length, min_len);
+        return true;
+    }
+    out[length] = 0;
+    *decoded_length = length;
+    return false;
+}
+
+static inline bool builtin_parse_unescaped_string(parse_state_t *parse_state, char *out, int min_len, int max_len) {
+    int length;
+    if (check_type(parse_state, JSMN_STRING) || builtin_unescape_current_string(parse_state, out, min_len, max_len, &length)) {
+        return true;
+    }
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+#ifdef JS2C_ARENA
+static inline bool builtin_parse_unescaped_arena_string(parse_state_t *parse_state, const char **chars, size_t *length, int min_len, int max_len) {
+    if (check_type(parse_state, JSMN_STRING)) {
+        return true;
+    }
+    // Decoding never makes a string longer
+    const int escaped_length = CURRENT_STRING_LENGTH(parse_state);
+    char *out = (char *)builtin_arena_alloc(parse_state, (size_t)escaped_length + 1, 1);
+    int decoded_length;
+    if (out == NULL || builtin_unescape_current_string(parse_state, out, min_len, max_len, &decoded_length)) {
+        return true;
+    }
+    // The string is the last allocation, so its unused end is given back
+    parse_state->arena_used -= (size_t)(escaped_length - decoded_length);
+    *chars = out;
+    *length = (size_t)decoded_length;
+    builtin_consume_value(parse_state);
+    return false;
+}
+#endif
+
+#endif /* JS2C_UNESCAPE_STRINGS */
+
+// The current string, as a pointer into the JSON string. A negative max_len means no maximum.
+static inline bool builtin_parse_string_view(
+    parse_state_t *parse_state,
+    const char **chars,
+    size_t *length,
+    bool *has_escapes,
+    int min_len,
+    int max_len
+) {
+    if (builtin_check_current_string(parse_state, min_len, max_len < 0 ? CURRENT_STRING_LENGTH(parse_state) : max_len)) {
+        return true;
+    }
+    *chars = CURRENT_STRING(parse_state);
+    *length = (size_t)CURRENT_STRING_LENGTH(parse_state);
+    *has_escapes = memchr(*chars, '\\', *length) != NULL;
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+static inline bool builtin_parse_bool(parse_state_t *parse_state, bool *out) {
+    if (check_type(parse_state, JSMN_PRIMITIVE)) {
+        return true;
+    }
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    const char first_char = parse_state->json_string[token->start];
+    if (first_char != 't' && first_char != 'f') {
+        TRY_LOG_ERROR(token->start, "Invalid boolean literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+        return true;
+    }
+    *out = first_char == 't';
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+#ifdef JS2C_SWAR
+// Whether all 8 bytes of chunk, read little endian, are ASCII digits
+static inline bool builtin_is_eight_digits(uint64_t chunk) {
+    return ((chunk & UINT64_C(0xF0F0F0F0F0F0F0F0)) |
+            (((chunk + UINT64_C(0x0606060606060606)) & UINT64_C(0xF0F0F0F0F0F0F0F0)) >> 4)) == UINT64_C(0x3333333333333333);
+}
+
+// The value of 8 ASCII digits, read little endian: pairs, then quads, then the whole, each in one multiplication.
+static inline uint64_t builtin_eight_digits_value(uint64_t chunk) {
+    chunk -= UINT64_C(0x3030303030303030);
+    chunk = (chunk * 10) + (chunk >> 8);
+    chunk = (((chunk & UINT64_C(0x000000FF000000FF)) * UINT64_C(0x000F424000000064)) +
+             (((chunk >> 16) & UINT64_C(0x000000FF000000FF)) * UINT64_C(0x0000271000000001))) >> 32;
+    return chunk & 0xFFFFFFFF;
+}
+#endif
+
+typedef enum {
+    BUILTIN_DIGITS_OK,
+    BUILTIN_DIGITS_INVALID,
+    BUILTIN_DIGITS_OVERFLOW,
+} builtin_digits_result_t;
+
+/* Parse exactly the digits between start and end in radix (8, 10 or 16). There must be at least one,
+ * and nothing else. A valid number that doesn't fit 64 bits is an overflow. */
+static inline builtin_digits_result_t builtin_parse_digits(const char *start, const char *end, unsigned int radix, uint64_t *out) {
+    if (start == end) {
+        return BUILTIN_DIGITS_INVALID;
+    }
+    // Leading zeros don't count towards the digits that fit
+    while (end - start > 1 && *start == '0') {
+        start += 1;
+    }
+    uint64_t value = 0;
+#ifdef JS2C_SWAR
+    if (radix == 10) {
+        // 16 digits at most are converted here, which can't overflow. The rest is checked below.
+        const char *swar_end = end - start > 16 ? start + 16 : end;
+        while (swar_end - start >= 8) {
+            uint64_t chunk;
+            memcpy(&chunk, start, sizeof(chunk));
+            if (!builtin_is_eight_digits(chunk)) {
+                return BUILTIN_DIGITS_INVALID;
+            }
+            value = value * 100000000 + builtin_eight_digits_value(chunk);
+            start += 8;
+        }
+    }
+#endif
+    bool overflow = false;
+    for (; start < end; ++start) {
+        const char c = *start;
+        unsigned int digit;
+        if (c >= '0' && c <= '9') {
+            digit = (unsigned int)(c - '0');
+        } else if (c >= 'a' && c <= 'f') {
+            digit = (unsigned int)(c - 'a' + 10);
+        } else if (c >= 'A' && c <= 'F') {
+            digit = (unsigned int)(c - 'A' + 10);
+        } else {
+            return BUILTIN_DIGITS_INVALID;
+        }
+        if (digit >= radix) {
+            return BUILTIN_DIGITS_INVALID;
+        }
+        // Keep going after an overflow: an invalid character is reported as such.
+        if (overflow || value > (UINT64_MAX - digit) / radix) {
+            overflow = true;
+            continue;
+        }
+        value = value * radix + digit;
+    }
+    if (overflow) {
+        return BUILTIN_DIGITS_OVERFLOW;
+    }
+    *out = value;
+    return BUILTIN_DIGITS_OK;
+}
+
+/* Parse an integer literal without a sign, in radix 10, 16 (with an optional 0x prefix), or 0:
+ * hexadecimal with a 0x prefix, octal with a 0 prefix, decimal otherwise. Like strtoull, but only
+ * the token is read, there is no whitespace or locale involved, and an overflow is detected. */
+static inline builtin_digits_result_t builtin_parse_magnitude(const char *start, const char *end, int radix, uint64_t *out) {
+    const bool hex_prefix = end - start > 2 && start[0] == '0' && (start[1] == 'x' || start[1] == 'X');
+    if ((radix == 16 || radix == 0) && hex_prefix) {
+        return builtin_parse_digits(start + 2, end, 16, out);
+    }
+    if (radix == 0) {
+        radix = end - start > 1 && start[0] == '0' ? 8 : 10;
+    }
+    return builtin_parse_digits(start, end, (unsigned int)radix, out);
+}
+
+static inline bool builtin_parse_signed(
+    parse_state_t *parse_state,
+    bool number_allowed,
+    bool string_allowed,
+    int radix,
+    int64_t *out) {
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    if (!((number_allowed && token->type == JSMN_PRIMITIVE) || (string_allowed && token->type == JSMN_STRING))) {
+        TRY_LOG_ERROR(token->start, "Unexpected token in '%s': %s", parse_state->current_key, token_type_as_string(token->type))
+        return true;
+    }
+    if (token->type == JSMN_PRIMITIVE) {
+        radix = 10;
+    }
+    const char *start_char = parse_state->json_string + token->start;
+    const char *end_char = parse_state->json_string + token->end;
+    const bool negative = start_char < end_char && *start_char == '-';
+    if (start_char < end_char && (*start_char == '-' || *start_char == '+')) {
+        start_char += 1;
+    }
+    uint64_t magnitude = 0;
+    builtin_digits_result_t result = builtin_parse_magnitude(start_char, end_char, radix, &magnitude);
+    if (result == BUILTIN_DIGITS_OK && magnitude > (negative ? (uint64_t)INT64_MAX + 1 : (uint64_t)INT64_MAX)) {
+        result = BUILTIN_DIGITS_OVERFLOW;
+    }
+    if (result == BUILTIN_DIGITS_INVALID) {
+        TRY_LOG_ERROR(token->start, "Invalid signed integer literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+        return true;
+    }
+    if (result == BUILTIN_DIGITS_OVERFLOW) {
+        TRY_LOG_ERROR(token->start, "Signed integer literal out of range in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+        return true;
+    }
+    // Negated as unsigned, because -INT64_MIN does not fit an int64_t
+    *out = negative ? (int64_t)(0 - magnitude) : (int64_t)magnitude;
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+static inline bool builtin_parse_unsigned(
+    parse_state_t *parse_state,
+    bool number_allowed,
+    bool string_allowed,
+    int radix,
+    uint64_t *out
+) {
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    if (!((number_allowed && token->type == JSMN_PRIMITIVE) || (string_allowed && token->type == JSMN_STRING))) {
+        TRY_LOG_ERROR(token->start, "Unexpected token in '%s': %s", parse_state->current_key, token_type_as_string(token->type))
+        return true;
+    }
+    if (token->type == JSMN_PRIMITIVE) {
+        radix = 10;
+    }
+    const char *start_char = parse_state->json_string + token->start;
+    const char *end_char = parse_state->json_string + token->end;
+    if (start_char < end_char && *start_char == '+') {
+        start_char += 1;
+    }
+    const builtin_digits_result_t result = builtin_parse_magnitude(start_char, end_char, radix, out);
+    if (result == BUILTIN_DIGITS_INVALID) {
+        TRY_LOG_ERROR(token->start, "Invalid unsigned integer literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+        return true;
+    }
+    if (result == BUILTIN_DIGITS_OVERFLOW) {
+        TRY_LOG_ERROR(token->start, "Unsigned integer literal out of range in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+        return true;
+    }
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+static inline bool builtin_parse_double(parse_state_t *parse_state, double *out) {
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    if (check_type(parse_state, JSMN_PRIMITIVE)) {
+        return true;
+    }
+    const char *start_char = parse_state->json_string + token->start;
+    if (token->end - token->start >= 2) {
+        if (start_char[1] != '.' && start_char[1] != 'e' && start_char[1] != 'E' &&
+            !(start_char[1] >= '0' && start_char[1] <= '9')) {
+            TRY_LOG_ERROR(token->start, "Invalid floating point literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+            return true;
+        }
+    }
+    char *end_char = NULL;
+    *out = strtod(start_char, &end_char);
+    if (end_char != parse_state->json_string + token->end) {
+        TRY_LOG_ERROR(token->start, "Invalid floating point literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+        return true;
+    }
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+// Number of leading zero bits. value must not be 0.
+static inline int builtin_leading_zeros(uint64_t value) {
+#if defined(__GNUC__)
+    return __builtin_clzll(value);
+#else
+    int zeros = 0;
+    while (!(value & (UINT64_C(1) << 63))) {
+        value <<= 1;
+        zeros += 1;
+    }
+    return zeros;
+#endif
+}
+
+// The full 128 bit product: the high half is returned, the low half goes to *low.
+static inline uint64_t builtin_multiply_128(uint64_t a, uint64_t b, uint64_t *low) {
+#if defined(__SIZEOF_INT128__)
+    const unsigned __int128 product = (unsigned __int128)a * b;
+    *low = (uint64_t)product;
+    return (uint64_t)(product >> 64);
+#else
+    const uint64_t a_lo = a & 0xFFFFFFFF, a_hi = a >> 32, b_lo = b & 0xFFFFFFFF, b_hi = b >> 32;
+    const uint64_t lo_lo = a_lo * b_lo, hi_lo = a_hi * b_lo, lo_hi = a_lo * b_hi, hi_hi = a_hi * b_hi;
+    const uint64_t cross = (lo_lo >> 32) + (hi_lo & 0xFFFFFFFF) + lo_hi;
+    *low = (cross << 32) | (lo_lo & 0xFFFFFFFF);
+    return (hi_lo >> 32) + (cross >> 32) + hi_hi;
+#endif
+}
+
+#ifdef JS2C_FAST_FLOAT
+// The generated parser defines builtin_powers_of_ten with JS2C_FAST_FLOAT.
+
+/* mantissa * 10^exp10, correctly rounded, with the Eisel-Lemire algorithm. Returns true if it can't
+ * tell how to round, or the result is subnormal or infinite: these are left to strtod. */
+static inline bool builtin_eisel_lemire(uint64_t mantissa, int exp10, bool negative, double *out) {
+    if (exp10 < JS2C_MIN_POWER_OF_TEN || exp10 > JS2C_MAX_POWER_OF_TEN) {
+        return true;
+    }
+    const int leading_zeros = builtin_leading_zeros(mantissa);
+    mantissa <<= leading_zeros;
+    // floor(log2(10) * exp10), with floor division for negative values too
+    const int32_t scaled_exp10 = 217706 * exp10;
+    const int32_t exp2 = scaled_exp10 >= 0 ? scaled_exp10 / 65536 : -((65535 - scaled_exp10) / 65536);
+    uint64_t result_exp2 = (uint64_t)(exp2 + 64 + 1023) - (uint64_t)leading_zeros;
+
+    const uint64_t *power = builtin_powers_of_ten[exp10 - JS2C_MIN_POWER_OF_TEN];
+    uint64_t x_lo;
+    uint64_t x_hi = builtin_multiply_128(mantissa, power[1], &x_lo);
+    // The truncated power of ten may be too small to decide: use its low half too.
+    if ((x_hi & 0x1FF) == 0x1FF && x_lo + mantissa < mantissa) {
+        uint64_t y_lo;
+        const uint64_t y_hi = builtin_multiply_128(mantissa, power[0], &y_lo);
+        uint64_t merged_hi = x_hi;
+        const uint64_t merged_lo = x_lo + y_hi;
+        if (merged_lo < x_lo) {
+            merged_hi += 1;
+        }
+        if ((merged_hi & 0x1FF) == 0x1FF && merged_lo + 1 == 0 && y_lo + mantissa < mantissa) {
+            return true;
+        }
+        x_hi = merged_hi;
+        x_lo = merged_lo;
+    }
+
+    const uint64_t msb = x_hi >> 63;
+    uint64_t result_mantissa = x_hi >> (msb + 9);
+    result_exp2 -= 1 ^ msb;
+    // Exactly half way between two doubles
+    if (x_lo == 0 && (x_hi & 0x1FF) == 0 && (result_mantissa & 3) == 1) {
+        return true;
+    }
+    result_mantissa += result_mantissa & 1;
+    result_mantissa >>= 1;
+    if (result_mantissa >> 53 > 0) {
+        result_mantissa >>= 1;
+        result_exp2 += 1;
+    }
+    // Subnormal (0 or an underflow), or infinite (0x7FF and above)
+    if (result_exp2 - 1 >= 0x7FF - 1) {
+        return true;
+    }
+    uint64_t bits = result_exp2 << 52 | (result_mantissa & UINT64_C(0x000FFFFFFFFFFFFF));
+    if (negative) {
+        bits |= UINT64_C(0x8000000000000000);
+    }
+    memcpy(out, &bits, sizeof(*out));
+    return false;
+}
+
+/* Same as builtin_parse_double, but only the token is read, without strtod, unless the number has more
+ * than 19 significant digits, or Eisel-Lemire can't round it. */
+static inline bool builtin_parse_double_fast(parse_state_t *parse_state, double *out) {
+    static const double exact_powers_of_ten[] = {
+        1e0, 1e1, 1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9, 1e10, 1e11,
+        1e12, 1e13, 1e14, 1e15, 1e16, 1e17, 1e18, 1e19, 1e20, 1e21, 1e22
+    };
+    const jsmntok_t *token = &CURRENT_TOKEN(parse_state);
+    if (check_type(parse_state, JSMN_PRIMITIVE)) {
+        return true;
+    }
+    const char *start_char = parse_state->json_string + token->start;
+    const char *end_char = parse_state->json_string + token->end;
+    const char *c = start_char;
+    const bool negative = c < end_char && *c == '-';
+    if (negative) {
+        c += 1;
+    }
+
+    // The significant digits, without the leading zeros, in mantissa, and the decimal exponent in exp10.
+    uint64_t mantissa = 0;
+    int digits = 0;
+    int significant_digits = 0;
+    int64_t exp10 = 0;
+    for (; c < end_char && *c >= '0' && *c <= '9'; ++c, ++digits) {
+        if (mantissa != 0 || *c != '0') {
+            if (significant_digits < 19) {
+                mantissa = mantissa * 10 + (uint64_t)(*c - '0');
+            } else {
+                exp10 += 1;
+            }
+            significant_digits += 1;
+        }
+    }
+    if (c < end_char && *c == '.') {
+        for (c += 1; c < end_char && *c >= '0' && *c <= '9'; ++c, ++digits) {
+            if (mantissa != 0 || *c != '0') {
+                if (significant_digits < 19) {
+                    mantissa = mantissa * 10 + (uint64_t)(*c - '0');
+                    exp10 -= 1;
+                }
+                significant_digits += 1;
+            } else {
+                exp10 -= 1;
+            }
+        }
+    }
+    bool valid = digits > 0;
+    if (valid && c < end_char && (*c == 'e' || *c == 'E')) {
+        c += 1;
+        const bool negative_exponent = c < end_char && *c == '-';
+        if (c < end_char && (*c == '-' || *c == '+')) {
+            c += 1;
+        }
+        valid = c < end_char;
+        int64_t exponent = 0;
+        for (; c < end_char && *c >= '0' && *c <= '9'; ++c) {
+            // Past this, the number is 0 or infinite anyway
+            if (exponent < 100000) {
+                exponent = exponent * 10 + (*c - '0');
+            }
+        }
+        exp10 += negative_exponent ? -exponent : exponent;
+    }
+    if (!valid || c != end_char) {
+        TRY_LOG_ERROR(token->start, "Invalid floating point literal in '%s': %.*s", parse_state->current_key, CURRENT_STRING_FOR_ERROR(parse_state));
+        return true;
+    }
+
+    if (mantissa == 0) {
+        *out = negative ? -0.0 : 0.0;
+    } else if (FLT_EVAL_METHOD == 0 && significant_digits <= 19 && mantissa <= (UINT64_C(1) << 53) && exp10 >= -22 && exp10 <= 22) {
+        // Both are exact doubles, so a single rounding gives the correct result (without excess precision).
+        *out = (double)mantissa;
+        *out = exp10 < 0 ? *out / exact_powers_of_ten[-exp10] : *out * exact_powers_of_ten[exp10];
+        if (negative) {
+            *out = -*out;
+        }
+    } else if (significant_digits > 19 || builtin_eisel_lemire(mantissa, (int)exp10, negative, out)) {
+        // The token was fully validated above, so strtod reads all of it.
+        *out = strtod(start_char, NULL);
+    }
+    builtin_consume_value(parse_state);
+    return false;
+}
+
+#endif /* JS2C_FAST_FLOAT */
+
+typedef struct serialize_state_s {
+    char *buffer;
+    size_t size;
+    // The bytes written so far
+    size_t length;
+} serialize_state_t;
+
+static inline void builtin_begin_serialize(serialize_state_t *serialize_state, char *buffer, size_t buffer_size) {
+    serialize_state->buffer = buffer;
+    serialize_state->size = buffer_size;
+    serialize_state->length = 0;
+}
+
+// Check that length more bytes fit in the buffer. Every write reserves its bytes first, so it is never cut short.
+static inline bool builtin_serialize_reserve(serialize_state_t *serialize_state, size_t length) {
+    if (length > serialize_state->size - serialize_state->length) {
+        LOG_ERROR(serialize_state->length, "Buffer too small for the serialized JSON");
+        return true;
+    }
+    return false;
+}
+
+static inline bool builtin_serialize_literal(serialize_state_t *serialize_state, const char *literal, size_t length) {
+    if (builtin_serialize_reserve(serialize_state, length)) {
+        return true;
+    }
+    memcpy(serialize_state->buffer + serialize_state->length, literal, length);
+    serialize_state->length += length;
+    return false;
+}
+
+// Terminate the JSON with a NUL, which is not counted in *length.
+static inline bool builtin_end_serialize(serialize_state_t *serialize_state, size_t *length) {
+    if (builtin_serialize_reserve(serialize_state, 1)) {
+        return true;
+    }
+    serialize_state->buffer[serialize_state->length] = '\0';
+    *length = serialize_state->length;
+    return false;
+}
+
+static inline bool builtin_serialize_bool(serialize_state_t *serialize_state, bool value) {
+    return value ? builtin_serialize_literal(serialize_state, "true", 4) : builtin_serialize_literal(serialize_state, "false", 5);
+}
+
+// Write the digits of value in radix 10 or 16, so that they end at end. Returns where they start.
+static inline char *builtin_format_digits(uint64_t value, unsigned int radix, char *end) {
+    // Two decimal digits per division
+    static const char digit_pairs[] =
+        "00010203040506070809"
+        "10111213141516171819"
+        "20212223242526272829"
+        "30313233343536373839"
+        "40414243444546474849"
+        "50515253545556575859"
+        "60616263646566676869"
+        "70717273747576777879"
+        "80818283848586878889"
+        "90919293949596979899";
+    if (radix == 16) {
+        do {
+            *--end = "0123456789abcdef"[value & 0xF];
+            value >>= 4;
+        } while (value);
+        return end;
+    }
+    while (value >= 100) {
+        const uint64_t pair = value % 100;
+        value /= 100;
+        end -= 2;
+        memcpy(end, &digit_pairs[pair * 2], 2);
+    }
+    if (value >= 10) {
+        end -= 2;
+        memcpy(end, &digit_pairs[value * 2], 2);
+    } else {
+        *--end = (char)('0' + value);
+    }
+    return end;
+}
+
+// A sign and the digits of magnitude. quoted writes it as a string, for the numbers spelled as strings.
+static inline bool builtin_serialize_magnitude(serialize_state_t *serialize_state, uint64_t magnitude, bool negative, unsigned int radix, bool quoted) {
+    // Two quotes, a sign and up to 20 digits
+    char digits[24];
+    char *end = digits + sizeof(digits);
+    if (quoted) {
+        *--end = '"';
+    }
+    char *start = builtin_format_digits(magnitude, radix, end);
+    if (negative) {
+        *--start = '-';
+    }
+    if (quoted) {
+        *--start = '"';
+    }
+    return builtin_serialize_literal(serialize_state, start, (size_t)(digits + sizeof(digits) - start));
+}
+
+static inline bool builtin_serialize_unsigned(serialize_state_t *serialize_state, uint64_t value, unsigned int radix, bool quoted) {
+    return builtin_serialize_magnitude(serialize_state, value, false, radix, quoted);
+}
+
+static inline bool builtin_serialize_signed(serialize_state_t *serialize_state, int64_t value, unsigned int radix, bool quoted) {
+    // Negated as unsigned, so that INT64_MIN does not overflow
+    const uint64_t magnitude = value < 0 ? 0 - (uint64_t)value : (uint64_t)value;
+    return builtin_serialize_magnitude(serialize_state, magnitude, value < 0, radix, quoted);
+}
+
+// A floating point number as a 64 bit significand f and a binary exponent e: f * 2^e
+typedef struct builtin_diy_fp_s {
+    uint64_t f;
+    int e;
+} builtin_diy_fp_t;
+
+// The product, rounded to 64 bits
+static inline builtin_diy_fp_t builtin_diy_fp_multiply(builtin_diy_fp_t a, builtin_diy_fp_t b) {
+    uint64_t low;
+    const uint64_t high = builtin_multiply_128(a.f, b.f, &low);
+    const builtin_diy_fp_t product = {high + (low >> 63), a.e + b.e + 64};
+    return product;
+}
+
+static inline builtin_diy_fp_t builtin_normalize(builtin_diy_fp_t value) {
+    const int shift = builtin_leading_zeros(value.f);
+    value.f <<= shift;
+    value.e -= shift;
+    return value;
+}
+
+/* A power of ten 10^-k that brings a number with binary exponent e to a binary exponent between -60 and -32,
+ * so that its integer part fits in 32 bits. */
+static inline builtin_diy_fp_t builtin_cached_power(int e, int *k) {
+    // 10^-348, 10^-340, ..., 10^340, normalized to 64 bits and rounded to nearest
+    static const builtin_diy_fp_t powers[] = {
+        {0xfa8fd5a0081c0288ULL, -1220}, // 1e-348
+        {0xbaaee17fa23ebf76ULL, -1193}, // 1e-340
+        {0x8b16fb203055ac76ULL, -1166}, // 1e-332
+        {0xcf42894a5dce35eaULL, -1140}, // 1e-324
+        {0x9a6bb0aa55653b2dULL, -1113}, // 1e-316
+        {0xe61acf033d1a45dfULL, -1087}, // 1e-308
+        {0xab70fe17c79ac6caULL, -1060}, // 1e-300
+        {0xff77b1fcbebcdc4fULL, -1034}, // 1e-292
+        {0xbe5691ef416bd60cULL, -1007}, // 1e-284
+        {0x8dd01fad907ffc3cULL, -980}, // 1e-276
+        {0xd3515c2831559a83ULL, -954}, // 1e-268
+        {0x9d71ac8fada6c9b5ULL, -927}, // 1e-260
+        {0xea9c227723ee8bcbULL, -901}, // 1e-252
+        {0xaecc49914078536dULL, -874}, // 1e-244
+        {0x823c12795db6ce57ULL, -847}, // 1e-236
+        {0xc21094364dfb5637ULL, -821}, // 1e-228
+        {0x9096ea6f3848984fULL, -794}, // 1e-220
+        {0xd77485cb25823ac7ULL, -768}, // 1e-212
+        {0xa086cfcd97bf97f4ULL, -741}, // 1e-204
+        {0xef340a98172aace5ULL, -715}, // 1e-196
+        {0xb23867fb2a35b28eULL, -688}, // 1e-188
+        {0x84c8d4dfd2c63f3bULL, -661}, // 1e-180
+        {0xc5dd44271ad3cdbaULL, -635}, // 1e-172
+        {0x936b9fcebb25c996ULL, -608}, // 1e-164
+        {0xdbac6c247d62a584ULL, -582}, // 1e-156
+        {0xa3ab66580d5fdaf6ULL, -555}, // 1e-148
+        {0xf3e2f893dec3f126ULL, -529}, // 1e-140
+        {0xb5b5ada8aaff80b8ULL, -502}, // 1e-132
+        {0x87625f056c7c4a8bULL, -475}, // 1e-124
+        {0xc9bcff6034c13053ULL, -449}, // 1e-116
+        {0x964e858c91ba2655ULL, -422}, // 1e-108
+        {0xdff9772470297ebdULL, -396}, // 1e-100
+        {0xa6dfbd9fb8e5b88fULL, -369}, // 1e-92
+        {0xf8a95fcf88747d94ULL, -343}, // 1e-84
+        {0xb94470938fa89bcfULL, -316}, // 1e-76
+        {0x8a08f0f8bf0f156bULL, -289}, // 1e-68
+        {0xcdb02555653131b6ULL, -263}, // 1e-60
+        {0x993fe2c6d07b7facULL, -236}, // 1e-52
+        {0xe45c10c42a2b3b06ULL, -210}, // 1e-44
+        {0xaa242499697392d3ULL, -183}, // 1e-36
+        {0xfd87b5f28300ca0eULL, -157}, // 1e-28
+        {0xbce5086492111aebULL, -130}, // 1e-20
+        {0x8cbccc096f5088ccULL, -103}, // 1e-12
+        {0xd1b71758e219652cULL, -77}, // 1e-4
+        {0x9c40000000000000ULL, -50}, // 1e4
+        {0xe8d4a51000000000ULL, -24}, // 1e12
+        {0xad78ebc5ac620000ULL, 3}, // 1e20
+        {0x813f3978f8940984ULL, 30}, // 1e28
+        {0xc097ce7bc90715b3ULL, 56}, // 1e36
+        {0x8f7e32ce7bea5c70ULL, 83}, // 1e44
+        {0xd5d238a4abe98068ULL, 109}, // 1e52
+        {0x9f4f2726179a2245ULL, 136}, // 1e60
+        {0xed63a231d4c4fb27ULL, 162}, // 1e68
+        {0xb0de65388cc8ada8ULL, 189}, // 1e76
+        {0x83c7088e1aab65dbULL, 216}, // 1e84
+        {0xc45d1df942711d9aULL, 242}, // 1e92
+        {0x924d692ca61be758ULL, 269}, // 1e100
+        {0xda01ee641a708deaULL, 295}, // 1e108
+        {0xa26da3999aef774aULL, 322}, // 1e116
+        {0xf209787bb47d6b85ULL, 348}, // 1e124
+        {0xb454e4a179dd1877ULL, 375}, // 1e132
+        {0x865b86925b9bc5c2ULL, 402}, // 1e140
+        {0xc83553c5c8965d3dULL, 428}, // 1e148
+        {0x952ab45cfa97a0b3ULL, 455}, // 1e156
+        {0xde469fbd99a05fe3ULL, 481}, // 1e164
+        {0xa59bc234db398c25ULL, 508}, // 1e172
+        {0xf6c69a72a3989f5cULL, 534}, // 1e180
+        {0xb7dcbf5354e9beceULL, 561}, // 1e188
+        {0x88fcf317f22241e2ULL, 588}, // 1e196
+        {0xcc20ce9bd35c78a5ULL, 614}, // 1e204
+        {0x98165af37b2153dfULL, 641}, // 1e212
+        {0xe2a0b5dc971f303aULL, 667}, // 1e220
+        {0xa8d9d1535ce3b396ULL, 694}, // 1e228
+        {0xfb9b7cd9a4a7443cULL, 720}, // 1e236
+        {0xbb764c4ca7a44410ULL, 747}, // 1e244
+        {0x8bab8eefb6409c1aULL, 774}, // 1e252
+        {0xd01fef10a657842cULL, 800}, // 1e260
+        {0x9b10a4e5e9913129ULL, 827}, // 1e268
+        {0xe7109bfba19c0c9dULL, 853}, // 1e276
+        {0xac2820d9623bf429ULL, 880}, // 1e284
+        {0x80444b5e7aa7cf85ULL, 907}, // 1e292
+        {0xbf21e44003acdd2dULL, 933}, // 1e300
+        {0x8e679c2f5e44ff8fULL, 960}, // 1e308
+        {0xd433179d9c8cb841ULL, 986}, // 1e316
+        {0x9e19db92b4e31ba9ULL, 1013}, // 1e324
+        {0xeb96bf6ebadf77d9ULL, 1039}, // 1e332
+        {0xaf87023b9bf0ee6bULL, 1066}, // 1e340
+    };
+    // ceil((-61 - e) * log10(2)), offset to stay positive
+    const double estimate = (-61 - e) * 0.30102999566398114 + 347;
+    int index = (int)estimate;
+    if (estimate - index > 0.0) {
+        index += 1;
+    }
+    index = (index >> 3) + 1;
+    *k = 348 - index * 8;
+    return powers[index];
+}
+
+// Step the last digit down while that brings it closer to w, staying above the lower boundary.
+static inline void builtin_grisu_round(char *digits, int length, uint64_t delta, uint64_t rest, uint64_t ten_kappa, uint64_t distance) {
+    while (rest < distance && delta - rest >= ten_kappa &&
+           (rest + ten_kappa < distance || distance - rest > rest + ten_kappa - distance)) {
+        digits[length - 1] -= 1;
+        rest += ten_kappa;
+    }
+}
+
+/* The shortest digits of high that stay above high - delta, rounded towards w. *k is incremented with
+ * the decimal exponent of the last digit. Returns the number of digits. */
+static inline int builtin_grisu_digits(builtin_diy_fp_t w, builtin_diy_fp_t high, uint64_t delta, char *digits, int *k) {
+    static const uint32_t powers_of_ten[] = {1, 10, 100, 1000, 10000, 100000, 1000000, 10000000, 100000000, 1000000000};
+    const int shift = -high.e;
+    const uint64_t one = UINT64_C(1) << shift;
+    const uint64_t distance = high.f - w.f;
+    uint32_t integral = (uint32_t)(high.f >> shift);
+    uint64_t fraction = high.f & (one - 1);
+    int kappa = 1;
+    while (kappa < 10 && integral >= powers_of_ten[kappa]) {
+        kappa += 1;
+    }
+    int length = 0;
+    while (kappa > 0) {
+        const uint32_t digit = integral / powers_of_ten[kappa - 1];
+        integral %= powers_of_ten[kappa - 1];
+        if (digit || length) {
+            digits[length++] = (char)('0' + digit);
+        }
+        kappa -= 1;
+        const uint64_t rest = ((uint64_t)integral << shift) + fraction;
+        if (rest <= delta) {
+            *k += kappa;
+            builtin_grisu_round(digits, length, delta, rest, (uint64_t)powers_of_ten[kappa] << shift, distance);
+            return length;
+        }
+    }
+    for (;;) {
+        fraction *= 10;
+        delta *= 10;
+        const char digit = (char)(fraction >> shift);
+        if (digit || length) {
+            digits[length++] = (char)('0' + digit);
+        }
+        fraction &= one - 1;
+        kappa -= 1;
+        if (fraction < delta) {
+            *k += kappa;
+            builtin_grisu_round(digits, length, delta, fraction, one, -kappa < 10 ? distance * powers_of_ten[-kappa] : 0);
+            return length;
+        }
+    }
+}
+
+/* Up to 17 digits that read back as value, with the Grisu2 algorithm: value * 10^-k is exact in 64 bits, so
+ * the digits come from integer arithmetic. value must be positive and finite. digits * 10^k is value. */
+static inline int builtin_grisu2(double value, char *digits, int *k) {
+    uint64_t bits;
+    memcpy(&bits, &value, sizeof(bits));
+    const int biased_exponent = (int)((bits >> 52) & 0x7FF);
+    const uint64_t hidden_bit = UINT64_C(1) << 52;
+    builtin_diy_fp_t v = {bits & (hidden_bit - 1), -1074};
+    if (biased_exponent != 0) {
+        v.f |= hidden_bit;
+        v.e = biased_exponent - 1075;
+    }
+    // The halfway points to the neighbouring doubles. Anything between them reads back as value.
+    const builtin_diy_fp_t high = builtin_normalize((builtin_diy_fp_t){(v.f << 1) + 1, v.e - 1});
+    builtin_diy_fp_t low = v.f == hidden_bit ? (builtin_diy_fp_t){(v.f << 2) - 1, v.e - 2} : (builtin_diy_fp_t){(v.f << 1) - 1, v.e - 1};
+    low.f <<= low.e - high.e;
+    low.e = high.e;
+
+    const builtin_diy_fp_t power = builtin_cached_power(high.e, k);
+    const builtin_diy_fp_t w = builtin_diy_fp_multiply(builtin_normalize(v), power);
+    // One unit in, on both sides, for the rounding errors of the multiplication
+    builtin_diy_fp_t w_high = builtin_diy_fp_multiply(high, power);
+    builtin_diy_fp_t w_low = builtin_diy_fp_multiply(low, power);
+    w_low.f += 1;
+    w_high.f -= 1;
+    return builtin_grisu_digits(w, w_high, w_high.f - w_low.f, digits, k);
+}
+
+/* A number that reads back as the same double, without printf, so it is locale independent too. Formatted
+ * like JavaScript's Number.prototype.toString(), without the + of positive exponents. Infinities and NaN
+ * have no JSON, they are an error. */
+static inline bool builtin_serialize_double(serialize_state_t *serialize_state, double value) {
+    uint64_t bits;
+    memcpy(&bits, &value, sizeof(bits));
+    if (((bits >> 52) & 0x7FF) == 0x7FF) {
+        LOG_ERROR(serialize_state->length, "Infinity and NaN can't be serialized");
+        return true;
+    }
+    // A sign, 17 digits and the decimal point, with an exponent or up to 6 zeros
+    char number[25];
+    char *out = number;
+    if (bits >> 63) {
+        *out++ = '-';
+        value = -value;
+    }
+    if (value == 0) {
+        *out++ = '0';
+        return builtin_serialize_literal(serialize_state, number, (size_t)(out - number));
+    }
+    int k = 0;
+    const int length = builtin_grisu2(value, out, &k);
+    // The position of the decimal point, after the first point digits
+    const int point = length + k;
+    if (k >= 0 && point <= 21) {
+        // 1234e7 -> 12340000000
+        memset(out + length, '0', (size_t)k);
+        out += point;
+    } else if (point > 0 && point <= 21) {
+        // 1234e-2 -> 12.34
+        memmove(out + point + 1, out + point, (size_t)(length - point));
+        out[point] = '.';
+        out += length + 1;
+    } else if (point > -6 && point <= 0) {
+        // 1234e-6 -> 0.001234
+        const int offset = 2 - point;
+        memmove(out + offset, out, (size_t)length);
+        out[0] = '0';
+        out[1] = '.';
+        memset(out + 2, '0', (size_t)(offset - 2));
+        out += length + offset;
+    } else {
+        // 1234e30 -> 1.234e33
+        if (length > 1) {
+            memmove(out + 2, out + 1, (size_t)(length - 1));
+            out[1] = '.';
+            out += 1;
+        }
+        out += length;
+        *out++ = 'e';
+        int exponent = point - 1;
+        if (exponent < 0) {
+            *out++ = '-';
+            exponent = -exponent;
+        }
+        char exponent_digits[3];
+        char *const exponent_end = exponent_digits + sizeof(exponent_digits);
+        const char *const exponent_start = builtin_format_digits((uint64_t)exponent, 10, exponent_end);
+        memcpy(out, exponent_start, (size_t)(exponent_end - exponent_start));
+        out += exponent_end - exponent_start;
+    }
+    return builtin_serialize_literal(serialize_state, number, (size_t)(out - number));
+}
+
+// The length of a string stored in a char[max_length + 1], which may be cut off without its NUL
+static inline size_t builtin_string_length(const char *chars, size_t max_length) {
+    const char *nul = (const char *)memchr(chars, '\0', max_length);
+    return nul == NULL ? max_length : (size_t)(nul - chars);
+}
+
+// A string whose escapes were kept as they were in the JSON: it is written back as-is, between quotes.
+static inline bool builtin_serialize_string(serialize_state_t *serialize_state, const char *chars, size_t length) {
+    if (builtin_serialize_reserve(serialize_state, length + 2)) {
+        return true;
+    }
+    char *out = serialize_state->buffer + serialize_state->length;
+    out[0] = '"';
+    memcpy(out + 1, chars, length);
+    out[length + 1] = '"';
+    serialize_state->length += length + 2;
+    return false;
+}
+
+/* A decoded string, with quotes, backslashes and control characters escaped. Everything else, UTF-8
+ * included, is copied as-is. */
+static inline bool builtin_serialize_escaped_string(serialize_state_t *serialize_state, const char *chars, size_t length) {
+    // The string is reserved as if it had no escapes, the common case. Each escape reserves its extra bytes.
+    if (builtin_serialize_reserve(serialize_state, length + 2)) {
+        return true;
+    }
+    const char *const end = chars + length;
+    serialize_state->buffer[serialize_state->length++] = '"';
+    for (;;) {
+        const char *run = chars;
+#ifdef JS2C_SWAR
+        while (end - chars >= 8) {
+            uint64_t chunk;
+            memcpy(&chunk, chars, sizeof(chunk));
+            const uint64_t below_space = (chunk - 0x2020202020202020ULL) & ~chunk & 0x8080808080808080ULL;
+            if (below_space | builtin_zero_bytes(chunk ^ 0x2222222222222222ULL) | builtin_zero_bytes(chunk ^ 0x5C5C5C5C5C5C5C5CULL)) {
+                break;
+            }
+            chars += 8;
+        }
+#endif
+        while (chars < end && (unsigned char)*chars >= 0x20 && *chars != '"' && *chars != '\\') {
+            chars += 1;
+        }
+        memcpy(serialize_state->buffer + serialize_state->length, run, (size_t)(chars - run));
+        serialize_state->length += (size_t)(chars - run);
+        if (chars == end) {
+            break;
+        }
+        const unsigned char character = (unsigned char)*chars++;
+        char escape[6] = {'\\', (char)character, 0, 0, 0, 0};
+        size_t escape_length = 2;
+        switch (character) {
+        case '\b':
+            escape[1] = 'b';
+            break;
+        case '\f':
+            escape[1] = 'f';
+            break;
+        case '\n':
+            escape[1] = 'n';
+            break;
+        case '\r':
+            escape[1] = 'r';
+            break;
+        case '\t':
+            escape[1] = 't';
+            break;
+        case '"':
+        case '\\':
+            break;
+        default:
+            memcpy(escape, "\\u00", 4);
+            escape[4] = "0123456789abcdef"[character >> 4];
+            escape[5] = "0123456789abcdef"[character & 0xF];
+            escape_length = 6;
+        }
+        // The escape, the rest of the string and the closing quote
+        if (builtin_serialize_reserve(serialize_state, escape_length + (size_t)(end - chars) + 1)) {
+            return true;
+        }
+        memcpy(serialize_state->buffer + serialize_state->length, escape, escape_length);
+        serialize_state->length += escape_length;
+    }
+    serialize_state->buffer[serialize_state->length++] = '"';
+    return false;
+}
+
+// A view is still JSON-escaped if it has escapes. Without them, it may be a string the caller pointed it to.
+static inline bool builtin_serialize_string_view(serialize_state_t *serialize_state, const char *chars, size_t length, bool has_escapes) {
+    if (has_escapes) {
+        return builtin_serialize_string(serialize_state, chars, length);
+    }
+    return builtin_serialize_escaped_string(serialize_state, chars, length);
+}
+
+#ifdef JS2C_PTHREADS
+
+#ifndef JS2C_MAX_THREADS
+#define JS2C_MAX_THREADS 64
+#endif
+
+struct builtin_shard_run_s;
+
+/* A part of an NDJSON buffer, parsed by one thread. Shards are split on record boundaries, and each
+ * one writes its records to out and error_indices starting at record_offset, so they stay in order. */
+typedef struct builtin_shard_s {
+    struct builtin_shard_run_s *run;
+    const char *start;
+    size_t length;
+    size_t record_count;        // All the records in the shard
+    size_t record_offset;       // Of the first record, in the whole buffer
+    size_t max_records;         // The records to parse, fewer than record_count past the caller's max_records
+    void *out;
+    size_t *error_indices;
+    size_t error_count;         // Error indices are relative to the shard until merged
+    size_t consumed_len;
+#ifdef JS2C_ARENA
+    char *arena;                // The shard's part of the caller's arena
+    size_t arena_size;
+    size_t arena_used;
+#endif
+} builtin_shard_t;
+
+static inline void builtin_split_shards(const char *ndjson, size_t ndjson_len, builtin_shard_t *shards, unsigned int shard_count) {
+    const char *end = ndjson + ndjson_len;
+    const char *start = ndjson;
+    for (unsigned int i = 0; i < shard_count; ++i) {
+        const char *shard_end = end;
+        if (i + 1 < shard_count) {
+            shard_end = ndjson + ndjson_len / shard_count * (i + 1);
+            if (shard_end < start) {
+                shard_end = start;
+            }
+            const char *newline = (const char *)memchr(shard_end, '\n', (size_t)(end - shard_end));
+            shard_end = newline != NULL ? newline + 1 : end;
+        }
+        memset(&shards[i], 0, sizeof(shards[i]));
+        shards[i].start = start;
+        shards[i].length = (size_t)(shard_end - start);
+        start = shard_end;
+    }
+}
+
+static inline void builtin_count_shard_records(builtin_shard_t *shard) {
+    const char *record = shard->start;
+    const char *end = shard->start + shard->length;
+    size_t record_len = 0;
+    while (builtin_next_record(&record, end, &record_len)) {
+        shard->record_count += 1;
+        record += record_len;
+    }
+}
+
+// Once the records are counted, give each shard its place in the output.
+static inline void builtin_place_shards(
+    builtin_shard_t *shards,
+    unsigned int shard_count,
+    void *out,
+    size_t *error_indices,
+    size_t max_records
+) {
+    size_t record_offset = 0;
+    for (unsigned int i = 0; i < shard_count; ++i) {
+        const size_t remaining = record_offset < max_records ? max_records - record_offset : 0;
+        shards[i].record_offset = record_offset;
+        shards[i].max_records = shards[i].record_count < remaining ? shards[i].record_count : remaining;
+        shards[i].out = out;
+        shards[i].error_indices = error_indices + (record_offset < max_records ? record_offset : max_records);
+        record_offset += shards[i].record_count;
+    }
+}
+
+/* What the threads of a json_parse_*_many_parallel call share. Each thread counts the records of its
+ * shard, then waits for the calling thread to place the shards, then parses its shard: the threads are
+ * only started once. */
+typedef struct builtin_shard_run_s {
+    void *(*parse)(void *);     // Parses a placed shard
+    pthread_mutex_t mutex;
+    pthread_cond_t changed;
+    unsigned int counted;       // Shards counted by the started threads
+    bool placed;
+} builtin_shard_run_t;
+
+static inline void *builtin_shard_worker(void *shard_ptr) {
+    builtin_shard_t *shard = (builtin_shard_t *)shard_ptr;
+    builtin_shard_run_t *run = shard->run;
+    builtin_count_shard_records(shard);
+    pthread_mutex_lock(&run->mutex);
+    run->counted += 1;
+    pthread_cond_broadcast(&run->changed);
+    while (!run->placed) {
+        pthread_cond_wait(&run->changed, &run->mutex);
+    }
+    pthread_mutex_unlock(&run->mutex);
+    return run->parse(shard);
+}
+
+/* Count the records of every shard, place them in the output, then parse them with parse, on a thread
+ * each. The calling thread takes the first shard, and any shard whose thread could not be started. */
+static inline void builtin_run_shards(
+    void *(*parse)(void *),
+    builtin_shard_t *shards,
+    unsigned int shard_count,
+    size_t stack_size,
+    void *out,
+    size_t *error_indices,
+    size_t max_records
+) {
+    builtin_shard_run_t run;
+    memset(&run, 0, sizeof(run));
+    run.parse = parse;
+    pthread_t threads[JS2C_MAX_THREADS];
+    bool started[JS2C_MAX_THREADS] = {false};
+    unsigned int started_count = 0;
+    // Without them, the calling thread does everything.
+    const bool has_mutex = pthread_mutex_init(&run.mutex, NULL) == 0;
+    const bool synchronized = has_mutex && pthread_cond_init(&run.changed, NULL) == 0;
+    pthread_attr_t attr;
+    const bool has_attr = pthread_attr_init(&attr) == 0;
+    if (has_attr) {
+        // Not fatal: the default stack size may be enough too.
+        (void)pthread_attr_setstacksize(&attr, stack_size);
+    }
+    for (unsigned int i = 1; i < shard_count && synchronized; ++i) {
+        shards[i].run = &run;
+        started[i] = pthread_create(&threads[i], has_attr ? &attr : NULL, builtin_shard_worker, &shards[i]) == 0;
+        started_count += started[i];
+    }
+    for (unsigned int i = 0; i < shard_count; ++i) {
+        if (!started[i]) {
+            builtin_count_shard_records(&shards[i]);
+        }
+    }
+    if (started_count > 0) {
+        pthread_mutex_lock(&run.mutex);
+        while (run.counted < started_count) {
+            pthread_cond_wait(&run.changed, &run.mutex);
+        }
+    }
+    builtin_place_shards(shards, shard_count, out, error_indices, max_records);
+    if (started_count > 0) {
+        run.placed = true;
+        pthread_cond_broadcast(&run.changed);
+        pthread_mutex_unlock(&run.mutex);
+    }
+    for (unsigned int i = 0; i < shard_count; ++i) {
+        if (!started[i]) {
+            parse(&shards[i]);
+        }
+    }
+    for (unsigned int i = 1; i < shard_count; ++i) {
+        if (started[i]) {
+            pthread_join(threads[i], NULL);
+        }
+    }
+    if (has_attr) {
+        pthread_attr_destroy(&attr);
+    }
+    if (synchronized) {
+        pthread_cond_destroy(&run.changed);
+    }
+    if (has_mutex) {
+        pthread_mutex_destroy(&run.mutex);
+    }
+}
+
+#ifdef JS2C_ARENA
+// Give each shard a part of the arena, in proportion to its length.
+static inline void builtin_split_arena(builtin_shard_t *shards, unsigned int shard_count, size_t ndjson_len, char *arena, size_t arena_size) {
+    size_t start = 0;
+    for (unsigned int i = 0; i < shard_count; ++i) {
+        size_t size = arena_size - start;
+        if (i + 1 < shard_count && ndjson_len > 0) {
+            size = (size_t)((double)arena_size * (double)shards[i].length / (double)ndjson_len);
+            size = size < arena_size - start ? size : arena_size - start;
+        }
+        shards[i].arena = arena + start;
+        shards[i].arena_size = size;
+        start += size;
+    }
+}
+
+// How much of the arena the shards used, up to the end of the last allocation.
+static inline size_t builtin_merge_arenas(const builtin_shard_t *shards, unsigned int shard_count, const char *arena) {
+    size_t used = 0;
+    for (unsigned int i = 0; i < shard_count; ++i) {
+        if (shards[i].arena_used > 0) {
+            used = (size_t)(shards[i].arena - arena) + shards[i].arena_used;
+        }
+    }
+    return used;
+}
+#endif
+
+// Collect the error indices of the shards, in order. Returns the number of parsed records.
+static inline size_t builtin_merge_shards(
+    const builtin_shard_t *shards,
+    unsigned int shard_count,
+    const char *ndjson,
+    size_t ndjson_len,
+    size_t max_records,
+    size_t *error_indices,
+    size_t *error_count,
+    size_t *consumed_len
+) {
+    size_t record_count = 0;
+    size_t all_records = 0;
+    *error_count = 0;
+    *consumed_len = 0;
+    for (unsigned int i = 0; i < shard_count; ++i) {
+        all_records += shards[i].record_count;
+        if (shards[i].max_records == 0) {
+            continue;
+        }
+        // A shard's errors are stored at its record offset, which is never before the merged ones.
+        for (size_t j = 0; j < shards[i].error_count; ++j) {
+            error_indices[*error_count] = shards[i].error_indices[j] + shards[i].record_offset;
+            *error_count += 1;
+        }
+        record_count += shards[i].max_records;
+        *consumed_len = (size_t)(shards[i].start - ndjson) + shards[i].consumed_len;
+    }
+    // Like json_parse_*_many: trailing blank lines are only consumed if max_records was not reached.
+    if (all_records < max_records) {
+        *consumed_len = ndjson_len;
+    }
+    return record_count;
+}
+
+#endif /* JS2C_PTHREADS */
+
+#ifndef JS2C_DIRECT_PARSER
+
+static inline bool builtin_skip(parse_state_t *parse_state) {
+    /* The algorithm works, because of how .size behaves on JSMN tokens:
+     *   - Arrays have size = number of elements
+     *   - Objects have size = number of fields
+     *   - Object keys have a size of 1. This is important, because {"a": "b"} is 3 tokens this way:
+     *       - An object of size 1,
+     *       - A key of size 1
+     *       - A string of size 0.
+     *   - All other tokens are size 0.
+     */
+    uint32_t skip_tokens = 1;
+    while (skip_tokens > 0) {
+        skip_tokens += CURRENT_TOKEN(parse_state).size;
+        if (parse_state->current_token >= parse_state->max_token_num) {
+            /* Should never happen */
+            return true;
+        }
+        parse_state->current_token += 1;
+        skip_tokens -= 1;
+    }
+    return false;
+}
+
+/* Look for a key of the current object that lookup_key knows, on a copy of the parse state. If there
+ * is one, its index is in *key_index, and its value is the current token of scan. */
+static inline bool builtin_find_key(parse_state_t *scan, int (*lookup_key)(const char *string, int length), int *key_index) {
+    const uint64_t n = CURRENT_TOKEN(scan).size;
+    *key_index = -1;
+    scan->current_token += 1;
+    for (uint64_t i = 0; i < n; ++i) {
+        if (CURRENT_TOKEN(scan).size != 1) {
+            // A key without exactly one value: the object parsers reject it anyway.
+            return false;
+        }
+        const int index = lookup_key(CURRENT_STRING(scan), CURRENT_STRING_LENGTH(scan));
+        scan->current_token += 1;
+        if (index >= 0) {
+            *key_index = index;
+            return false;
+        }
+        if (builtin_skip(scan)) {
+            return true;
+        }
+    }
+    return false;
+}
+
+// An anyOf option matched on attempt, a copy of parse_state: continue after it.
+static inline void builtin_commit_attempt(parse_state_t *parse_state, const parse_state_t *attempt) {
+    parse_state->current_token = attempt->current_token;
+#ifdef JS2C_ARENA
+    parse_state->arena_used = attempt->arena_used;
+#endif
+}
+
+static inline void builtin_init_parse_state(
+    parse_state_t *parse_state,
+    jsmntok_t *token_buffer,
+    uint64_t token_buffer_size,
+    const char *json_string
+) {
+    parse_state->json_string = json_string;
+    parse_state->tokens = token_buffer;
+    parse_state->current_token = 0;
+    parse_state->max_token_num = token_buffer_size;
+    parse_state->current_key = "document root";
+    parse_state->inhibit_errors = false;
+}
+
+// token_num is the (final) result of jsmn_parse, position is the parser's position.
+static inline bool builtin_check_token_num(int token_num, unsigned int position) {
+    (void)position; // Only used by LOG_ERROR, which may be empty
+    if (token_num < 0) {
+        LOG_ERROR(position, "JSON syntax error: %s", jsmn_error_as_string(token_num));
+        return true;
+    }
+    if (token_num == 0) {
+        LOG_ERROR(position, "String did not contain any JSON tokens");
+        return true;
+    }
+    return false;
+}
+
+static inline bool builtin_parse_json_string(
+    parse_state_t *parse_state,
+    jsmntok_t *token_buffer,
+    uint64_t token_buffer_size,
+    const char *json_string,
+    size_t json_string_len
+) {
+    jsmn_parser parser = {0};
+
+    builtin_init_parse_state(parse_state, token_buffer, token_buffer_size, json_string);
+
+    jsmn_init(&parser);
+    int token_num = jsmn_parse(&parser, json_string, json_string_len, parse_state->tokens, token_buffer_size);
+    return builtin_check_token_num(token_num, parser.pos);
+}
+
+/* Tokenize the bytes appended to a streamed document since the last call. jsmn picks up where it
+ * left off, as long as the same parser and tokens are passed again, with the document extended.
+ * *token_num is only final once the whole document is there: until then, a JSMN_ERROR_PART is expected.
+ */
+static inline bool builtin_tokenize_more(
+    jsmn_parser *parser,
+    jsmntok_t *token_buffer,
+    uint64_t token_buffer_size,
+    const char *json_string,
+    size_t json_string_len,
+    int *token_num
+) {
+    *token_num = jsmn_parse(parser, json_string, json_string_len, token_buffer, token_buffer_size);
+    if (*token_num < 0 && *token_num != JSMN_ERROR_PART) {
+        LOG_ERROR(parser->pos, "JSON syntax error: %s", jsmn_error_as_string(*token_num));
+        return true;
+    }
+    return false;
+}
+
+#endif /* !JS2C_DIRECT_PARSER */
+
+#ifdef JS2C_RUNTIME_STATS
+/* The statistics of a runtime_stats parser. Like the hit counts, they are updated with relaxed atomics,
+ * since documents may be parsed on many threads at once. */
+typedef struct builtin_function_stats_s {
+    uint64_t calls;
+    uint64_t errors;            // Failed anyOf attempts included
+    uint64_t tokens;            // Consumed by the function, and the ones it called
+    uint64_t nanoseconds;       // Spent in the function, and the ones it called. Only with JS2C_RUNTIME_STATS_TIMING.
+} builtin_function_stats_t;
+
+typedef struct builtin_function_start_s {
+    uint64_t token_position;
+    uint64_t nanoseconds;
+} builtin_function_start_t;
+
+static uint64_t builtin_stats_skipped_tokens;   // In the values of unknown fields
+static uint64_t builtin_stats_failed_attempts;  // anyOf options tried on a value they did not match
+
+static inline void builtin_stats_add(uint64_t *counter, uint64_t value) {
+#if defined(__GNUC__)
+    __atomic_fetch_add(counter, value, __ATOMIC_RELAXED);
+#else
+    *counter += value;
+#endif
+}
+
+static inline uint64_t builtin_token_position(const parse_state_t *parse_state) {
+#ifdef JS2C_DIRECT_PARSER
+    return parse_state->token_num;
+#else
+    return parse_state->current_token;
+#endif
+}
+
+static inline uint64_t builtin_now_nanoseconds(void) {
+#ifdef JS2C_RUNTIME_STATS_TIMING
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (uint64_t)now.tv_sec * UINT64_C(1000000000) + (uint64_t)now.tv_nsec;
+#else
+    return 0;
+#endif
+}
+
+static inline builtin_function_start_t builtin_function_begin(const parse_state_t *parse_state) {
+    const builtin_function_start_t start = {builtin_token_position(parse_state), builtin_now_nanoseconds()};
+    return start;
+}
+
+// Adds a call that started at start to stats. Returns error, so it can be the parse function's result.
+static inline bool builtin_function_end(
+    builtin_function_stats_t *stats,
+    const parse_state_t *parse_state,
+    builtin_function_start_t start,
+    bool error
+) {
+#ifdef JS2C_RUNTIME_STATS_TIMING
+    builtin_stats_add(&stats->nanoseconds, builtin_now_nanoseconds() - start.nanoseconds);
+#endif
+    builtin_stats_add(&stats->calls, 1);
+    builtin_stats_add(&stats->errors, error);
+    const uint64_t token_position = builtin_token_position(parse_state);
+    // An error may leave the position anywhere, even before the start
+    if (token_position > start.token_position) {
+        builtin_stats_add(&stats->tokens, token_position - start.token_position);
+    }
+    return error;
+}
+
+// builtin_skip, for the value of an unknown field
+static inline bool builtin_skip_unknown(parse_state_t *parse_state) {
+    const uint64_t start = builtin_token_position(parse_state);
+    const bool error = builtin_skip(parse_state);
+    builtin_stats_add(&builtin_stats_skipped_tokens, builtin_token_position(parse_state) - start);
+    return error;
+}
+#endif /* JS2C_RUNTIME_STATS */
+
 #endif /* JS2C_BUILTINS_H */
@@ -24,13 +24,19 @@
 #
 
 import argparse
+import concurrent.futures
+import cProfile
+import json
 import os
 import sys
+from typing import Any
 
+from js2c.generation_cache import GenerationCache
 from js2c.schema import load_schema
 from js2c.codegen.base import SchemaError
 from js2c.codegen.root import RootGenerator
-from js2c.settings import Settings
+from js2c.profiling import Profiler
+from js2c.settings import Settings, snake_to_camel_case
 
 HELP = """
 Create a JSON parser in C based on a json schema
@@ -45,25 +51,30 @@ The settings in the schema take precedence.
 """.strip()
 
 
-def parse_args() -> argparse.Namespace:
+def argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description=HELP,
         epilog=HELP_EPILOG,
         formatter_class=argparse.RawTextHelpFormatter,
+        exit_on_error=False,
     )
+    # Optional only for --batch, parse_args checks them
     parser.add_argument(
         "schema_file",
         type=str,
+        nargs="?",
         help="Filename of the JSON schema to use. Schema version 7 is supported.",
     )
     parser.add_argument(
         "c_file",
         type=str,
+        nargs="?",
         help="Filename of the generated parser .c file",
     )
     parser.add_argument(
         "h_file",
         type=str,
+        nargs="?",
         help="Filename of the generated parser .h file",
     )
     parser.add_argument(
@@ -75,30 +86,224 @@ def parse_args() -> argparse.Namespace:
         help="Files or directories that a schema is allowed to reference across files. "
              "The directory of the schema itself is always allowed.",
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the wall time and the memory allocated by each phase of the generation to stderr. \n"
+             "Tracing the allocations slows the generation down.",
+    )
+    parser.add_argument(
+        "--profile-generators",
+        action="store_true",
+        help="Like --profile, but also print the number of generators of each class.",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        type=str,
+        metavar="file",
+        default=None,
+        help="Write the cProfile statistics of the generation to this file, e.g. for 'python -m pstats'.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        metavar="dir",
+        default=None,
+        help="Keep the generated files in this directory, and only copy them from there if the generator, its \n"
+             "arguments, the schema and every file it loads are the same as when they were generated.",
+    )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        metavar="manifest",
+        default=None,
+        help="Generate every parser listed in this JSON file, instead of the ones in the arguments. It is a list of \n"
+             "objects with a \"schema_file\", \"c_file\" and \"h_file\", and optionally \"settings\": more arguments, \n"
+             "in snake or camel case like in js2cSettings. The rest of the command line applies to every entry.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        metavar="n",
+        default=None,
+        help="The number of processes generating the parsers of a --batch. The number of CPUs by default.",
+    )
     Settings.fill_argparse(parser)
-    return parser.parse_args()
+    return parser
 
 
-def main(args: argparse.Namespace) -> None:
+def parse_args() -> argparse.Namespace:
+    parser = argument_parser()
+    try:
+        args = parser.parse_args()
+    except argparse.ArgumentError as e:
+        parser.error(str(e))
+    if args.batch is None and args.h_file is None:
+        parser.error("the following arguments are required: schema_file, c_file, h_file")
+    if args.batch is not None and args.schema_file is not None:
+        parser.error("--batch takes the schema and the generated files from the manifest")
+    if args.batch is not None and (args.profile or args.profile_generators or args.profile_dump):
+        parser.error("--batch can't be profiled, profile its entries one by one instead")
+    return args
+
+
+def generate(args: argparse.Namespace, profiler: Profiler) -> None:
     # Kept out of js2cSettings on purpose: an untrusted schema must not be able to widen its own allowlist.
     authorized_paths = list(args.authorized_paths or [])
     authorized_paths.append(os.path.dirname(os.path.abspath(args.schema_file)))
-    try:
-        schema = load_schema(args.schema_file, authorized_paths)
-    except (ValueError, OSError) as e:
-        print(e, file=sys.stderr)
-        sys.exit(1)
+    cache = None
+    if args.cache_dir:
+        with profiler.phase("restore_from_cache"):
+            arguments = {field.name: getattr(args, field.name) for field in Settings.FIELDS}
+            arguments["authorized_paths"] = authorized_paths
+            cache = GenerationCache(args.cache_dir, args.schema_file, [args.c_file, args.h_file], arguments)
+            if cache.restore():
+                return
+    loaded_files: set[str] = set()
+    schema = load_schema(args.schema_file, authorized_paths, profiler, loaded_files)
     settings = Settings(vars(args), schema.get('js2cSettings', {}))
-    try:
-        root_generator = RootGenerator(schema, settings)
+    with profiler.phase("construct_generators"):
+        root_generator = RootGenerator(schema, settings, profiler)
+    if args.profile_generators:
+        profiler.count_generators()
+    with profiler.phase("generate_parser_h"):
         h_file = root_generator.generate_parser_h(args.h_file)
+    with profiler.phase("generate_parser_c"):
         c_file = root_generator.generate_parser_c(args.c_file, os.path.basename(args.h_file))
-    except SchemaError as e:
+    # Only touch the output files once both generated cleanly, so a failure leaves them untouched.
+    with profiler.phase("save_to_file"):
+        h_file.save_to_file()
+        c_file.save_to_file()
+    if cache:
+        settings_files = (
+            settings.h_prefix_file, settings.h_postfix_file, settings.c_prefix_file, settings.c_postfix_file, settings.hit_profile
+        )
+        with profiler.phase("store_in_cache"):
+            try:
+                cache.store([args.schema_file, *loaded_files, *(f.name for f in settings_files if f is not None)])
+            except OSError as e:
+                # The files are generated already, a cache that can't be written only makes the next run slower.
+                print(f"Could not store the generated files in the cache: {e}", file=sys.stderr)
+
+
+# The errors of a single generation, reported without a traceback
+GENERATION_ERRORS = (SchemaError, ValueError, OSError, argparse.ArgumentError, argparse.ArgumentTypeError)
+
+# The arguments that apply to every entry of a batch, and that the entries can set
+BATCH_ARGUMENT_NAMES = [field.name for field in Settings.FIELDS] + ["authorized_paths", "cache_dir"]
+BATCH_ARGUMENTS = {alias: name for name in BATCH_ARGUMENT_NAMES for alias in (name, snake_to_camel_case(name))}
+
+
+def batch_command_line(arguments: dict[str, Any]) -> list[str]:
+    """ The command line arguments of a batch entry's settings, or of the batch's own arguments """
+    command_line = []
+    for name, value in arguments.items():
+        if name not in BATCH_ARGUMENTS:
+            raise ValueError(f"Unknown setting '{name}'")
+        if value is None:
+            continue
+        flag = "--" + BATCH_ARGUMENTS[name].replace("_", "-")
+        if BATCH_ARGUMENTS[name] == "authorized_paths":
+            if not isinstance(value, list):
+                raise ValueError(f"Setting '{name}' must be a list")
+            command_line += [flag, *(str(v) for v in value)]
+        else:
+            # Files are opened by argparse, each entry opens its own.
+            command_line += [flag, str(getattr(value, "name", value))]
+    return command_line
+
+
+def generate_batch_entry(command_line: list[str]) -> str | None:
+    """ Generate the parser of a batch entry, in a worker process. Returns the error, if there was one. """
+    try:
+        generate(argument_parser().parse_args(command_line), Profiler())
+    except GENERATION_ERRORS as e:
+        return str(e)
+    except SystemExit:
+        # argparse printed why already
+        return "Invalid settings"
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # A bug hit by one entry is reported as its error, instead of aborting the whole batch
+        return f"Unexpected error: {e!r}"
+    return None
+
+
+def read_batch_manifest(args: argparse.Namespace) -> tuple[list[Any], list[list[str] | None], list[str | None]]:
+    """ The manifest entries, with the command line of each, or None and the reason the entry is invalid """
+    with open(args.batch, encoding="utf-8") as manifest_file:
+        entries = json.load(manifest_file)
+    if not isinstance(entries, list):
+        raise ValueError("The manifest must be a list of entries")
+    common_command_line = batch_command_line({name: getattr(args, name) for name in BATCH_ARGUMENT_NAMES})
+    command_lines: list[list[str] | None] = []
+    errors: list[str | None] = []
+    for entry in entries:
+        try:
+            files = [entry["schema_file"], entry["c_file"], entry["h_file"]]
+            command_lines.append(files + common_command_line + batch_command_line(entry.get("settings", {})))
+            errors.append(None)
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            command_lines.append(None)
+            errors.append(f"Invalid manifest entry: {e!r}")
+    return entries, command_lines, errors
+
+
+def generate_batch(command_lines: list[list[str]], jobs: int) -> list[str | None]:
+    """ Generate the parsers of the command lines, jobs at a time. Returns the error of each, if there was one. """
+    if jobs == 1:
+        return [generate_batch_entry(command_line) for command_line in command_lines]
+    # The workers are reused, and so is the schema files they loaded: a file referenced by many schemas is
+    # only loaded once per worker.
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        return list(executor.map(generate_batch_entry, command_lines))
+
+
+def run_batch(args: argparse.Namespace) -> bool:
+    """ Returns whether every entry was generated """
+    entries, command_lines, errors = read_batch_manifest(args)
+    to_generate = [(i, command_line) for i, command_line in enumerate(command_lines) if command_line is not None]
+    results = generate_batch([command_line for _, command_line in to_generate], args.jobs or os.cpu_count() or 1)
+    for (i, _), error in zip(to_generate, results):
+        errors[i] = error
+
+    for entry, error in zip(entries, errors):
+        if error is not None:
+            name = entry.get("schema_file", entry) if isinstance(entry, dict) else entry
+            print(f"{name}: {error}", file=sys.stderr)
+    failed = sum(error is not None for error in errors)
+    if failed:
+        print(f"{failed} of {len(entries)} parsers could not be generated", file=sys.stderr)
+    return not failed
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.batch is not None:
+        try:
+            succeeded = run_batch(args)
+        except (ValueError, OSError) as e:
+            print(f"Could not read the manifest: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not succeeded:
+            sys.exit(1)
+        return
+
+    profiler = Profiler(enabled=args.profile or args.profile_generators)
+    c_profile = cProfile.Profile() if args.profile_dump else None
+    profiler.start()
+    if c_profile:
+        c_profile.enable()
+    try:
+        generate(args, profiler)
+    except GENERATION_ERRORS as e:
         print(e, file=sys.stderr)
         sys.exit(1)
-    # Only touch the output files once both generated cleanly, so a failure leaves them untouched.
-    h_file.save_to_file()
-    c_file.save_to_file()
+    finally:
+        if c_profile:
+            c_profile.disable()
+            c_profile.dump_stats(args.profile_dump)
+        profiler.stop()
+    if profiler.enabled:
+        profiler.print_report(sys.stderr)
 
 
 if __name__ == "__main__":
@@ -121,6 +121,32 @@ int main(int argc, char** argv){
         8
     );
 
+    check_error(
+        "{\"num\": 9223372036854775808}",
+        "Signed integer literal out of range in 'num': 9223372036854775808",
+        8
+    );
+    check_error(
+        "{\"unsigned_num\": 18446744073709551616}",
+        "Unsigned integer literal out of range in 'unsigned_num': 18446744073709551616",
+        17
+    );
+    check_error(
+        "{\"unsigned_num\": 18446744073709551616e}",
+        "Invalid unsigned integer literal in 'unsigned_num': 18446744073709551616e",
+        17
+    );
+    check_error(
+        "{\"numeric_string\": \"\"}",
+        "Invalid unsigned integer literal in 'numeric_string': ",
+        20
+    );
+    check_error(
+        "{\"numeric_string\": \" 12\"}",
+        "Invalid unsigned integer literal in 'numeric_string':  12",
+        20
+    );
+
     check_error(
         "{\"parsed_int\": 7}",
         "Error parsing 'parsed_int', value=\"7\": Custom int error",
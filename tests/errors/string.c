@@ -18,5 +18,15 @@ int main(int argc, char** argv){
         "String too short in 'name'. Length: 3. Minimum length: 4.",
         10
     );
+    check_error(
+        "{\"ref\": \"12345\"}",
+        "String too large in 'ref'. Length: 5. Maximum length: 4.",
+        9
+    );
+    check_error(
+        "{\"ref\": 12}",
+        "Unexpected token in 'ref': PRIMITIVE instead of STRING",
+        8
+    );
     return 0;
 }
@@ -0,0 +1,40 @@
+#include "unescaped_string.parser.h"
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    check_error(
+        "{\"name\": \"\\u00e9\\u00e9\\u00e9\\u00e9a\"}",
+        "String too large in 'name'. Length: 9. Maximum length: 8.",
+        10
+    );
+    check_error(
+        "{\"name\": \"\\n\\n\\n\"}",
+        "String too short in 'name'. Length: 3. Minimum length: 4.",
+        10
+    );
+    check_error(
+        "{\"name\": \"ab\\ud83dcd\"}",
+        "Invalid escape sequence in 'name': \\ud83dcd",
+        12
+    );
+    check_error(
+        "{\"name\": \"ab\\ude00\\ud83d\"}",
+        "Invalid escape sequence in 'name': \\ude00\\ud83d",
+        12
+    );
+    check_error(
+        "{\"name\": \"ab\\ud83d\\u0041\"}",
+        "Invalid escape sequence in 'name': \\ud83d\\u0041",
+        12
+    );
+    // Truncated, overlong, an encoded surrogate and above U+10FFFF
+    check_error("{\"name\": \"abc\xc3\"}", "Invalid UTF-8 in 'name'", 13);
+    check_error("{\"name\": \"abc\xc3""a\"}", "Invalid UTF-8 in 'name'", 13);
+    check_error("{\"name\": \"abc\xc0\xaf\"}", "Invalid UTF-8 in 'name'", 13);
+    check_error("{\"name\": \"\xe0\x80\xaf\"}", "Invalid UTF-8 in 'name'", 10);
+    check_error("{\"name\": \"\xed\xa0\x80\"}", "Invalid UTF-8 in 'name'", 10);
+    check_error("{\"name\": \"\xf4\x90\x80\x80\"}", "Invalid UTF-8 in 'name'", 10);
+    check_error("{\"name\": \"a\x80""bcd\"}", "Invalid UTF-8 in 'name'", 11);
+    return 0;
+}
@@ -0,0 +1,91 @@
+#include "serialize.parser.h"
+
+#include <assert.h>
+#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+static void check_serialized(double value, const char *expected) {
+    char buffer[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    assert(!json_serialize_root(&value, buffer, sizeof(buffer), &length));
+    if (strcmp(buffer, expected) || length != strlen(expected)) {
+        fprintf(stderr, "Serialized %.17g as %s instead of %s\n", value, buffer, expected);
+        assert(0);
+    }
+}
+
+/* Serializing and parsing back must give the same bits */
+static void check_round_trip(double value) {
+    char buffer[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    assert(!json_serialize_root(&value, buffer, sizeof(buffer), &length));
+    assert(length == strlen(buffer));
+    const double parsed = strtod(buffer, NULL);
+    if (memcmp(&parsed, &value, sizeof(value))) {
+        fprintf(stderr, "%.17g was serialized as %s, which reads back as %.17g\n", value, buffer, parsed);
+        assert(0);
+    }
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    check_serialized(0.0, "0");
+    check_serialized(-0.0, "-0");
+    check_serialized(1.0, "1");
+    check_serialized(-123.0, "-123");
+    check_serialized(0.1, "0.1");
+    check_serialized(0.3, "0.3");
+    check_serialized(123.456, "123.456");
+    check_serialized(0.001234, "0.001234");
+    check_serialized(1.5e-7, "1.5e-7");
+    check_serialized(1e21, "1e21");
+    check_serialized(1e100, "1e100");
+    check_serialized(-4.5e-100, "-4.5e-100");
+    check_serialized(123456789012345678.0, "123456789012345680");
+    check_serialized(5e-324, "5e-324");
+    check_serialized(1.7976931348623157e308, "1.7976931348623157e308");
+    check_serialized(-2.2250738585072014e-308, "-2.2250738585072014e-308");
+
+    // Infinities and NaN have no JSON
+    char buffer[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    double value = INFINITY;
+    assert(json_serialize_root(&value, buffer, sizeof(buffer), &length));
+    value = NAN;
+    assert(json_serialize_root(&value, buffer, sizeof(buffer), &length));
+
+    // The output must fit with its NUL
+    value = 0.125;
+    assert(json_serialize_root(&value, buffer, 5, &length));
+    assert(!json_serialize_root(&value, buffer, 6, &length));
+    assert(length == 5 && !strcmp(buffer, "0.125"));
+
+    // Parsed back by the generated parser too. A number at the top level needs a delimiter after it.
+    char json[JSON_MAX_SERIALIZED_SIZE_ROOT + 1];
+    double parsed = 0;
+    value = 6.02214076e23;
+    assert(!json_serialize_root(&value, buffer, sizeof(buffer), &length));
+    snprintf(json, sizeof(json), "%s ", buffer);
+    assert(!json_parse_root(json, &parsed) && parsed == value);
+
+    // Random bit patterns cover every exponent, subnormals included
+    uint64_t state = 0x9E3779B97F4A7C15ULL;
+    for (int i = 0; i < 1000000; ++i) {
+        state ^= state << 13;
+        state ^= state >> 7;
+        state ^= state << 17;
+        memcpy(&value, &state, sizeof(value));
+        if (isfinite(value)) {
+            check_round_trip(value);
+        }
+    }
+    // And short decimals, the usual case
+    for (int i = -100000; i < 100000; ++i) {
+        check_round_trip(i / 1000.0);
+        check_round_trip(i * 1e-9);
+    }
+    return 0;
+}
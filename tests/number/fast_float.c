@@ -0,0 +1,63 @@
+#include "fast_float.parser.h"
+
+#include <assert.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+/* The result must be bit for bit what strtod gives */
+static void check_same_as_strtod(const char *number) {
+    char json[64];
+    snprintf(json, sizeof(json), "%s ", number);
+    double parsed = 1.0;
+    const double expected = strtod(number, NULL);
+    if (json_parse_root(json, &parsed) || memcmp(&parsed, &expected, sizeof(parsed))) {
+        printf("Mismatch for %s: %.17g instead of %.17g\n", number, parsed, expected);
+        assert(0);
+    }
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    const char *numbers[] = {
+        "0", "-0", "1", "-1", "0.1", "0.2", "0.3", "1.5", "123.456", "-987.654321", "3.141592653589793",
+        "1e22", "1e23", "1e-22", "1e-23", "9007199254740992", "9007199254740993", "9007199254740995",
+        "1.7976931348623157e308", "1.7976931348623159e308", "1e309", "-1e400",
+        "2.2250738585072014e-308", "2.2250738585072011e-308", "4.9e-324", "2.4e-324", "1e-400",
+        "0.000000000000000000000000000000000000000000001", "00012.5000", "1E5", "1e+5", "1.e3", "-.5",
+        "12345678901234567890", "1234567890123456789", "3.14159265358979323846264338327950288",
+        "0.30000000000000000000000000000000000001", "7.2057594037927933e16", "1e00000000000000000000005",
+    };
+    for (size_t i = 0; i < sizeof(numbers) / sizeof(numbers[0]); ++i) {
+        check_same_as_strtod(numbers[i]);
+    }
+
+    /* Random doubles, printed in a few ways */
+    uint64_t state = 0x123456789ABCDEFULL;
+    for (int i = 0; i < 100000; ++i) {
+        state = state * 6364136223846793005ULL + 1442695040888963407ULL;
+        uint64_t bits = state ^ (state >> 29);
+        double value;
+        memcpy(&value, &bits, sizeof(value));
+        if (value != value || value - value != 0) {
+            continue; // NaN or infinity
+        }
+        char number[40];
+        const char *formats[] = {"%.17g", "%.15g", "%.6g", "%.3e"};
+        snprintf(number, sizeof(number), formats[i % 4], value);
+        check_same_as_strtod(number);
+        /* Telemetry-like values, with a few decimals */
+        snprintf(number, sizeof(number), "%.6f", (double)(int64_t)(state >> 40) / 1000.0);
+        check_same_as_strtod(number);
+    }
+
+    double parsed;
+    assert(json_parse_root("1.5e ", &parsed));
+    assert(json_parse_root("1e+ ", &parsed));
+    assert(json_parse_root("- ", &parsed));
+    assert(json_parse_root("0x10 ", &parsed));
+    assert(json_parse_root("1.2.3 ", &parsed));
+    assert(json_parse_root("true ", &parsed));
+    return 0;
+}
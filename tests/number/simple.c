@@ -18,5 +18,26 @@ int main(int argc, char** argv){
 
     assert(!json_parse_root("-9223372036854775807 ", &the_num));
     assert(the_num == -9223372036854775807LL);
+
+    assert(!json_parse_root("-9223372036854775808 ", &the_num));
+    assert(the_num == INT64_MIN);
+
+    /* Long runs of digits, and leading zeros, which don't count towards overflow */
+    assert(!json_parse_root("1234567890123456789 ", &the_num));
+    assert(the_num == 1234567890123456789LL);
+    assert(!json_parse_root("-12345678901234567 ", &the_num));
+    assert(the_num == -12345678901234567LL);
+    assert(!json_parse_root("00000000000000000000000042 ", &the_num));
+    assert(the_num == 42);
+    assert(!json_parse_root("0 ", &the_num));
+    assert(the_num == 0);
+
+    /* Too large, or not an integer. A string of digits stops being a digit string anywhere. */
+    assert(json_parse_root("9223372036854775808 ", &the_num));
+    assert(json_parse_root("-9223372036854775809 ", &the_num));
+    assert(json_parse_root("123456789012345678901234567890 ", &the_num));
+    assert(json_parse_root("1234567x ", &the_num));
+    assert(json_parse_root("12345678901234x6 ", &the_num));
+    assert(json_parse_root("- ", &the_num));
     return 0;
 }
@@ -0,0 +1,41 @@
+#include "key_lookup.parser.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <assert.h>
+
+
+const char* data = "{ \
+    \"walue_1\": 11, \"value_2\": 10, \"value_1\": 9, \
+    \"bacd\": 8, \"abdc\": 7, \"abcd\": 6, \
+    \"xbc\": 5, \"abd\": 4, \"abc\": 3, \
+    \"b\": 2, \"a\": 1 \
+}";
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+    assert(!json_parse_root(data, &root));
+    assert(root.a == 1);
+    assert(root.b == 2);
+    assert(root.abc == 3);
+    assert(root.abd == 4);
+    assert(root.xbc == 5);
+    assert(root.abcd == 6);
+    assert(root.abdc == 7);
+    assert(root.bacd == 8);
+    assert(root.value_1 == 9);
+    assert(root.value_2 == 10);
+    assert(root.walue_1 == 11);
+
+    /* Same length and distinguishing bytes as a real key, but not a real key */
+    assert(json_parse_root("{\"xbd\": 1}", &root));
+    assert(json_parse_root("{\"abcc\": 1}", &root));
+    assert(json_parse_root("{\"value_3\": 1}", &root));
+    assert(json_parse_root("{\"valuf_1\": 1}", &root));
+    assert(json_parse_root("{\"c\": 1}", &root));
+    assert(json_parse_root("{\"\": 1}", &root));
+    assert(json_parse_root("{\"ab\": 1}", &root));
+    return 0;
+}
@@ -0,0 +1,64 @@
+#include "wide.parser.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <assert.h>
+
+/* Every third field is required, the rest have a default of 1000 + their index. */
+static void fill_required(char *data, size_t size, int skipped_field, int duplicated_field){
+    int pos = snprintf(data, size, "{");
+    for (int i = 0; i < 70; i += 3) {
+        if (i == skipped_field) {
+            continue;
+        }
+        pos += snprintf(data + pos, size - pos, "%s\"field_%i\": %i", pos > 1 ? ", " : "", i, i);
+    }
+    if (duplicated_field >= 0) {
+        pos += snprintf(data + pos, size - pos, ", \"field_%i\": 1", duplicated_field);
+    }
+    snprintf(data + pos, size - pos, "}");
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    char data[2048];
+    root_t root = {};
+
+    fill_required(data, sizeof(data), -1, -1);
+    assert(!json_parse_root(data, &root));
+    assert(root.field_0 == 0);
+    assert(root.field_1 == 1001);
+    assert(root.field_63 == 63);
+    assert(root.field_64 == 1064);
+    assert(root.field_66 == 66);
+    assert(root.field_68 == 1068);
+    assert(root.field_69 == 69);
+
+    assert(!json_parse_root(
+        "{\"field_0\": 0, \"field_3\": 3, \"field_6\": 6, \"field_9\": 9, \"field_12\": 12, \"field_15\": 15,"
+        " \"field_18\": 18, \"field_21\": 21, \"field_24\": 24, \"field_27\": 27, \"field_30\": 30,"
+        " \"field_33\": 33, \"field_36\": 36, \"field_39\": 39, \"field_42\": 42, \"field_45\": 45,"
+        " \"field_48\": 48, \"field_51\": 51, \"field_54\": 54, \"field_57\": 57, \"field_60\": 60,"
+        " \"field_63\": 63, \"field_66\": 66, \"field_69\": 69, \"field_65\": 5, \"field_2\": 7}",
+        &root));
+    assert(root.field_2 == 7);
+    assert(root.field_65 == 5);
+    assert(root.field_64 == 1064);
+    assert(root.field_67 == 1067);
+
+    /* Missing required fields, in the first and in the second bitset word */
+    fill_required(data, sizeof(data), 3, -1);
+    assert(json_parse_root(data, &root));
+    fill_required(data, sizeof(data), 66, -1);
+    assert(json_parse_root(data, &root));
+    fill_required(data, sizeof(data), 69, -1);
+    assert(json_parse_root(data, &root));
+
+    /* Duplicates, in the first and in the second bitset word */
+    fill_required(data, sizeof(data), -1, 63);
+    assert(json_parse_root(data, &root));
+    fill_required(data, sizeof(data), -1, 66);
+    assert(json_parse_root(data, &root));
+    return 0;
+}
@@ -0,0 +1,124 @@
+#include "arena.parser.h"
+
+#include <assert.h>
+#include <stdio.h>
+#include <string.h>
+
+static char arena_buffer[4096];
+
+static bool in_arena(const void *pointer) {
+    return (const char *)pointer >= arena_buffer && (const char *)pointer < arena_buffer + sizeof(arena_buffer);
+}
+
+static const char *document =
+    "{\"name\": \"arena\", \"tags\": ["
+    "{\"key\": \"first\", \"values\": [1, 2, 3]},"
+    "{\"key\": \"second\"}"
+    "], \"value\": [\"a\", \"bc\"]}";
+
+static void check_document(const root_t *root) {
+    assert(root->name.length == 5);
+    assert(!strcmp(root->name.chars, "arena"));
+    assert(in_arena(root->name.chars));
+    // Defaults are not in the arena
+    assert(!strcmp(root->comment.chars, "none"));
+    assert(root->comment.length == 4);
+    assert(root->tags.n == 2);
+    assert(in_arena(root->tags.items));
+    assert(!strcmp(root->tags.items[0].key.chars, "first"));
+    assert(root->tags.items[0].values.n == 3);
+    assert(root->tags.items[0].values.items[2] == 3);
+    assert(!strcmp(root->tags.items[1].key.chars, "second"));
+    assert(root->tags.items[1].values.n == 0);
+    assert(root->value.type == ROOT_VALUE_OPTION_0);
+    assert(root->value.option_0.n == 2);
+    assert(!strcmp(root->value.option_0.items[1].chars, "bc"));
+}
+
+#define RECORD_NUM 3
+
+static void check_many(void) {
+    const char *ndjson =
+        "{\"name\": \"one\", \"tags\": [], \"value\": [1]}\n"
+        "{\"name\": \"\", \"tags\": [], \"value\": [2]}\n"
+        "{\"name\": \"three\", \"tags\": [{\"key\": \"k\"}], \"value\": [\"x\"]}\n";
+    root_t records[RECORD_NUM];
+    size_t error_indices[RECORD_NUM];
+    size_t error_count;
+    size_t consumed_len;
+    json_arena_root_t arena = { arena_buffer, sizeof(arena_buffer), 0 };
+    assert(json_parse_root_many(ndjson, strlen(ndjson), &arena, records, RECORD_NUM, error_indices, &error_count, &consumed_len) == 3);
+    assert(error_count == 1 && error_indices[0] == 1);
+    assert(!strcmp(records[0].name.chars, "one"));
+    assert(records[0].value.type == ROOT_VALUE_OPTION_1 && records[0].value.option_1.items[0] == 1);
+    assert(!strcmp(records[2].name.chars, "three"));
+    assert(!strcmp(records[2].tags.items[0].key.chars, "k"));
+    assert(!strcmp(records[2].value.option_0.items[0].chars, "x"));
+
+#ifdef JS2C_PTHREADS
+    root_t parallel_records[RECORD_NUM];
+    json_arena_root_t parallel_arena = { arena_buffer + 2048, 2048, 0 };
+    assert(json_parse_root_many_parallel(
+        ndjson, strlen(ndjson), &parallel_arena, parallel_records, RECORD_NUM, error_indices, &error_count, &consumed_len, 3) == 3);
+    assert(error_count == 1 && error_indices[0] == 1);
+    assert(!strcmp(parallel_records[0].name.chars, "one"));
+    assert(!strcmp(parallel_records[2].tags.items[0].key.chars, "k"));
+    assert(parallel_arena.used > 0 && parallel_arena.used <= 2048);
+#endif
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    json_arena_root_t arena = { arena_buffer, sizeof(arena_buffer), 0 };
+    root_t root;
+    assert(!json_parse_root(document, &arena, &root));
+    check_document(&root);
+    const size_t used = arena.used;
+    assert(used > 0 && used < 256);
+
+    // The arena grows with every document, until it is reset
+    root_t second;
+    assert(!json_parse_root(document, &arena, &second));
+    check_document(&second);
+    check_document(&root);
+    assert(arena.used > used);
+    arena.used = 0;
+    assert(!json_parse_root(document, &arena, &root));
+    assert(arena.used == used);
+
+    // A failed parse does not use the arena
+    arena.used = 0;
+    assert(json_parse_root("{\"name\": \"x\", \"tags\": [{\"key\": \"k\"}], \"value\": [true]}", &arena, &root));
+    assert(arena.used == 0);
+
+    // Too small: anything that does not fit fails the parse
+    for (size_t size = 0; size < used; ++size) {
+        json_arena_root_t small_arena = { arena_buffer, size, 0 };
+        assert(json_parse_root(document, &small_arena, &root));
+        assert(small_arena.used == 0);
+    }
+    json_arena_root_t exact_arena = { arena_buffer, used, 0 };
+    assert(!json_parse_root(document, &exact_arena, &root));
+    check_document(&root);
+
+    // An anyOf only keeps what the matching option allocated: the failed string option allocates nothing
+    arena.used = 0;
+    assert(!json_parse_root("{\"name\": \"x\", \"tags\": [], \"value\": [1, 2, 3, 4]}", &arena, &root));
+    assert(root.value.type == ROOT_VALUE_OPTION_1);
+    assert(root.value.option_1.items[3] == 4);
+    const size_t int_array_used = arena.used;
+    assert(int_array_used < 4 * sizeof(root_value_option_0_item_t));
+    arena.used = 0;
+    assert(!json_parse_root("{\"name\": \"x\", \"tags\": [], \"value\": [\"a\", \"b\", \"c\", \"d\"]}", &arena, &root));
+    assert(arena.used > int_array_used);
+
+    // Still limited by maxItems and maxLength
+    arena.used = 0;
+    assert(json_parse_root("{\"name\": \"x\", \"tags\": [], \"value\": [1, 2, 3, 4, 5]}", &arena, &root));
+    assert(json_parse_root("{\"name\": \"x\", \"tags\": [], \"value\": [\"0123456789abcdefg\"]}", &arena, &root));
+    assert(arena.used == 0);
+
+    check_many();
+    return 0;
+}
@@ -0,0 +1,14 @@
+#include "batch.parser.h"
+
+#include <assert.h>
+#include <string.h>
+
+int main(int argc, char **argv) {
+    (void)argc;
+    (void)argv;
+    root_t data;
+    /* The settings of the manifest entry were applied */
+    assert(!json_parse_root("{\"name\": \"caf\\u00e9\"}", &data));
+    assert(strcmp(data.name, "caf\xc3\xa9") == 0);
+    return 0;
+}
@@ -0,0 +1,36 @@
+#include "direct_backend.parser.h"
+
+#include <assert.h>
+#include <string.h>
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+    assert(!json_parse_root("{\"name\": \"potato\", \"values\": [1, 2, 3]}", &root));
+    assert(!strcmp(root.name, "potato"));
+    assert(root.values.n == 3);
+    assert(root.values.items[2] == 3);
+
+    /* Unknown fields are lexed through, however they are nested */
+    assert(!json_parse_root("{\"x\": {\"a\": [[1], {\"b\": \"]}\"}]}, \"name\": \"a\", \"values\": []}", &root));
+    assert(!strcmp(root.name, "a"));
+    assert(root.values.n == 0);
+    assert(json_parse_root("{\"x\": {\"a\": [[1], {\"b\": \"]}\"]]}, \"name\": \"a\", \"values\": []}", &root));
+
+    /* Only whitespace may follow the root value */
+    assert(!json_parse_root("{\"name\": \"a\", \"values\": []} \n", &root));
+    assert(json_parse_root("{\"name\": \"a\", \"values\": []} x", &root));
+    assert(json_parse_root("{\"name\": \"a\", \"values\": []} {}", &root));
+
+    /* A number can end the document */
+    assert(!json_parse_root("{\"name\": \"a\", \"values\": [7]}", &root));
+    assert(root.values.items[0] == 7);
+
+    /* Syntax errors */
+    assert(json_parse_root("{\"name\": \"a\", \"values\": [1 2]}", &root));
+    assert(json_parse_root("{\"name\": \"a\", \"values\": [1, 2}", &root));
+    assert(json_parse_root("{\"name\": \"a\\q\", \"values\": []}", &root));
+    assert(json_parse_root("{\"name\": \"a\", \"values\": [1, 2]", &root));
+    return 0;
+}
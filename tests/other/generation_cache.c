@@ -0,0 +1,14 @@
+#include "generation_cache.parser.h"
+
+#include <assert.h>
+
+/* The Makefile lowered the maximum in the referenced file before the last generation */
+int main(int argc, char **argv) {
+    (void)argc;
+    (void)argv;
+    root_t data;
+    assert(!json_parse_root("{\"size\": 100}", &data));
+    assert(data.size == 100);
+    assert(json_parse_root("{\"size\": 101}", &data));
+    return 0;
+}
@@ -0,0 +1,42 @@
+#include "hit_counts.parser.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <assert.h>
+
+static const char expected_counts[] =
+    "{\n"
+    "  \"fields\": {\n"
+    "    \"\": {\"id\": 3, \"price\": 3, \"side\": 3, \"note\": 1, \"value\": 3}\n"
+    "  },\n"
+    "  \"labels\": {\n"
+    "    \".properties.side\": {\"buy\": 1, \"sell\": 2}\n"
+    "  },\n"
+    "  \"options\": {\n"
+    "    \".properties.value\": {\"0\": 1, \"1\": 2}\n"
+    "  }\n"
+    "}\n";
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+
+    assert(!json_parse_root("{\"id\": 1, \"price\": 2.5, \"side\": \"sell\", \"value\": true}", &root));
+    assert(!json_parse_root("{\"id\": 2, \"price\": 3.5, \"side\": \"sell\", \"value\": false, \"note\": \"x\"}", &root));
+    assert(!json_parse_root("{\"value\": 7, \"side\": \"buy\", \"price\": 1, \"id\": 3}", &root));
+    assert(root.value.type == ROOT_VALUE_OPTION_INT64 && root.value.option_int64 == 7);
+
+    /* The counts are saved in the format --hit-profile reads */
+    assert(!json_hit_counts_root_save("other/hit_counts.hits"));
+    char counts[1024] = {};
+    FILE *file = fopen("other/hit_counts.hits", "r");
+    assert(file != NULL);
+    size_t length = fread(counts, 1, sizeof(counts) - 1, file);
+    fclose(file);
+    assert(length == strlen(expected_counts));
+    assert(!strcmp(counts, expected_counts));
+
+    assert(json_hit_counts_root_save("other/no such directory/hit_counts.hits"));
+    return 0;
+}
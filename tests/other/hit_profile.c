@@ -0,0 +1,29 @@
+#include "hit_profile.parser.h"
+
+#include <string.h>
+#include <assert.h>
+
+/* The hit profile changes the order things are checked in, not what is parsed. */
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+
+    assert(!json_parse_root("{\"id\": 1, \"price\": 2.5, \"side\": \"sell\", \"value\": true, \"amount\": 3}", &root));
+    assert(root.id == 1 && root.price == 2.5 && root.side == ROOT_SIDE_SELL);
+    assert(root.value.type == ROOT_VALUE_OPTION_BOOL && root.value.option_bool);
+    /* The options of amount can both match an integer, so they are still tried in order: the first one wins. */
+    assert(root.amount.type == ROOT_AMOUNT_OPTION_INT64 && root.amount.option_int64 == 3);
+
+    assert(!json_parse_root(
+        "{\"prize\": 1.5, \"name\": \"x\", \"amount\": 0.5, \"value\": 12, \"side\": \"hold\", \"price\": 1, \"id\": 2}", &root));
+    assert(root.prize == 1.5 && !strcmp(root.name, "x") && root.side == ROOT_SIDE_HOLD);
+    assert(root.value.type == ROOT_VALUE_OPTION_INT64 && root.value.option_int64 == 12);
+    assert(root.amount.type == ROOT_AMOUNT_OPTION_DOUBLE && root.amount.option_double == 0.5);
+
+    /* Unknown fields and labels, including the ones close to a common one, are still errors */
+    assert(json_parse_root("{\"id\": 1, \"price\": 2.5, \"side\": \"sell\", \"value\": true, \"amount\": 3, \"pricE\": 1}", &root));
+    assert(json_parse_root("{\"id\": 1, \"price\": 2.5, \"side\": \"sel\", \"value\": true, \"amount\": 3}", &root));
+    assert(json_parse_root("{\"id\": 1, \"price\": 2.5, \"side\": \"sell\", \"value\": \"true\", \"amount\": 3}", &root));
+    return 0;
+}
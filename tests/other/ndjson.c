@@ -0,0 +1,46 @@
+#include "ndjson.parser.h"
+
+#include <assert.h>
+#include <string.h>
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t records[4] = {};
+    size_t error_indices[4];
+    size_t error_count = 0;
+    size_t consumed_len = 0;
+
+    /* Blank lines are skipped, CRLF line endings are fine, the last newline is optional */
+    const char *ndjson =
+        "{\"id\": 1, \"name\": \"one\"}\n"
+        "\n"
+        "{\"id\": 2}\r\n"
+        "{\"id\": \"three\"}\n"
+        "  {\"id\": 4}";
+    assert(json_parse_root_many(ndjson, strlen(ndjson), records, 4, error_indices, &error_count, &consumed_len) == 4);
+    assert(consumed_len == strlen(ndjson));
+    assert(records[0].id == 1);
+    assert(!strcmp(records[0].name, "one"));
+    assert(records[1].id == 2);
+    assert(!strcmp(records[1].name, ""));
+    assert(records[3].id == 4);
+    assert(error_count == 1);
+    assert(error_indices[0] == 2);
+
+    /* Only as many records as fit in the output are parsed, the rest can be parsed by another call */
+    const char *batch = "{\"id\": 1}\n{\"id\": 2}\n{\"id\": 3}\n\n";
+    assert(json_parse_root_many(batch, strlen(batch), records, 2, error_indices, &error_count, &consumed_len) == 2);
+    assert(error_count == 0);
+    assert(records[1].id == 2);
+    const char *rest = batch + consumed_len;
+    assert(json_parse_root_many(rest, strlen(rest), records, 2, error_indices, &error_count, &consumed_len) == 1);
+    assert(records[0].id == 3);
+    assert(rest + consumed_len == batch + strlen(batch));
+
+    /* No records at all */
+    assert(json_parse_root_many("\n\n", 2, records, 4, error_indices, &error_count, &consumed_len) == 0);
+    assert(consumed_len == 2);
+    assert(error_count == 0);
+    return 0;
+}
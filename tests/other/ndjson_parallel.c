@@ -0,0 +1,83 @@
+#include "ndjson_parallel.parser.h"
+
+#include <assert.h>
+#include <stdio.h>
+#include <string.h>
+
+#define RECORD_NUM 1000
+
+static char ndjson[RECORD_NUM * 32];
+static root_t records[RECORD_NUM];
+static root_t parallel_records[RECORD_NUM];
+static size_t error_indices[RECORD_NUM];
+static size_t parallel_error_indices[RECORD_NUM];
+
+/* The parallel parser must give exactly the same results as the sequential one */
+static void check_same_as_sequential(size_t ndjson_len, size_t max_records, unsigned int thread_count) {
+    size_t error_count = 0;
+    size_t consumed_len = 0;
+    size_t parallel_error_count = 0;
+    size_t parallel_consumed_len = 0;
+    memset(records, 0, sizeof(records));
+    memset(parallel_records, 0, sizeof(parallel_records));
+
+    const size_t record_count = json_parse_root_many(
+        ndjson, ndjson_len, records, max_records, error_indices, &error_count, &consumed_len);
+    const size_t parallel_record_count = json_parse_root_many_parallel(
+        ndjson, ndjson_len, parallel_records, max_records, parallel_error_indices, &parallel_error_count,
+        &parallel_consumed_len, thread_count);
+
+    assert(parallel_record_count == record_count);
+    assert(parallel_consumed_len == consumed_len);
+    assert(parallel_error_count == error_count);
+    assert(!memcmp(parallel_error_indices, error_indices, error_count * sizeof(error_indices[0])));
+    for (size_t i = 0; i < record_count; ++i) {
+        assert(parallel_records[i].id == records[i].id);
+        assert(!strcmp(parallel_records[i].name, records[i].name));
+    }
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    size_t ndjson_len = 0;
+    for (int i = 0; i < RECORD_NUM; ++i) {
+        if (i % 97 == 0) {
+            ndjson_len += sprintf(ndjson + ndjson_len, "{\"id\": \"%d\"}\n", i);
+        } else if (i % 13 == 0) {
+            ndjson_len += sprintf(ndjson + ndjson_len, "\n  {\"id\": %d, \"name\": \"n%d\"}\r\n\n", i, i);
+        } else {
+            ndjson_len += sprintf(ndjson + ndjson_len, "{\"id\": %d}\n", i);
+        }
+    }
+
+    const unsigned int thread_counts[] = {0, 1, 2, 3, 8, 1000};
+    const size_t max_records[] = {RECORD_NUM, RECORD_NUM - 1, 500, 1, 0};
+    for (size_t i = 0; i < sizeof(thread_counts) / sizeof(thread_counts[0]); ++i) {
+        for (size_t j = 0; j < sizeof(max_records) / sizeof(max_records[0]); ++j) {
+            check_same_as_sequential(ndjson_len, max_records[j], thread_counts[i]);
+        }
+    }
+
+    /* Records are in input order, and error indices are global */
+    size_t error_count = 0;
+    size_t consumed_len = 0;
+    assert(json_parse_root_many_parallel(
+        ndjson, ndjson_len, parallel_records, RECORD_NUM, parallel_error_indices, &error_count, &consumed_len, 4
+    ) == RECORD_NUM);
+    /* Like json_parse_root_many, it stops right after the last record that fits, before the final newline */
+    assert(consumed_len == ndjson_len - 1);
+    assert(parallel_records[998].id == 998);
+    assert(!strcmp(parallel_records[26].name, "n26"));
+    assert(error_count == 11);
+    assert(parallel_error_indices[0] == 0);
+    assert(parallel_error_indices[10] == 970);
+
+    /* More threads than lines, and no records at all */
+    const char *short_ndjson = "{\"id\": 1}\n\n{\"id\": 2}";
+    check_same_as_sequential(0, RECORD_NUM, 4);
+    memcpy(ndjson, short_ndjson, strlen(short_ndjson));
+    check_same_as_sequential(strlen(short_ndjson), RECORD_NUM, 8);
+    check_same_as_sequential(strlen(short_ndjson), 1, 8);
+    return 0;
+}
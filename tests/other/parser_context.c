@@ -0,0 +1,78 @@
+#include "parser_context.parser.h"
+
+#include <assert.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+static json_parser_root_token_t token_buffer[JSON_PARSER_ROOT_TOKEN_BUFFER_SIZE / sizeof(json_parser_root_token_t)];
+/* One more token, so it still fits the most complex document when misaligned */
+static json_parser_root_token_t unaligned_buffer[JSON_PARSER_ROOT_TOKEN_BUFFER_SIZE / sizeof(json_parser_root_token_t) + 1];
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+
+    json_parser_root_t parser;
+    json_parser_root_init(&parser, token_buffer, sizeof(token_buffer));
+    assert(!json_parser_root_parse(&parser, "{\"values\": [1, 2, 3]}", 21, &root));
+    assert(root.values.n == 3);
+    assert(root.values.items[2] == 3);
+    /* The same context can be reused */
+    assert(!json_parser_root_parse(&parser, "{\"values\": [4]}", 15, &root));
+    assert(root.values.n == 1);
+    assert(root.values.items[0] == 4);
+    assert(json_parser_root_parse(&parser, "{\"values\": [4}", 14, &root));
+    assert(!json_parser_root_parse(&parser, "{\"values\": [5, 6]}", 18, &root));
+    assert(root.values.items[1] == 6);
+
+    /* Newline-delimited records */
+    root_t records[3] = {};
+    size_t error_indices[3];
+    size_t error_count = 0;
+    size_t consumed_len = 0;
+    const char *ndjson = "{\"values\": [1]}\n{\"values\": [2, 3]}\n{\"values\": 4}\n";
+    assert(json_parser_root_parse_many(&parser, ndjson, 49, records, 3, error_indices, &error_count, &consumed_len) == 3);
+    assert(consumed_len == 48); /* Stopped at max_records, before the last newline */
+    assert(records[1].values.items[1] == 3);
+    assert(error_count == 1);
+    assert(error_indices[0] == 2);
+
+    /* Heap buffer */
+    void *heap_buffer = malloc(JSON_PARSER_ROOT_TOKEN_BUFFER_SIZE);
+    json_parser_root_t heap_parser;
+    json_parser_root_init(&heap_parser, heap_buffer, JSON_PARSER_ROOT_TOKEN_BUFFER_SIZE);
+    assert(!json_parser_root_parse(&heap_parser, "{\"values\": [7, 8]}", 18, &root));
+    assert(root.values.items[1] == 8);
+    free(heap_buffer);
+
+    /* A smaller buffer only fits smaller documents */
+    json_parser_root_t small_parser;
+    json_parser_root_init(&small_parser, token_buffer, 6 * sizeof(json_parser_root_token_t));
+    assert(!json_parser_root_parse(&small_parser, "{\"values\": [1, 2, 3]}", 21, &root));
+    assert(json_parser_root_parse(&small_parser, "{\"values\": [1, 2, 3, 4]}", 24, &root));
+
+    /* The most complex document fits the buffer sized by the macro (also with JSMN_PARENT_LINKS, see the Makefile) */
+    char max_document[512] = "{\"values\": [0";
+    for (int i = 1; i < 100; ++i) {
+        snprintf(max_document + strlen(max_document), sizeof(max_document) - strlen(max_document), ",%d", i);
+    }
+    strcat(max_document, "]}");
+    assert(!json_parser_root_parse(&parser, max_document, strlen(max_document), &root));
+    assert(root.values.n == 100 && root.values.items[99] == 99);
+
+    /* An unaligned buffer is aligned by init */
+    json_parser_root_t unaligned_parser;
+    json_parser_root_init(&unaligned_parser, (char *)unaligned_buffer + 1, sizeof(unaligned_buffer) - 1);
+    assert((uintptr_t)unaligned_parser.token_buffer % _Alignof(json_parser_root_token_t) == 0);
+    assert((char *)unaligned_parser.token_buffer > (char *)unaligned_buffer);
+    assert(!json_parser_root_parse(&unaligned_parser, max_document, strlen(max_document), &root));
+    assert(root.values.n == 100);
+    /* Too small to hold even the alignment */
+    json_parser_root_init(&unaligned_parser, (char *)unaligned_buffer + 1, 1);
+    assert(unaligned_parser.max_token_num == 0);
+    assert(json_parser_root_parse(&unaligned_parser, "{\"values\": []}", 14, &root));
+    return 0;
+}
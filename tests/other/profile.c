@@ -0,0 +1,16 @@
+#include "profile.parser.h"
+
+#include <assert.h>
+#include <string.h>
+
+/* Profiling must not change the generated parser */
+int main(int argc, char **argv) {
+    (void)argc;
+    (void)argv;
+    root_t data;
+    assert(!json_parse_root("{\"name\": \"box\", \"sizes\": [1, 20, 300]}", &data));
+    assert(strcmp(data.name, "box") == 0);
+    assert(data.sizes.n == 3);
+    assert(data.sizes.items[2] == 300);
+    return 0;
+}
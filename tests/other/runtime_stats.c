@@ -0,0 +1,55 @@
+#include "runtime_stats.parser.h"
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <assert.h>
+
+static char stats[2048];
+
+static void load_stats(void) {
+    assert(!json_runtime_stats_root_save("other/runtime_stats.stats"));
+    memset(stats, 0, sizeof(stats));
+    FILE *file = fopen("other/runtime_stats.stats", "r");
+    assert(file != NULL);
+    size_t length = fread(stats, 1, sizeof(stats) - 1, file);
+    fclose(file);
+    assert(length > 0 && length < sizeof(stats) - 1);
+}
+
+/* The number after "name": in the saved stats */
+static unsigned long long stat(const char *name) {
+    const char *found = strstr(stats, name);
+    assert(found != NULL);
+    return strtoull(found + strlen(name), NULL, 10);
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+
+    assert(!json_parse_root("{\"id\": 1, \"side\": \"sell\", \"value\": true}", &root));
+    assert(!json_parse_root("{\"id\": 2, \"extra\": {\"a\": [1, 2]}, \"side\": \"buy\", \"value\": false}", &root));
+    assert(!json_parse_root("{\"value\": 7, \"side\": \"buy\", \"id\": 3}", &root));
+    assert(json_parse_root("{\"value\": 7, \"side\": \"hold\", \"id\": 3}", &root));
+
+    load_stats();
+    assert(strstr(stats, "\"parse_root\": {\"calls\": 4, \"errors\": 1, \"tokens\": ") != NULL);
+    assert(strstr(stats, "\"parse_root_side\": {\"calls\": 4, \"errors\": 1, \"tokens\": ") != NULL);
+    assert(strstr(stats, "\"parse_root_value\": {\"calls\": 4, \"errors\": 0, \"tokens\": ") != NULL);
+    /* Every document has at least 7 tokens, the children's included */
+    assert(stat("\"parse_root\": {\"calls\": 4, \"errors\": 1, \"tokens\": ") >= 4 * 7);
+    assert(stat("\"skipped_tokens\": ") > 0);
+    /* The integer option is tried first on a boolean */
+    assert(stat("\"failed_attempts\": ") == 2);
+
+    json_runtime_stats_root_reset();
+    load_stats();
+    assert(stat("\"skipped_tokens\": ") == 0);
+    assert(stat("\"failed_attempts\": ") == 0);
+    assert(strstr(stats, "\"parse_root\": {\"calls\": 0, \"errors\": 0, \"tokens\": 0, \"nanoseconds\": 0}") != NULL);
+
+    assert(json_runtime_stats_root_save("other/no such directory/runtime_stats.stats"));
+    return 0;
+}
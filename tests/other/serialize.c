@@ -0,0 +1,78 @@
+#include "serialize.parser.h"
+
+#include <assert.h>
+#include <stdio.h>
+#include <string.h>
+
+static void check_serialized(const root_t *root, const char *expected) {
+    char buffer[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    assert(!json_serialize_root(root, buffer, sizeof(buffer), &length));
+    if (strcmp(buffer, expected) || length != strlen(expected)) {
+        fprintf(stderr, "Serialized: %s\n", buffer);
+        fprintf(stderr, "Expected  : %s\n", expected);
+        assert(0);
+    }
+
+    // The output parses back to a value that serializes the same
+    root_t parsed = {};
+    assert(!json_parse_root(buffer, &parsed));
+    char again[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    assert(!json_serialize_root(&parsed, again, sizeof(again), &length));
+    assert(!strcmp(again, expected));
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+    assert(!json_parse_root(
+        "{\"shape\": {\"h\": 2, \"w\": 1.5}, \"tags\": [\"x\", \"y\"], \"ignored\": {\"a\": [1, 2]}, \"color\": \"darkGreen\", "
+        "\"ratio\": 0.5, \"enabled\": true, \"name\": \"a \\\"quoted\\\" name\", \"hex\": \"-fF\", \"small\": -128, "
+        "\"id\": 18446744073709551615, \"kind\": \"sample\"}",
+        &root
+    ));
+    // The schema's order, with the consts and the defaults, and without the void
+    const char *expected =
+        "{\"kind\":\"sample\",\"version\":2,\"id\":18446744073709551615,\"offset\":-5,\"small\":-128,\"hex\":\"-ff\","
+        "\"name\":\"a \\\"quoted\\\" name\",\"enabled\":true,\"ratio\":0.5,\"color\":\"darkGreen\",\"tags\":[\"x\",\"y\"],"
+        "\"shape\":{\"w\":1.5,\"h\":2}}";
+    check_serialized(&root, expected);
+
+    root.shape.type = ROOT_SHAPE_INT64;
+    root.shape.int64 = -3;
+    root.tags.n = 0;
+    root.color = ROOT_COLOR_RED;
+    check_serialized(
+        &root,
+        "{\"kind\":\"sample\",\"version\":2,\"id\":18446744073709551615,\"offset\":-5,\"small\":-128,\"hex\":\"-ff\","
+        "\"name\":\"a \\\"quoted\\\" name\",\"enabled\":true,\"ratio\":0.5,\"color\":\"red\",\"tags\":[],\"shape\":-3}"
+    );
+
+    // Too small a buffer is an error, not a truncated JSON
+    char buffer[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    assert(!json_serialize_root(&root, buffer, sizeof(buffer), &length));
+    const size_t needed = length + 1;
+    for (size_t size = 0; size < needed; ++size) {
+        assert(json_serialize_root(&root, buffer, size, &length));
+    }
+    assert(!json_serialize_root(&root, buffer, needed, &length));
+
+    // Values the parser would never produce
+    root_t invalid = root;
+    invalid.color = (root_color_t)7;
+    assert(json_serialize_root(&invalid, buffer, sizeof(buffer), &length));
+    invalid = root;
+    invalid.shape.type = (root_shape_type_t)7;
+    assert(json_serialize_root(&invalid, buffer, sizeof(buffer), &length));
+    invalid = root;
+    invalid.tags.n = 4;
+    assert(json_serialize_root(&invalid, buffer, sizeof(buffer), &length));
+    // A name without its NUL is cut at maxLength
+    invalid = root;
+    memset(invalid.name, 'n', sizeof(invalid.name));
+    assert(!json_serialize_root(&invalid, buffer, sizeof(buffer), &length));
+    assert(strstr(buffer, "\"name\":\"nnnnnnnnnnnnnnnnnnnnnnnn\","));
+    return 0;
+}
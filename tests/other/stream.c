@@ -0,0 +1,101 @@
+#include "stream.parser.h"
+
+#include <assert.h>
+#include <string.h>
+
+static json_parser_root_token_t token_buffer[JSON_PARSER_ROOT_TOKEN_BUFFER_SIZE / sizeof(json_parser_root_token_t)];
+static char document_buffer[256];
+
+static const char data[] = "{\"name\": \"potato\", \"values\": [12, -345, 6789], \"is_good\": true}";
+
+static void check_result(const root_t *root){
+    assert(!strcmp(root->name, "potato"));
+    assert(root->values.n == 3);
+    assert(root->values.items[0] == 12);
+    assert(root->values.items[1] == -345);
+    assert(root->values.items[2] == 6789);
+    assert(root->is_good);
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    const size_t data_len = strlen(data);
+    json_parser_root_t parser;
+    json_parser_root_init(&parser, token_buffer, sizeof(token_buffer));
+
+    /* Split into two chunks at every possible position, so every kind of token gets cut */
+    for (size_t split = 0; split <= data_len; ++split) {
+        root_t root = {};
+        json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+        assert(!json_parser_root_feed(&parser, data, split));
+        assert(!json_parser_root_feed(&parser, data + split, data_len - split));
+        assert(!json_parser_root_finish(&parser, &root));
+        check_result(&root);
+    }
+
+    /* One byte at a time */
+    root_t root = {};
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    for (size_t i = 0; i < data_len; ++i) {
+        assert(!json_parser_root_feed(&parser, data + i, 1));
+    }
+    assert(!json_parser_root_finish(&parser, &root));
+    check_result(&root);
+
+    /* Scatter-gather segments */
+    const json_parser_root_segment_t segments[] = {
+        {data, 5},
+        {data + 5, 0},
+        {data + 5, 20},
+        {data + 25, data_len - 25},
+    };
+    memset(&root, 0, sizeof(root));
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    assert(!json_parser_root_feedv(&parser, segments, 4));
+    assert(!json_parser_root_finish(&parser, &root));
+    check_result(&root);
+
+    /* Data received straight into the document buffer */
+    memset(&root, 0, sizeof(root));
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    memcpy(document_buffer, data, 10);
+    assert(!json_parser_root_feed(&parser, document_buffer, 10));
+    memcpy(document_buffer + 10, data + 10, data_len - 10);
+    assert(!json_parser_root_feed(&parser, document_buffer + 10, data_len - 10));
+    assert(!json_parser_root_finish(&parser, &root));
+    check_result(&root);
+
+    /* Syntax errors are reported as soon as the offending chunk is fed, and stick */
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    assert(!json_parser_root_feed(&parser, "{\"name\": ", 9));
+    assert(json_parser_root_feed(&parser, "]", 1));
+    assert(json_parser_root_feed(&parser, "\"x\"}", 4));
+    assert(json_parser_root_finish(&parser, &root));
+
+    /* Incomplete and empty documents */
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    assert(!json_parser_root_feed(&parser, data, data_len - 1));
+    assert(json_parser_root_finish(&parser, &root));
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    assert(json_parser_root_finish(&parser, &root));
+
+    /* Schema errors are reported by finish */
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    assert(!json_parser_root_feed(&parser, "{\"name\": 5}", 12));
+    assert(json_parser_root_finish(&parser, &root));
+
+    /* Overflowing the document buffer */
+    json_parser_root_begin(&parser, document_buffer, 20);
+    assert(!json_parser_root_feed(&parser, data, 20));
+    assert(json_parser_root_feed(&parser, data + 20, 1));
+    assert(json_parser_root_finish(&parser, &root));
+
+    /* The context is reusable after errors */
+    memset(&root, 0, sizeof(root));
+    json_parser_root_begin(&parser, document_buffer, sizeof(document_buffer));
+    assert(!json_parser_root_feed(&parser, data, data_len));
+    assert(!json_parser_root_finish(&parser, &root));
+    check_result(&root);
+    return 0;
+}
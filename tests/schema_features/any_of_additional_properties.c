@@ -0,0 +1,19 @@
+#include "any_of_additional_properties.parser.h"
+
+#include <assert.h>
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+
+    assert(!json_parse_root("{\"value\": {\"b\": 2}}", &root));
+    assert(root.value.type == ROOT_VALUE_SECOND);
+    assert(root.value.second.b == 2);
+
+    /* Both options accept it, skipping the other one's key, so the first one is picked, as they are tried in order. */
+    assert(!json_parse_root("{\"value\": {\"b\": 2, \"a\": 1}}", &root));
+    assert(root.value.type == ROOT_VALUE_FIRST);
+    assert(root.value.first.a == 1);
+    return 0;
+}
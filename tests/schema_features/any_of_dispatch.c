@@ -0,0 +1,45 @@
+#include "any_of_dispatch.parser.h"
+
+#include <string.h>
+#include <assert.h>
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+
+    /* Scalars and arrays go straight to the option for their type. */
+    last_error[0] = '\0';
+    assert(!json_parse_root("{\"values\": [42, \"text\", [1, 2]]}", &root));
+    assert(root.values.n == 3);
+    assert(root.values.items[0].type == ROOT_VALUES_ITEM_INT64);
+    assert(root.values.items[0].int64 == 42);
+    assert(root.values.items[1].type == ROOT_VALUES_ITEM_WORD);
+    assert(!strcmp(root.values.items[1].word, "text"));
+    assert(root.values.items[2].type == ROOT_VALUES_ITEM_NUMBERS);
+    assert(root.values.items[2].numbers.n == 2);
+    assert(last_error[0] == '\0');
+
+    /* Objects are told apart by a required key that the other one does not have, wherever it is. */
+    assert(!json_parse_root("{\"values\": [{\"x\": 1, \"y\": 2}, {\"x\": 3, \"text\": \"hi\"}, {\"text\": \"lo\"}]}", &root));
+    assert(root.values.n == 3);
+    assert(root.values.items[0].type == ROOT_VALUES_ITEM_POINT);
+    assert(root.values.items[0].point.y == 2);
+    assert(root.values.items[1].type == ROOT_VALUES_ITEM_LABEL);
+    assert(root.values.items[1].label.x == 3);
+    assert(!strcmp(root.values.items[1].label.text, "hi"));
+    assert(root.values.items[2].type == ROOT_VALUES_ITEM_LABEL);
+    assert(root.values.items[2].label.x == 0);
+    assert(last_error[0] == '\0');
+
+    /* The picked option fails: no other option could have matched either. */
+    assert(json_parse_root("{\"values\": [{\"x\": 1}]}", &root));
+    assert(!strcmp(last_error, "Invalid anyOf value in 'values': no option matched"));
+    assert(json_parse_root("{\"values\": [{\"y\": 1, \"text\": \"both\"}]}", &root));
+    assert(!strcmp(last_error, "Invalid anyOf value in 'values': no option matched"));
+    assert(json_parse_root("{\"values\": [[\"not a number\"]]}", &root));
+    assert(!strcmp(last_error, "Invalid anyOf value in 'values': no option matched"));
+    assert(json_parse_root("{\"values\": [\"too long a string\"]}", &root));
+    assert(!strcmp(last_error, "Invalid anyOf value in 'values': no option matched"));
+    return 0;
+}
@@ -0,0 +1,72 @@
+#include "function_dedup.parser.h"
+
+#include <string.h>
+#include <assert.h>
+
+/* Fields parsed by the very same code share the parser function (see the Makefile rule). The
+   sharing must not mix up the constraints: small_point has the type of the points, not their parser. */
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+
+    assert(!json_parse_root(
+        "{\"kind_a\": \"points\", \"kind_b\": \"points\","
+        " \"point_a\": {\"x\": 50, \"y\": 1}, \"point_b\": {\"x\": 100},"
+        " \"small_point\": {\"x\": 10},"
+        " \"color\": \"green\", \"colors\": [\"blue\", \"red\"],"
+        " \"line_a\": {\"xs\": [1, 2]}, \"line_b\": {\"xs\": [], \"width\": 2}}", &root));
+
+    assert(root.point_a.x == 50 && root.point_a.y == 1);
+    assert(root.point_b.x == 100 && root.point_b.y == 5);
+    assert(root.small_point.x == 10 && root.small_point.y == 5);
+    assert(root.color == COLOR_GREEN);
+    assert(root.colors.n == 2 && root.colors.items[0] == COLOR_BLUE && root.colors.items[1] == COLOR_RED);
+    /* Both lines have the type of the first one */
+    const root_line_a_t *line_b = &root.line_b;
+    assert(line_b->xs.n == 0 && line_b->width == 2);
+    assert(root.line_a.xs.n == 2 && root.line_a.xs.items[1] == 2 && root.line_a.width == 1);
+
+    /* Each field still checks its own constraints */
+    assert(json_parse_root(
+        "{\"kind_a\": \"points\", \"kind_b\": \"point\","
+        " \"point_a\": {\"x\": 50}, \"point_b\": {\"x\": 100}, \"small_point\": {\"x\": 10},"
+        " \"color\": \"green\", \"colors\": [],"
+        " \"line_a\": {\"xs\": []}, \"line_b\": {\"xs\": []}}", &root));
+    assert(json_parse_root(
+        "{\"kind_a\": \"points\", \"kind_b\": \"points\","
+        " \"point_a\": {\"x\": 50}, \"point_b\": {\"x\": 101}, \"small_point\": {\"x\": 10},"
+        " \"color\": \"green\", \"colors\": [],"
+        " \"line_a\": {\"xs\": []}, \"line_b\": {\"xs\": []}}", &root));
+    assert(json_parse_root(
+        "{\"kind_a\": \"points\", \"kind_b\": \"points\","
+        " \"point_a\": {\"x\": 50}, \"point_b\": {\"x\": 100}, \"small_point\": {\"x\": 11},"
+        " \"color\": \"green\", \"colors\": [],"
+        " \"line_a\": {\"xs\": []}, \"line_b\": {\"xs\": []}}", &root));
+    assert(json_parse_root(
+        "{\"kind_a\": \"points\", \"kind_b\": \"points\","
+        " \"point_a\": {\"x\": 50}, \"point_b\": {\"x\": 100}, \"small_point\": {\"x\": 10},"
+        " \"color\": \"green\", \"colors\": [],"
+        " \"line_a\": {\"xs\": []}, \"line_b\": {\"xs\": [1, 2, 3, 4]}}", &root));
+    assert(json_parse_root(
+        "{\"kind_a\": \"points\", \"kind_b\": \"points\","
+        " \"point_a\": {\"x\": 50}, \"point_b\": {\"x\": 100}, \"small_point\": {\"x\": 10},"
+        " \"color\": \"green\", \"colors\": [\"black\"],"
+        " \"line_a\": {\"xs\": []}, \"line_b\": {\"xs\": []}}", &root));
+
+    char buffer[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length;
+    assert(!json_parse_root(
+        "{\"kind_a\": \"points\", \"kind_b\": \"points\","
+        " \"point_a\": {\"x\": 1, \"y\": 2}, \"point_b\": {\"x\": 3, \"y\": 4}, \"small_point\": {\"x\": 5, \"y\": 6},"
+        " \"color\": \"red\", \"colors\": [\"blue\"],"
+        " \"line_a\": {\"xs\": [7]}, \"line_b\": {\"xs\": []}}", &root));
+    assert(!json_serialize_root(&root, buffer, sizeof(buffer), &length));
+    assert(!strcmp(buffer,
+        "{\"kind_a\":\"points\",\"kind_b\":\"points\","
+        "\"point_a\":{\"x\":1,\"y\":2},\"point_b\":{\"x\":3,\"y\":4},\"small_point\":{\"x\":5,\"y\":6},"
+        "\"color\":\"red\",\"colors\":[\"blue\"],"
+        "\"line_a\":{\"xs\":[7],\"width\":1},\"line_b\":{\"xs\":[],\"width\":1}}"));
+
+    return 0;
+}
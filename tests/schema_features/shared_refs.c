@@ -0,0 +1,38 @@
+#include "shared_refs.parser.h"
+
+#include <assert.h>
+
+const char *data =
+    "{"
+    "\"tree\": {\"left\": {\"left\": 1, \"right\": 2}, \"right\": {\"left\": 3, \"right\": 4}},"
+    "\"branch\": {\"left\": 5, \"right\": 6},"
+    "\"count\": 7,"
+    "\"flexible\": \"8\","
+    "\"named\": {\"left\": 9, \"right\": 10}"
+    "}";
+
+int main(int argc, char **argv) {
+    (void)argc;
+    (void)argv;
+    root_t root = {0};
+    assert(!json_parse_root(data, &root));
+    assert(root.tree.left.left == 1);
+    assert(root.tree.right.right == 4);
+    assert(root.branch.right == 6);
+    assert(root.count == 7);
+    assert(root.flexible == 8);
+    assert(root.named.left == 9);
+    /* The string form of the anyOf did not leak into the integer definition it shares */
+    assert(json_parse_root(
+        "{\"tree\": {\"left\": {\"left\": 1, \"right\": 2}, \"right\": {\"left\": 3, \"right\": 4}},"
+        "\"branch\": {\"left\": 5, \"right\": 6}, \"count\": \"7\", \"flexible\": 8, \"named\": {\"left\": 9, \"right\": 10}}",
+        &root
+    ));
+    /* The range of the shared definition applies everywhere */
+    assert(json_parse_root(
+        "{\"tree\": {\"left\": {\"left\": 1, \"right\": 2}, \"right\": {\"left\": 3, \"right\": 400}},"
+        "\"branch\": {\"left\": 5, \"right\": 6}, \"count\": 7, \"flexible\": 8, \"named\": {\"left\": 9, \"right\": 10}}",
+        &root
+    ));
+    return 0;
+}
@@ -0,0 +1,85 @@
+#include "long.parser.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <assert.h>
+
+#define MAX_LENGTH 300
+
+static char document[2 * MAX_LENGTH + 16];
+
+// ["<prefix><escape><suffix>"], with the escape at every offset, so it falls at every position of a block
+static void check_escape_at(const char *escape, const char *escaped, size_t length, size_t offset) {
+    char expected[MAX_LENGTH + 1];
+    const size_t escape_len = strlen(escape);
+    const size_t escaped_len = strlen(escaped);
+    memset(expected, 'a', offset);
+    memcpy(expected + offset, escaped, escaped_len);
+    memset(expected + offset + escaped_len, 'b', length - offset - escaped_len);
+    expected[length] = 0;
+
+    size_t pos = 0;
+    document[pos++] = '[';
+    document[pos++] = '"';
+    memcpy(document + pos, expected, offset);
+    pos += offset;
+    memcpy(document + pos, escape, escape_len);
+    pos += escape_len;
+    memcpy(document + pos, expected + offset + escaped_len, length - offset - escaped_len);
+    pos += length - offset - escaped_len;
+    document[pos++] = '"';
+    document[pos++] = ']';
+
+    root_t root = {};
+    assert(!json_parse_root_with_len(document, pos, &root));
+    assert(root.n == 1);
+    assert(!strcmp(root.items[0], expected));
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    // Strings are not unescaped, so the escape sequence itself is stored
+    for (size_t length = 2; length <= 100; ++length) {
+        for (size_t offset = 0; offset + 2 <= length; ++offset) {
+            check_escape_at("\\\"", "\\\"", length, offset);
+            check_escape_at("\\\\", "\\\\", length, offset);
+        }
+    }
+    for (size_t offset = 0; offset + 6 <= MAX_LENGTH; ++offset) {
+        check_escape_at("\\u00e9", "\\u00e9", MAX_LENGTH, offset);
+    }
+
+    root_t root = {};
+    // Both backends let a raw control character through, like jsmn, wherever it falls in the block
+    for (size_t offset = 0; offset < 100; ++offset) {
+        memset(document, 'x', sizeof(document));
+        memcpy(document, "[\"", 2);
+        document[2 + offset] = '\t';
+        memcpy(document + 102, "\"]", 2);
+        assert(!json_parse_root_with_len(document, 104, &root));
+        assert(root.n == 1);
+        assert(strlen(root.items[0]) == 100 && root.items[0][offset] == '\t');
+    }
+    // Unterminated, with and without the length limiting it
+    for (size_t length = 0; length < 100; ++length) {
+        memset(document, 'x', sizeof(document));
+        document[0] = '[';
+        document[1] = '"';
+        assert(json_parse_root_with_len(document, length + 2, &root));
+    }
+    // An escaped quote right at the end does not end the string
+    assert(json_parse_root("[\"0123456789abcdef0123456789abcdef0123456789abcdef0123456789abc\\\"]", &root));
+    // The end of a NUL terminated document ends the string, even within a block
+    memset(document, 'x', sizeof(document));
+    memcpy(document, "[\"", 2);
+    document[40] = 0;
+    assert(json_parse_root_with_len(document, sizeof(document), &root));
+
+    assert(!json_parse_root("[\"\", \"a\", \"0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef0123\"]", &root));
+    assert(root.n == 3);
+    assert(!strcmp(root.items[0], ""));
+    assert(!strcmp(root.items[1], "a"));
+    assert(strlen(root.items[2]) == 68);
+    return 0;
+}
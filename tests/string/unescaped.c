@@ -0,0 +1,67 @@
+#include "unescaped.parser.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <assert.h>
+
+static void check_text(const char *json, const char *expected) {
+    root_t root = {};
+    if (json_parse_root(json, &root) || strcmp(root.text, expected)) {
+        fprintf(stderr, "When checking %s\n", json);
+        assert(false);
+    }
+
+    // Escaped again when serialized, so it parses back to the same text
+    char serialized[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    root_t parsed = {};
+    assert(!json_serialize_root(&root, serialized, sizeof(serialized), &length));
+    if (json_parse_root(serialized, &parsed) || strcmp(parsed.text, expected)) {
+        fprintf(stderr, "When checking %s, serialized as %s\n", json, serialized);
+        assert(false);
+    }
+}
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    root_t root = {};
+    assert(!json_parse_root("{}", &root));
+    assert(!strcmp(root.text, ""));
+    assert(!strcmp(root.code, "\"\xc3\xa9\\?"));
+
+    check_text("{\"text\": \"plain ASCII, long enough to take more than one block\"}", "plain ASCII, long enough to take more than one block");
+    check_text("{\"text\": \"\\\" \\\\ \\/ \\b \\f \\n \\r \\t\"}", "\" \\ / \b \f \n \r \t");
+    check_text("{\"text\": \"line one\\nline two\"}", "line one\nline two");
+    check_text("{\"text\": \"\\u0041\\u00e9\\u00E9\\u20ac\"}", "A\xc3\xa9\xc3\xa9\xe2\x82\xac");
+    check_text("{\"text\": \"\\ud83d\\ude00 surrogate pair\"}", "\xf0\x9f\x98\x80 surrogate pair");
+    check_text("{\"text\": \"raw UTF-8: \xc3\xa9\xe2\x82\xac\xf0\x9f\x98\x80, copied as-is\"}", "raw UTF-8: \xc3\xa9\xe2\x82\xac\xf0\x9f\x98\x80, copied as-is");
+    // NUL can only be escaped, and ends the C string
+    check_text("{\"text\": \"a\\u0000b\"}", "a");
+
+    // Only quotes, backslashes and control characters are escaped
+    char serialized[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    assert(!json_parse_root("{\"text\": \"\\\" \\\\ \\/ \\b \\f \\n \\r \\t \\u0001 \\u00e9\"}", &root));
+    assert(!json_serialize_root(&root, serialized, sizeof(serialized), &length));
+    assert(!strcmp(serialized, "{\"text\":\"\\\" \\\\ / \\b \\f \\n \\r \\t \\u0001 \xc3\xa9\",\"code\":\"\\\"\xc3\xa9\\\\?\"}"));
+
+    // The lengths are after decoding: 4 bytes, from 8 escaped ones
+    assert(!json_parse_root("{\"code\": \"\\n\\n\\n\\n\"}", &root));
+    assert(!strcmp(root.code, "\n\n\n\n"));
+    // é is 2 bytes
+    assert(!json_parse_root("{\"code\": \"\\u00e9\"}", &root));
+    assert(json_parse_root("{\"code\": \"\\u00e9\\u00e9ab\"}", &root));
+    assert(json_parse_root("{\"code\": \"\\n\"}", &root));
+
+    // An escape or multi-byte character at every position of a block
+    for (size_t offset = 0; offset < 40; ++offset) {
+        char json[128];
+        char expected[64];
+        memset(expected, 'x', offset);
+        memcpy(expected + offset, "\n\xc3\xa9y", 5);
+        snprintf(json, sizeof(json), "{\"text\": \"%.*s\\n\xc3\xa9y\"}", (int)offset, expected);
+        check_text(json, expected);
+    }
+    return 0;
+}
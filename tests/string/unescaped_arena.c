@@ -0,0 +1,36 @@
+#include "unescaped_arena.parser.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <assert.h>
+#include <stdint.h>
+
+static uint64_t arena_buffer[32];
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    json_arena_root_t arena = { arena_buffer, sizeof(arena_buffer), 0 };
+    root_t root;
+    assert(!json_parse_root("[\"\\u00e9t\\u00e9\", \"a\\u0000b\", \"\\n\\n\\n\\n\\n\\n\"]", &arena, &root));
+    assert(root.n == 3);
+    assert(root.items[0].length == 5);
+    assert(!strcmp(root.items[0].chars, "\xc3\xa9t\xc3\xa9"));
+    assert(root.items[1].length == 3);
+    assert(!memcmp(root.items[1].chars, "a\0b", 4));
+    assert(!strcmp(root.items[2].chars, "\n\n\n\n\n\n"));
+    // Only the decoded strings are kept: the items, then 6 + 4 + 7 bytes
+    assert(arena.used == 3 * sizeof(root.items[0]) + 17);
+
+    // The length is stored, so a NUL is serialized too
+    char serialized[JSON_MAX_SERIALIZED_SIZE_ROOT];
+    size_t length = 0;
+    assert(!json_serialize_root(&root, serialized, sizeof(serialized), &length));
+    assert(!strcmp(serialized, "[\"\xc3\xa9t\xc3\xa9\",\"a\\u0000b\",\"\\n\\n\\n\\n\\n\\n\"]"));
+
+    arena.used = 0;
+    assert(json_parse_root("[\"\\u00e9\\u00e9\\u00e9\\u00e9\"]", &arena, &root));
+    assert(json_parse_root("[\"\\ud83d\"]", &arena, &root));
+    assert(arena.used == 0);
+    return 0;
+}
@@ -0,0 +1,57 @@
+#include "view.parser.h"
+
+#include <stdio.h>
+#include <string.h>
+#include <assert.h>
+
+int main(int argc, char** argv){
+    (void)argc;
+    (void)argv;
+    const char *json =
+        "{\"id\": \"ab12\", \"body\": \"a long body, with no maxLength, that is never copied: line\\nline\", "
+        "\"parts\": [\"x\", \"\", \"\\u00e9\"]}";
+    root_t root = {};
+    assert(!json_parse_root(json, &root));
+
+    // The views point into the JSON string
+    assert(root.id.chars == strstr(json, "ab12"));
+    assert(root.id.length == 4);
+    assert(!root.id.has_escapes);
+    assert(root.body.chars == strstr(json, "a long body"));
+    assert(root.body.length == strlen("a long body, with no maxLength, that is never copied: line\\nline"));
+    assert(root.body.has_escapes);
+
+    // Defaults point to a string literal
+    assert(root.kind.length == 5);
+    assert(!strncmp(root.kind.chars, "plain", root.kind.length));
+    assert(!root.kind.has_escapes);
+
+    assert(root.parts.n == 3);
+    assert(!strncmp(root.parts.items[0].chars, "x", root.parts.items[0].length));
+    assert(root.parts.items[1].length == 0);
+    assert(root.parts.items[2].length == 6);
+    assert(root.parts.items[2].has_escapes);
+
+    // A view with escapes is still JSON, so it is written back as it is. One without is escaped.
+    char serialized[256];
+    size_t length = 0;
+    root.id.chars = "a\"b";
+    root.id.length = 3;
+    assert(!json_serialize_root(&root, serialized, sizeof(serialized), &length));
+    assert(!strcmp(
+        serialized,
+        "{\"id\":\"a\\\"b\",\"body\":\"a long body, with no maxLength, that is never copied: line\\nline\","
+        "\"kind\":\"plain\",\"parts\":[\"x\",\"\",\"\\u00e9\"]}"
+    ));
+#ifdef JSON_MAX_SERIALIZED_SIZE_ROOT
+#error "body has no maxLength, so there is no maximum size"
+#endif
+
+    // Lengths and types are still checked
+    assert(json_parse_root("{\"id\": \"a\", \"body\": \"\"}", &root));
+    assert(json_parse_root("{\"id\": \"123456789\", \"body\": \"\"}", &root));
+    assert(json_parse_root("{\"id\": \"ab\", \"body\": 1}", &root));
+    assert(!json_parse_root("{\"id\": \"ab\", \"body\": \"\", \"kind\": \"k\"}", &root));
+    assert(root.kind.length == 1 && root.kind.chars[0] == 'k');
+    return 0;
+}